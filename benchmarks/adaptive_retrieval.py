@@ -0,0 +1,139 @@
+"""Benchmark of adaptive-k and MMR retrieval: latency at 10k chunks and answer recall.
+
+Part one builds a Chroma store and keyword index over synthetic chunks
+with stub embeddings and reports the latency of a search with each
+retrieval mode: fixed k, adaptive k (over-fetching RERANK_CANDIDATES),
+MMR (which also fetches the candidates' stored embeddings) and both.
+It also times mmr_select alone for growing candidate counts. Part two
+asks the eval set of retrieval_eval against the bundled paper and reports
+hit rate, chunks used and context characters per mode, after overlap
+reranking as query_document does.
+
+Usage:
+    python -m benchmarks.adaptive_retrieval [--chunks 10000] [--dimensions 384] [--queries 200]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+import warnings
+
+import numpy as np
+from langchain_chroma import Chroma
+
+from benchmarks.hybrid_retrieval import make_chunks
+from benchmarks.query_load import percentile
+from benchmarks.retrieval_eval import EVAL_DOC_PATH, EVAL_SET_PATH, _normalize, build_store, load_eval_set
+from benchmarks.stubs import StubEmbeddings
+from src.config.settings import RERANK_CANDIDATES
+from src.database import document_store
+from src.database.embedding_providers import HashingEmbeddings
+from src.database.lexical_index import LexicalIndex, LexicalIndexBuilder
+from src.utils.adaptive_retrieval import RetrievalOptions, mmr_select, select_results
+from src.utils.reranker import OverlapReranker, rerank
+
+MODES = [
+    ("fixed k=3", RetrievalOptions(k_mode="fixed", k=3, mmr=False)),
+    ("adaptive", RetrievalOptions(k_mode="adaptive", mmr=False)),
+    ("fixed+mmr", RetrievalOptions(k_mode="fixed", k=3, mmr=True)),
+    ("adaptive+mmr", RetrievalOptions(k_mode="adaptive", mmr=True)),
+]
+
+def retrieve(db, root, question, question_vector, options, candidates, reranker=None, index=None):
+    """Retrieve a question's chunks with the given options, as _search_document does."""
+    fetch = candidates if options.adaptive or options.mmr or reranker is not None else options.k
+    results = document_store.hybrid_search(db, root, question, question_vector, k=fetch)
+    embeddings = document_store.get_chunk_embeddings(db, [doc.id for doc, _ in results]) if options.mmr else None
+    if reranker is not None:
+        results = rerank(question, results, len(results), reranker, index=index)
+    vectors = [embeddings[doc.id] for doc, _ in results] if embeddings is not None else None
+    return select_results(results, options, vectors)
+
+def search_latency(num_chunks, dimensions, num_queries, candidates, rng):
+    """Get the search latencies of each mode over a store of num_chunks chunks."""
+    embeddings = StubEmbeddings(dimensions=dimensions)
+    chunks = make_chunks(num_chunks, rng)
+    ids = [f"chunk-{i}" for i in range(num_chunks)]
+    with tempfile.TemporaryDirectory() as root:
+        db = Chroma(persist_directory=root, embedding_function=embeddings)
+        for start in range(0, num_chunks, 500):
+            db.add_texts(chunks[start:start + 500], ids=ids[start:start + 500])
+        builder = LexicalIndexBuilder()
+        builder.add(ids, chunks)
+        builder.save(document_store.lexical_index_path(root))
+
+        questions = [" ".join(rng.sample(chunks[rng.randrange(num_chunks)].split(), 8)) for _ in range(num_queries)]
+        vectors = [embeddings.embed_query(question) for question in questions]
+        latencies = {name: [] for name, _options in MODES}
+        for question, question_vector in zip(questions, vectors):
+            for name, options in MODES:
+                start = time.perf_counter()
+                retrieve(db, root, question, question_vector, options, candidates)
+                latencies[name].append(time.perf_counter() - start)
+        return latencies
+
+def mmr_latency(num_candidates, dimensions, k, rng, repeats=50):
+    """Get the median milliseconds mmr_select takes to pick k of num_candidates."""
+    generator = np.random.default_rng(rng.randrange(2 ** 32))
+    vectors = generator.standard_normal((num_candidates, dimensions)).astype(np.float32)
+    relevance = np.sort(generator.random(num_candidates))[::-1]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        mmr_select(vectors, relevance, k, 0.7)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def recall(eval_set, candidates):
+    """Get the hit rate, mean chunks and mean context characters of each mode on the eval set."""
+    embeddings = HashingEmbeddings()
+    reranker = OverlapReranker()
+    report = {}
+    with tempfile.TemporaryDirectory() as root:
+        db = build_store(EVAL_DOC_PATH, root, embeddings)
+        index = LexicalIndex(document_store.lexical_index_path(root))
+        for name, options in MODES:
+            hits, chunks, chars = 0, [], []
+            for question, answer in eval_set:
+                kept = retrieve(db, root, question, embeddings.embed_query(question), options, candidates,
+                                reranker, index)
+                hits += any(_normalize(answer) in _normalize(doc.page_content) for doc, _ in kept)
+                chunks.append(len(kept))
+                chars.append(sum(len(doc.page_content) for doc, _ in kept))
+            report[name] = (hits / len(eval_set), statistics.mean(chunks), statistics.mean(chars))
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding length, as in MiniLM-class models")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES, help="Chunks over-fetched per question")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    rng = random.Random(0)
+
+    latencies = search_latency(args.chunks, args.dimensions, args.queries, args.candidates, rng)
+    print(f"\nSearch latency over {args.chunks} chunks ({args.dimensions}-dim embeddings, "
+          f"{args.candidates} candidates)")
+    print(f"{'mode':>14} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, _options in MODES:
+        print(f"{name:>14} {statistics.median(latencies[name]) * 1000:>8.2f} "
+              f"{percentile(latencies[name], 0.95) * 1000:>8.2f}")
+
+    print(f"\nmmr_select alone, picking 8 ({args.dimensions}-dim)")
+    print(f"{'candidates':>11} {'p50 ms':>8}")
+    for num_candidates in (20, 100, 1000):
+        print(f"{num_candidates:>11} {mmr_latency(num_candidates, args.dimensions, 8, rng):>8.3f}")
+
+    eval_set = load_eval_set(EVAL_SET_PATH)
+    report = recall(eval_set, args.candidates)
+    print(f"\nEval set ({len(eval_set)} questions on the bundled paper, overlap reranking)")
+    print(f"{'mode':>14} {'hit rate':>9} {'chunks':>7} {'context chars':>14}")
+    for name, (hit_rate, chunks, chars) in report.items():
+        print(f"{name:>14} {hit_rate:>9.0%} {chunks:>7.1f} {chars:>14.0f}")
+
+if __name__ == "__main__":
+    main()
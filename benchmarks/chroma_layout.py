@@ -0,0 +1,149 @@
+"""Benchmark of the two vector store layouts: a Chroma directory per document vs. one shared client.
+
+For each document count it builds both layouts with random vectors, then
+measures disk footprint, cold open latency (client start, collection load and
+first query), warm query latency, and a search across ten documents.
+
+Usage:
+    python -m benchmarks.chroma_layout [--documents 10 100 1000] [--chunks 20] [--dimensions 768]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import chromadb
+from chromadb.config import Settings
+
+from src.database.chroma_layout import DEFAULT_COLLECTION
+from src.database.handle_pool import detach_client_system, stop_client_system
+
+SETTINGS = dict(anonymized_telemetry=False)
+
+def random_vectors(count, dimensions, rng):
+    return [[rng.random() for _ in range(dimensions)] for _ in range(count)]
+
+def add_chunks(collection, doc_index, num_chunks, dimensions, rng):
+    collection.add(
+        ids=[f"chunk-{i}" for i in range(num_chunks)],
+        embeddings=random_vectors(num_chunks, dimensions, rng),
+        documents=[f"document {doc_index} chunk {i}" for i in range(num_chunks)],
+        metadatas=[{"page": i // 4} for i in range(num_chunks)],
+    )
+
+def close(client):
+    stop_client_system(detach_client_system(client))
+
+def disk_usage(path):
+    """Get the bytes used by every file under path."""
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def build_directory_layout(root, num_docs, num_chunks, dimensions, rng):
+    for doc in range(num_docs):
+        client = chromadb.PersistentClient(path=os.path.join(root, f"doc_{doc}"), settings=Settings(**SETTINGS))
+        add_chunks(client.create_collection(DEFAULT_COLLECTION), doc, num_chunks, dimensions, rng)
+        close(client)
+
+def build_shared_layout(root, num_docs, num_chunks, dimensions, rng):
+    client = chromadb.PersistentClient(path=root, settings=Settings(**SETTINGS))
+    for doc in range(num_docs):
+        add_chunks(client.create_collection(f"doc_{doc}"), doc, num_chunks, dimensions, rng)
+    close(client)
+
+def measure_directory(root, docs, query):
+    """Open each document's own client cold and query it; return (open seconds, warm query seconds)."""
+    opens, queries = [], []
+    for doc in docs:
+        start = time.perf_counter()
+        client = chromadb.PersistentClient(path=os.path.join(root, f"doc_{doc}"), settings=Settings(**SETTINGS))
+        collection = client.get_collection(DEFAULT_COLLECTION)
+        collection.query(query_embeddings=[query], n_results=3)
+        opens.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query], n_results=3)
+        queries.append(time.perf_counter() - start)
+        close(client)
+    return opens, queries
+
+def measure_shared(root, docs, query):
+    """Open the shared client once, then each collection cold; return (client start, opens, queries)."""
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(path=root, settings=Settings(**SETTINGS))
+    client_start = time.perf_counter() - start
+
+    opens, queries = [], []
+    for doc in docs:
+        start = time.perf_counter()
+        collection = client.get_collection(f"doc_{doc}")
+        collection.query(query_embeddings=[query], n_results=3)
+        opens.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query], n_results=3)
+        queries.append(time.perf_counter() - start)
+    close(client)
+    return client_start, opens, queries
+
+def cross_document_search(layout, root, docs, query):
+    """Search several documents cold and merge the top results; return seconds."""
+    start = time.perf_counter()
+    results = []
+    if layout == "directory":
+        for doc in docs:
+            client = chromadb.PersistentClient(path=os.path.join(root, f"doc_{doc}"), settings=Settings(**SETTINGS))
+            found = client.get_collection(DEFAULT_COLLECTION).query(query_embeddings=[query], n_results=3)
+            results.extend(zip(found["distances"][0], found["ids"][0]))
+            close(client)
+    else:
+        client = chromadb.PersistentClient(path=root, settings=Settings(**SETTINGS))
+        for doc in docs:
+            found = client.get_collection(f"doc_{doc}").query(query_embeddings=[query], n_results=3)
+            results.extend(zip(found["distances"][0], found["ids"][0]))
+        close(client)
+    results.sort()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks per document")
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--samples", type=int, default=20, help="Documents opened per measurement")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    query = random_vectors(1, args.dimensions, rng)[0]
+
+    print(f"{'docs':>6} {'layout':>10} {'disk MB':>9} {'build s':>8} {'client ms':>10} "
+          f"{'open ms':>8} {'query ms':>9} {'10-doc search ms':>17}")
+    for num_docs in args.documents:
+        sample = rng.sample(range(num_docs), min(args.samples, num_docs))
+        with tempfile.TemporaryDirectory() as workdir:
+            for layout in ("directory", "shared"):
+                root = os.path.join(workdir, layout)
+                start = time.perf_counter()
+                if layout == "directory":
+                    build_directory_layout(root, num_docs, args.chunks, args.dimensions, rng)
+                else:
+                    build_shared_layout(root, num_docs, args.chunks, args.dimensions, rng)
+                build_time = time.perf_counter() - start
+
+                if layout == "directory":
+                    client_start = 0.0
+                    opens, queries = measure_directory(root, sample, query)
+                else:
+                    client_start, opens, queries = measure_shared(root, sample, query)
+                search_time = cross_document_search(layout, root, sample[:10], query)
+
+                print(f"{num_docs:>6} {layout:>10} {disk_usage(root) / 1e6:>9.1f} {build_time:>8.1f} "
+                      f"{client_start * 1000:>10.1f} {statistics.median(opens) * 1000:>8.1f} "
+                      f"{statistics.median(queries) * 1000:>9.2f} {search_time * 1000:>17.1f}")
+
+if __name__ == "__main__":
+    main()
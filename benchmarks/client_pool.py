@@ -0,0 +1,81 @@
+"""Benchmark of per-request LLM overhead with a new client per request vs. the client pool.
+
+Sends chat requests through the query path's prompt | LLM | parser chain
+to a local OpenAI-compatible stub server (the API Groq serves), over HTTPS
+with a self-signed certificate when the openssl command is available.
+"new client" builds the LLM client for every request, as get_gemini_llm
+did; "pooled" checks a long-lived client out of a ClientPool through
+PooledChain. Reports request latency and the connections the server saw.
+
+Usage:
+    python -m benchmarks.client_pool [--requests 200] [--concurrency 1 8] [--server-latency 0.0] [--no-tls]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import shutil
+import statistics
+import time
+
+import httpx
+from langchain_groq import ChatGroq
+
+from benchmarks.query_load import percentile
+from benchmarks.stubs import StubChatServer
+from src.config.settings import GROQ_MODEL
+from src.utils.client_pool import ClientPool, PooledChain
+from src.utils.query_handler import _build_chain
+
+INPUTS = {"context": "The study compares GPT-4 with human translators. " * 40, "question": "What did it find?"}
+
+def make_factory(server):
+    """Get a function building the chain around a new LLM client for the stub server."""
+    def factory(key):
+        # Like ChatGroq's default, each client gets its own HTTP connection pool
+        http_client = httpx.Client(verify=server.ssl_context) if server.ssl_context else httpx.Client()
+        llm = ChatGroq(model=GROQ_MODEL, api_key=key, groq_api_base=server.url, http_client=http_client,
+                       temperature=0.3, max_tokens=1024, model_kwargs={"top_p": 0.95})
+        return _build_chain(llm)
+    return factory
+
+def run(send, num_requests, concurrency):
+    """Send num_requests requests from `concurrency` threads; return each request's latency."""
+    def timed(_):
+        start = time.perf_counter()
+        send()
+        return time.perf_counter() - start
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(timed, range(num_requests)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--server-latency", type=float, default=0.0, help="Seconds the stub takes per request")
+    parser.add_argument("--no-tls", action="store_true", help="Serve plain HTTP instead of HTTPS")
+    args = parser.parse_args()
+
+    tls = not args.no_tls and shutil.which("openssl") is not None
+    print(f"Stub server over {'HTTPS' if tls else 'HTTP'}, {args.requests} requests per run")
+    print(f"{'policy':>11} {'clients':>8} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'connections':>12}")
+    for concurrency in args.concurrency:
+        for name in ("new client", "pooled"):
+            server = StubChatServer(latency=args.server_latency, tls=tls).start()
+            factory = make_factory(server)
+            if name == "new client":
+                def send():
+                    return factory("stub-key").invoke(INPUTS)
+            else:
+                chain = PooledChain("groq", factory, key="stub-key", pool=ClientPool())
+                def send():
+                    return chain.invoke(INPUTS)
+            send()  # Warm up imports and the pooled client, as a running server would be
+            connections_before = server.connections
+            latencies = run(send, args.requests, concurrency)
+            print(f"{name:>11} {concurrency:>8} {statistics.median(latencies) * 1000:>8.2f} "
+                  f"{percentile(latencies, 0.95) * 1000:>8.2f} {statistics.mean(latencies) * 1000:>8.2f} "
+                  f"{server.connections - connections_before:>12}")
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark of token-budgeted context packing against joining the top chunks.
+
+Retrieves and reranks each question of the retrieval eval set over the
+bundled paper (see benchmarks.retrieval_eval), then builds the context both
+ways. Reports mean prompt tokens, the tokens packing saved and why, the
+tokens it dropped to fit the budget, whether the expected answer is still
+in the context, and time-to-first-token from a stub LLM whose prefill time
+grows with the prompt.
+
+Usage:
+    python -m benchmarks.context_packing [--k 3 6] [--budget 768] [--prompt-token-latency 0.0003]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import warnings
+
+from benchmarks.retrieval_eval import EVAL_DOC_PATH, EVAL_SET_PATH, build_store, load_eval_set
+from benchmarks.stubs import StubLLM, make_stub_chain
+from src.config.settings import CONTEXT_TOKEN_BUDGET_GROQ, RERANK_CANDIDATES
+from src.database import document_store
+from src.database.embedding_providers import HashingEmbeddings
+from src.database.lexical_index import LexicalIndex
+from src.utils.context_packer import CONTEXT_SEPARATOR, ContextPacker, estimate_tokens
+from src.utils.query_handler import PROMPT_TEMPLATE
+from src.utils.reranker import OverlapReranker, rerank
+
+def _normalize(text):
+    return " ".join(text.split()).lower()
+
+def first_token_latency(chain, context, question):
+    """Get the seconds until the chain streams its first token."""
+    start = time.perf_counter()
+    latency = None
+    for _chunk in chain.stream({"context": context, "question": question}):
+        latency = latency or time.perf_counter() - start
+    return latency
+
+def measure(eval_set, results_per_question, build_context, chain):
+    """Get (mean prompt tokens, answer hit rate, median first-token seconds) for one way of building context."""
+    prompt_tokens, hits, latencies = [], 0, []
+    for (question, answer), results in zip(eval_set, results_per_question):
+        context = build_context(results)
+        prompt_tokens.append(estimate_tokens(PROMPT_TEMPLATE.format(context=context, question=question)))
+        hits += _normalize(answer) in _normalize(context)
+        latencies.append(first_token_latency(chain, context, question))
+    return statistics.mean(prompt_tokens), hits / len(eval_set), statistics.median(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 6], help="Chunks retrieved per question")
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKEN_BUDGET_GROQ, help="Context token budget for 3 chunks, scaled with k like the query path")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stub LLM seconds before prefill")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0003,
+                        help="Stub LLM prefill seconds per prompt token")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    eval_set = load_eval_set(EVAL_SET_PATH)
+    embeddings = HashingEmbeddings()
+    reranker = OverlapReranker()
+    chain = make_stub_chain(StubLLM(latency=args.llm_latency, prompt_token_latency=args.prompt_token_latency),
+                            PROMPT_TEMPLATE)
+
+    with tempfile.TemporaryDirectory() as root:
+        db = build_store(EVAL_DOC_PATH, root, embeddings)
+        index = LexicalIndex(document_store.lexical_index_path(root))
+        candidates = [document_store.hybrid_search(db, root, question, embeddings.embed_query(question),
+                                                   RERANK_CANDIDATES)
+                      for question, _answer in eval_set]
+
+        print(f"\n{len(eval_set)} questions, context budget {args.budget} tokens per 3 chunks")
+        print(f"{'k':>3} {'context':>8} {'prompt tokens':>14} {'answer kept':>12} {'TTFT ms':>8}")
+        for k in args.k:
+            budget = args.budget * k // 3
+            results = [rerank(question, pool, k, reranker, index)
+                       for (question, _answer), pool in zip(eval_set, candidates)]
+            packer = ContextPacker()
+            ways = [
+                ("joined", lambda r: CONTEXT_SEPARATOR.join(doc.page_content for doc, _score in r)),
+                ("packed", lambda r: packer.pack(r, budget)[0]),
+            ]
+            for name, build_context in ways:
+                tokens, hit_rate, ttft = measure(eval_set, results, build_context, chain)
+                print(f"{k:>3} {name:>8} {tokens:>14.0f} {hit_rate:>12.0%} {ttft * 1000:>8.0f}")
+
+            reports = [packer.pack(r, budget)[1] for r in results]
+            print(f"    saved ~{statistics.mean(r['tokens_saved'] for r in reports):.0f} context tokens per question: "
+                  f"{sum(r['duplicates'] for r in reports)} duplicate chunks, "
+                  f"~{statistics.mean(r['overlap_tokens'] for r in reports):.0f} overlap tokens per question, "
+                  f"{sum(r['dropped_sections'] for r in reports)} sections over budget "
+                  f"(~{statistics.mean(r['tokens_dropped'] for r in reports):.0f} tokens dropped per question)")
+
+if __name__ == "__main__":
+    main()
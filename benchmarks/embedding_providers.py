@@ -0,0 +1,106 @@
+"""Benchmark of embedding throughput: CPU-local providers vs. the remote API.
+
+Embeds the same synthetic ~800-character chunks with each provider and
+reports chunks/sec for ingestion and the median latency of one question.
+The remote provider is simulated by default (a fixed round-trip per
+100-text request, with requests spread over a few threads like the
+ingestion pipeline); pass --live to call the Google API with the keys in .env.
+The ONNX provider downloads all-MiniLM-L6-v2 on first use and is skipped if
+that isn't possible.
+
+Usage:
+    python -m benchmarks.embedding_providers [--chunks 2000] [--batch-size 64] [--threads 4] [--live]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import random
+import statistics
+import time
+
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from benchmarks.stubs import StubEmbeddings
+from src.config.settings import (
+    API_KEY, EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL, EMBEDDING_WORKERS_PER_KEY, LOCAL_EMBEDDING_THREADS,
+)
+from src.database.embedding_providers import HashingEmbeddings, OnnxEmbeddings
+
+_WORDS = ("translation model error human fluency accuracy corpus sentence grammar lexical style "
+          "reference evaluation score annotator meaning context document language output").split()
+
+def make_chunks(num_chunks, rng, chars=800):
+    """Build chunks of random words about `chars` characters long."""
+    chunks = []
+    for _ in range(num_chunks):
+        words = []
+        while sum(len(w) + 1 for w in words) < chars:
+            words.append(rng.choice(_WORDS))
+        chunks.append(" ".join(words))
+    return chunks
+
+class RemoteEmbeddings:
+    """Embeds in API-sized requests sent concurrently, like the ingestion pipeline."""
+
+    def __init__(self, embeddings, workers):
+        self.embeddings = embeddings
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def embed_documents(self, texts):
+        batches = [texts[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+        return [v for vectors in self.executor.map(self.embeddings.embed_documents, batches) for v in vectors]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+def make_remote(live, latency, workers):
+    """Get the real Google embeddings, or a stub with a fixed round-trip per request."""
+    if live:
+        return RemoteEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=API_KEY()), workers)
+    return RemoteEmbeddings(StubEmbeddings(dimensions=768, latency=latency), workers)
+
+def measure(embeddings, chunks, questions):
+    """Get (dimensions, chunks/sec, median question latency in seconds)."""
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(chunks)
+    throughput = len(chunks) / (time.perf_counter() - start)
+
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        embeddings.embed_query(question)
+        latencies.append(time.perf_counter() - start)
+    return len(vectors[0]), throughput, statistics.median(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64, help="Texts per batch for local providers")
+    parser.add_argument("--threads", type=int, default=LOCAL_EMBEDDING_THREADS, help="ONNX Runtime threads")
+    parser.add_argument("--remote-latency", type=float, default=0.4, help="Simulated seconds per API request")
+    parser.add_argument("--remote-workers", type=int, default=EMBEDDING_WORKERS_PER_KEY,
+                        help="Concurrent API requests (keys x workers per key)")
+    parser.add_argument("--live", action="store_true", help="Call the Google API instead of simulating it")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    chunks = make_chunks(args.chunks, rng)
+    questions = [" ".join(rng.choice(_WORDS) for _ in range(10)) for _ in range(20)]
+
+    providers = [
+        ("hashing", lambda: HashingEmbeddings(batch_size=args.batch_size)),
+        ("onnx", lambda: OnnxEmbeddings(batch_size=args.batch_size, threads=args.threads)),
+        ("remote" + ("" if args.live else " (simulated)"),
+         lambda: make_remote(args.live, args.remote_latency, args.remote_workers)),
+    ]
+
+    print(f"{'provider':>20} {'dims':>6} {'chunks/s':>10} {'question ms':>12}")
+    for name, create in providers:
+        try:
+            dimensions, throughput, question_latency = measure(create(), chunks, questions)
+        except Exception as e:
+            print(f"{name:>20} unavailable: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+            continue
+        print(f"{name:>20} {dimensions:>6} {throughput:>10.0f} {question_latency * 1000:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark of the BM25 keyword index and of hybrid vs. vector-only retrieval.
+
+Part one builds keyword indexes over synthetic chunks and reports index size,
+load time and lookup latency. Part two plants a unique identifier (e.g.
+"ticket TX-0042") in some chunks of a Chroma store built with stub
+embeddings, asks for each identifier, and reports how often the planted
+chunk is in the top 3 with vector search alone and with hybrid search.
+
+Usage:
+    python -m benchmarks.hybrid_retrieval [--chunks 10000 50000] [--recall-chunks 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import warnings
+
+from langchain_chroma import Chroma
+
+from benchmarks.query_load import percentile
+from benchmarks.stubs import StubEmbeddings
+from src.database import document_store
+from src.database.lexical_index import LexicalIndex, LexicalIndexBuilder
+
+_WORDS = ("translation model error human fluency accuracy corpus sentence grammar lexical style reference "
+          "evaluation score annotator meaning context document language output chinese english german "
+          "prompt quality adequacy omission addition mistranslation terminology register idiom").split()
+
+def make_chunks(num_chunks, rng, words_per_chunk=130):
+    """Build chunks of random words, with a little rarer vocabulary mixed in."""
+    return [" ".join(rng.choice(_WORDS) if rng.random() < 0.9 else f"term{rng.randrange(20000)}"
+                     for _ in range(words_per_chunk)) for _ in range(num_chunks)]
+
+def index_latency(num_chunks, rng, queries=200):
+    """Get (build s, file bytes, load ms, lookup latencies) for an index over num_chunks chunks."""
+    chunks = make_chunks(num_chunks, rng)
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "lexical_index.npz")
+        start = time.perf_counter()
+        builder = LexicalIndexBuilder()
+        builder.add([f"chunk-{i}" for i in range(num_chunks)], chunks)
+        builder.save(path)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = LexicalIndex(path)
+        load_time = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(queries):
+            query = " ".join([rng.choice(_WORDS) for _ in range(rng.randint(1, 5))] + [f"term{rng.randrange(20000)}"])
+            start = time.perf_counter()
+            index.search(query, 20)
+            latencies.append(time.perf_counter() - start)
+        return build_time, os.path.getsize(path), load_time, latencies
+
+def exact_term_recall(num_chunks, planted, rng):
+    """Get the top-3 hit rate of (vector only, hybrid) search for planted identifiers."""
+    embeddings = StubEmbeddings()
+    chunks = make_chunks(num_chunks, rng)
+    targets = rng.sample(range(num_chunks), planted)
+    for n, target in enumerate(targets):
+        chunks[target] += f" ticket TX-{n:04d}"
+
+    ids = [f"chunk-{i}" for i in range(num_chunks)]
+    with tempfile.TemporaryDirectory() as root:
+        db = Chroma(persist_directory=root, embedding_function=embeddings)
+        for start in range(0, num_chunks, 500):
+            db.add_texts(chunks[start:start + 500], ids=ids[start:start + 500])
+        builder = LexicalIndexBuilder()
+        builder.add(ids, chunks)
+        builder.save(document_store.lexical_index_path(root))
+
+        vector_hits = hybrid_hits = 0
+        for n, target in enumerate(targets):
+            question = f"what happened with ticket TX-{n:04d}"
+            question_vector = embeddings.embed_query(question)
+            vector_hits += ids[target] in [doc.id for doc, _ in document_store.search_by_vector(db, question_vector, 3)]
+            hybrid_hits += ids[target] in [doc.id for doc, _ in document_store.hybrid_search(
+                db, root, question, question_vector, 3)]
+        return vector_hits / planted, hybrid_hits / planted
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--recall-chunks", type=int, default=2000)
+    parser.add_argument("--planted", type=int, default=50, help="Chunks given a unique identifier")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    document_store.HYBRID_SEARCH = True  # Measure hybrid search whatever HYBRID_SEARCH is set to
+    rng = random.Random(0)
+
+    print(f"{'chunks':>7} {'build s':>8} {'index MB':>9} {'load ms':>8} {'lookup p50 ms':>14} {'lookup p95 ms':>14}")
+    for num_chunks in args.chunks:
+        build_time, size, load_time, latencies = index_latency(num_chunks, rng)
+        print(f"{num_chunks:>7} {build_time:>8.2f} {size / 1e6:>9.2f} {load_time * 1000:>8.1f} "
+              f"{statistics.median(latencies) * 1000:>14.3f} {percentile(latencies, 0.95) * 1000:>14.3f}")
+
+    vector_recall, hybrid_recall = exact_term_recall(args.recall_chunks, args.planted, rng)
+    print(f"\nIdentifier found in top 3 ({args.planted} questions over {args.recall_chunks} chunks): "
+          f"vector {vector_recall:.0%}, hybrid {hybrid_recall:.0%}")
+
+if __name__ == "__main__":
+    main()
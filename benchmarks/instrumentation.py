@@ -0,0 +1,104 @@
+"""Benchmark of the tracing and metrics overhead on the query path.
+
+Answers unique questions with query_document against an in-memory Chroma
+store with stub embeddings and an instant stub LLM, so the query path's own
+work (cache lookups, search, reranking, packing) is all a query costs and
+the instrumentation is as large a share of it as it can be. Rounds
+alternate between metrics off, metrics on with --sample-rate of traces
+logged, and every trace logged, with JSON logs written to /dev/null.
+Reports latency per configuration and its difference from metrics off,
+which is within run-to-run noise, so the overhead is also estimated from
+the cost of an empty trace with as many spans as a question records.
+
+Usage:
+    python -m benchmarks.instrumentation [--queries 500] [--rounds 5] [--sample-rate 0.01]
+"""
+import argparse
+from contextlib import redirect_stdout
+import os
+import statistics
+import time
+import warnings
+
+from benchmarks.query_load import build_store, install_stubs, percentile
+from benchmarks.stubs import StubEmbeddings, StubLLM
+from src.config.settings import TRACE_SAMPLE_RATE
+from src.utils import query_handler, tracing
+from src.utils.metrics import STAGE_SECONDS, get_metrics
+from src.utils.semantic_cache import get_semantic_cache
+
+def configure(metrics_enabled, sample_rate):
+    """Turn metrics on or off and set the share of traces logged."""
+    get_metrics().enabled = metrics_enabled
+    tracing.TRACE_SAMPLE_RATE = sample_rate
+
+def run_queries(num_queries, offset):
+    """Answer num_queries unique questions; return each one's latency."""
+    latencies = []
+    for i in range(num_queries):
+        question = f"question {offset + i} about translation quality topic {i % 50}"
+        start = time.perf_counter()
+        query_handler.query_document(question, "instrumentation")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def trace_cost(spans, repeats=20000):
+    """Get the microseconds a trace with `spans` empty spans takes, as recorded per question."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        with tracing.trace("bench", document="bench"):
+            for _ in range(spans):
+                with tracing.span("bench_span"):
+                    pass
+    return (time.perf_counter() - start) / repeats * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500, help="Questions per configuration per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--sample-rate", type=float, default=TRACE_SAMPLE_RATE, help="Share of traces logged")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    install_stubs(build_store(args.chunks, StubEmbeddings()), StubLLM(latency=0.0))
+    # Unique questions only: no semantic cache hits from colliding stub embeddings
+    get_semantic_cache().threshold = 1.01
+    tracing.LOG_FORMAT = "json"
+
+    configs = [("metrics off", False, 0.0), (f"sampled {args.sample_rate:g}", True, args.sample_rate),
+               ("all traced", True, 1.0)]
+    latencies = {name: [] for name, _enabled, _rate in configs}
+    offset = 0
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        configure(False, 0.0)
+        run_queries(50, -1000)  # Warm up the store, caches and chain
+        for _round in range(args.rounds):
+            for name, enabled, rate in configs:
+                configure(enabled, rate)
+                get_semantic_cache().clear()
+                latencies[name].extend(run_queries(args.queries, offset))
+                offset += args.queries
+
+        # Spans per question, the root trace's total time included
+        measured_queries = args.rounds * args.queries * sum(1 for _name, enabled, _rate in configs if enabled)
+        spans_per_query = sum(series["count"] for series in get_metrics().get_stats(STAGE_SECONDS)
+                              if series["document"] == "instrumentation") / measured_queries
+        costs = {}
+        for name, enabled, rate in configs:
+            configure(enabled, rate)
+            costs[name] = trace_cost(round(spans_per_query) - 1)
+
+    baseline = statistics.mean(latencies[configs[0][0]])
+    print(f"{args.rounds} rounds of {args.queries} questions per configuration, "
+          f"{spans_per_query:.1f} spans per question")
+    print(f"{'configuration':>14} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'vs. off':>8} "
+          f"{'trace us':>9} {'overhead':>9}")
+    for name, _enabled, _rate in configs:
+        mean = statistics.mean(latencies[name])
+        print(f"{name:>14} {statistics.median(latencies[name]) * 1000:>8.3f} "
+              f"{percentile(latencies[name], 0.95) * 1000:>8.3f} {mean * 1000:>8.3f} "
+              f"{(mean - baseline) / baseline:>8.2%} {costs[name]:>9.1f} {costs[name] / 1000 / (baseline * 1000):>9.2%}")
+
+if __name__ == "__main__":
+    main()
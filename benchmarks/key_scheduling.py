@@ -0,0 +1,180 @@
+"""Simulation of API key scheduling under per-key quotas: 429s and sustained throughput.
+
+A simulated API enforces a per-minute request quota on each key as a token
+bucket and answers requests over quota with a 429. One key's real quota is
+lower than the configured one (as when a key is shared with another
+project). Clients send requests back to back through either the previous
+policy (a random key other than the last one, with exponential backoff
+after a 429, as ingestion used to retry) or ApiKeyLoadBalancer leases. Time
+is compressed: --time-scale simulated seconds pass per real second, so a
+quota minute is 60 / time-scale seconds.
+
+Usage:
+    python -m benchmarks.key_scheduling [--keys 5] [--rpm 60] [--clients 3 8 32] [--seconds 600]
+"""
+import argparse
+from contextlib import redirect_stdout
+import io
+import random
+import statistics
+import threading
+import time
+
+from benchmarks.query_load import percentile
+from src.config.settings import (
+    API_KEY_COOLDOWN_BASE,
+    API_KEY_COOLDOWN_MAX,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RETRY_BASE_DELAY,
+)
+from src.utils.api_load_balancer import ApiKeyLoadBalancer, is_rate_limit_error
+
+class RateLimitError(Exception):
+    """The simulated API's 429 response."""
+
+    status_code = 429
+
+class SimulatedApi:
+    """API enforcing a request quota per key as a token bucket refilled over the window."""
+
+    def __init__(self, quotas, window, latency):
+        """Initialize the API.
+
+        Args:
+            quotas: Requests each key may send per window, by key
+            window: Seconds a quota refills over
+            latency: Seconds an accepted request takes
+        """
+        self.quotas = quotas
+        self.window = window
+        self.latency = latency
+        self.buckets = {key: float(quota) for key, quota in quotas.items()}
+        self.updated = {key: time.monotonic() for key in quotas}
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+
+    def call(self, key):
+        """Send a request with a key, raising RateLimitError if it's over quota."""
+        with self.lock:
+            now = time.monotonic()
+            quota = self.quotas[key]
+            self.buckets[key] = min(quota, self.buckets[key] + (now - self.updated[key]) * quota / self.window)
+            self.updated[key] = now
+            if self.buckets[key] < 1:
+                self.rejected += 1
+                raise RateLimitError("429 RESOURCE_EXHAUSTED")
+            self.buckets[key] -= 1
+            self.accepted += 1
+        time.sleep(self.latency)
+
+class RandomKeyPolicy:
+    """The previous policy: a random key other than the last one used, backing off after a 429."""
+
+    def __init__(self, api_keys, backoff):
+        self.api_keys = api_keys
+        self.backoff = backoff
+        self.last_used_key = None
+        self.lock = threading.Lock()
+
+    def send(self, api):
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            with self.lock:
+                key = random.choice([key for key in self.api_keys if key != self.last_used_key])
+                self.last_used_key = key
+            try:
+                return api.call(key)
+            except RateLimitError:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+class SchedulerPolicy:
+    """ApiKeyLoadBalancer leases, retrying a 429 on whichever key has quota next."""
+
+    def __init__(self, api_keys, rpm, window, max_in_flight, scale):
+        self.balancer = ApiKeyLoadBalancer(
+            api_keys=api_keys, requests_per_minute=rpm, max_in_flight=max_in_flight,
+            cooldown_base=API_KEY_COOLDOWN_BASE / scale, cooldown_max=API_KEY_COOLDOWN_MAX / scale, window=window,
+        )
+
+    def send(self, api):
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                with self.balancer.lease() as key:
+                    return api.call(key)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+
+def simulate(policy, api, clients, duration):
+    """Send requests from `clients` threads for `duration` seconds.
+
+    Returns:
+        tuple: (completed requests, failed requests, latencies of completed requests)
+    """
+    latencies, failed = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                policy.send(api)
+            except RateLimitError:
+                with lock:
+                    failed[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), failed[0], latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=5)
+    parser.add_argument("--rpm", type=int, default=60, help="Configured requests per minute per key")
+    parser.add_argument("--weak-key-share", type=float, default=0.5, help="Real quota of the first key, as a share of --rpm")
+    parser.add_argument("--clients", type=int, nargs="+", default=[3, 8, 32], help="Clients sending requests back to back")
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per accepted request")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="Scheduler's requests in flight per key")
+    parser.add_argument("--seconds", type=float, default=600, help="Simulated seconds per run")
+    parser.add_argument("--time-scale", type=float, default=60, help="Simulated seconds per real second")
+    args = parser.parse_args()
+
+    scale = args.time_scale
+    window = 60 / scale
+    api_keys = [f"key-{i + 1}" for i in range(args.keys)]
+    quotas = {key: args.rpm for key in api_keys}
+    quotas[api_keys[0]] = max(1, int(args.rpm * args.weak_key_share))
+    capacity = sum(quotas.values())
+    minutes = args.seconds / 60
+    ceiling = capacity * (minutes + 1) / minutes  # Buckets start full, so the first minute's quota comes on top
+    print(f"{args.keys} keys, {args.rpm} requests/min configured ({quotas[api_keys[0]]} real on {api_keys[0]}), "
+          f"quota ceiling {ceiling:.0f} requests/min over {args.seconds:.0f} simulated seconds")
+
+    policies = [
+        ("random", lambda: RandomKeyPolicy(api_keys, EMBEDDING_RETRY_BASE_DELAY / scale)),
+        ("scheduler", lambda: SchedulerPolicy(api_keys, args.rpm, window, args.max_in_flight, scale)),
+    ]
+    print(f"\n{'clients':>7} {'policy':>10} {'429s':>6} {'failed':>7} {'ok/min':>7} {'of ceiling':>11} "
+          f"{'p50 s':>7} {'p95 s':>7}")
+    for clients in args.clients:
+        for name, make_policy in policies:
+            api = SimulatedApi(quotas, window, args.latency / scale)
+            with redirect_stdout(io.StringIO()):  # Keep the scheduler's per-429 log lines out of the table
+                completed, failed, latencies = simulate(make_policy(), api, clients, args.seconds / scale)
+            per_minute = completed / minutes
+            p50 = statistics.median(latencies) * scale if latencies else float("nan")
+            p95 = percentile(latencies, 0.95) * scale if latencies else float("nan")
+            print(f"{clients:>7} {name:>10} {api.rejected:>6} {failed:>7} {per_minute:>7.0f} "
+                  f"{per_minute / ceiling:>11.0%} {p50:>7.1f} {p95:>7.1f}")
+
+if __name__ == "__main__":
+    main()
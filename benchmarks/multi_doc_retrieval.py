@@ -0,0 +1,97 @@
+"""Benchmark of multi-document retrieval: sequential search vs. parallel fan-out.
+
+Builds persistent Chroma stores with stub embeddings and times search_documents
+over all of them, with one worker (sequential) and with the shared pool. The
+reference is the slowest single-store search: fan-out latency should stay
+close to it rather than to the sum. --store-latency adds a fixed delay per
+store search, standing in for disk or network time on larger stores.
+
+Usage:
+    python -m benchmarks.multi_doc_retrieval [--documents 2 8 32] [--chunks 200] [--store-latency 0.02]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import statistics
+import tempfile
+import time
+import warnings
+
+from langchain_chroma import Chroma
+
+from benchmarks.stubs import StubEmbeddings
+from src.database import document_store
+from src.database.handle_pool import ChromaHandlePool
+from src.utils import tracing
+
+_search_by_vector = document_store.search_by_vector
+
+QUESTION = "which translation errors are most common"
+
+def build_stores(root, num_docs, num_chunks, embeddings):
+    """Build one persistent store per document and return their paths."""
+    paths = []
+    for doc in range(num_docs):
+        path = os.path.join(root, f"doc_{doc}")
+        texts = [f"document {doc} chunk {i} covers translation topic {i % 40} and error type {i % 9}"
+                 for i in range(num_chunks)]
+        db = Chroma(persist_directory=path, embedding_function=embeddings)
+        db.add_texts(texts, ids=[f"chunk-{i}" for i in range(num_chunks)])
+        paths.append(path)
+    return paths
+
+def install(embeddings, store_latency, workers):
+    """Point document_store at the benchmark stores, with a fresh handle pool and executor."""
+    def slow_search(db, question_vector, k=3):
+        time.sleep(store_latency)
+        return _search_by_vector(db, question_vector, k)
+
+    document_store.search_by_vector = slow_search
+    document_store.resolve_db_path = lambda doc_path: doc_path
+    document_store._handle_pool = ChromaHandlePool(
+        lambda path: Chroma(persist_directory=path, embedding_function=embeddings), max_open=1000
+    )
+    document_store._retrieval_executor = ThreadPoolExecutor(max_workers=workers)
+
+def time_search(paths, question_vector, repeats):
+    """Get the median seconds of search_documents over paths."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        document_store.search_documents(QUESTION, question_vector, paths)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, nargs="+", default=[2, 8, 32])
+    parser.add_argument("--chunks", type=int, default=200, help="Chunks per document")
+    parser.add_argument("--store-latency", type=float, default=0.02, help="Seconds added to each store search")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    tracing.LOG_FORMAT = "none"
+    embeddings = StubEmbeddings()
+    question_vector = embeddings.embed_query(QUESTION)
+
+    print(f"{'docs':>5} {'slowest store ms':>17} {'sequential ms':>14} {'fan-out ms':>11} {'speedup':>8}")
+    for num_docs in args.documents:
+        with tempfile.TemporaryDirectory() as root:
+            paths = build_stores(root, num_docs, args.chunks, embeddings)
+
+            # Warm every handle first so both modes measure search, not opening
+            install(embeddings, args.store_latency, args.workers)
+            time_search(paths, question_vector, 1)
+            slowest = max(time_search([path], question_vector, args.repeats) for path in paths)
+            fan_out = time_search(paths, question_vector, args.repeats)
+
+            document_store._retrieval_executor = ThreadPoolExecutor(max_workers=1)
+            sequential = time_search(paths, question_vector, args.repeats)
+
+            print(f"{num_docs:>5} {slowest * 1000:>17.1f} {sequential * 1000:>14.1f} "
+                  f"{fan_out * 1000:>11.1f} {sequential / fan_out:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
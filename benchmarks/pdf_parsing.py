@@ -0,0 +1,67 @@
+"""Benchmark multi-process PDF parsing: pages/sec against worker count.
+
+Usage:
+    python -m benchmarks.pdf_parsing [--workers 1 2 4 8] [--pages 1000]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from src.database.pdf_parser import count_pages, iter_parsed_windows, parse_page_range
+
+BUNDLED_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "GPT-4_VS_Human_translators.pdf")
+
+def run_serial(path, window_pages):
+    """Parse a PDF on the calling thread, window by window."""
+    total_pages = count_pages(path)
+    chunks = 0
+    for start in range(0, total_pages, window_pages):
+        chunks += len(parse_page_range(path, start, min(start + window_pages, total_pages)))
+    return total_pages, chunks
+
+def run_pool(path, window_pages, workers):
+    """Parse a PDF with a process pool of the given size."""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm the workers up so process start-up isn't counted as parse time
+        list(executor.map(count_pages, [path] * workers))
+
+        start = time.perf_counter()
+        total_pages = chunks = 0
+        for _pages_done, total_pages, window in iter_parsed_windows(path, window_pages, executor, workers):
+            chunks += len(window)
+        return time.perf_counter() - start, total_pages, chunks
+
+def benchmark(path, worker_counts, window_pages):
+    """Print pages/sec for each worker count on one PDF."""
+    print(f"\n{os.path.basename(path)}")
+    print(f"{'workers':>8} {'pages':>7} {'chunks':>7} {'seconds':>9} {'pages/sec':>10} {'speedup':>8}")
+
+    start = time.perf_counter()
+    total_pages, chunks = run_serial(path, window_pages)
+    baseline = time.perf_counter() - start
+    print(f"{'serial':>8} {total_pages:>7} {chunks:>7} {baseline:>9.2f} {total_pages / baseline:>10.1f} {1.0:>8.2f}")
+
+    for workers in worker_counts:
+        elapsed, total_pages, chunks = run_pool(path, window_pages, workers)
+        print(f"{workers:>8} {total_pages:>7} {chunks:>7} {elapsed:>9.2f} "
+              f"{total_pages / elapsed:>10.1f} {baseline / elapsed:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pages", type=int, default=1000, help="Pages in the synthetic PDF")
+    parser.add_argument("--window-pages", type=int, default=20)
+    args = parser.parse_args()
+
+    if os.path.exists(BUNDLED_PDF):
+        benchmark(BUNDLED_PDF, args.workers, args.window_pages)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic_path = write_synthetic_pdf(os.path.join(tmp_dir, f"synthetic_{args.pages}.pdf"), args.pages)
+        benchmark(synthetic_path, args.workers, args.window_pages)
+
+if __name__ == "__main__":
+    main()
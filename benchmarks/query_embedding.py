@@ -0,0 +1,75 @@
+"""Benchmark of the question embedding cache on a workload with repeated questions.
+
+Replays a stream of questions where a share are repeats or near-repeats
+(different case, spacing or trailing punctuation) of earlier ones, embedding
+and searching each against an in-memory Chroma store built with stub
+embeddings. Reports embedding calls and retrieval latency with the cache
+disabled and enabled.
+
+Usage:
+    python -m benchmarks.query_embedding [--questions 500] [--repeat-share 0.5] [--embed-latency 0.1]
+"""
+import argparse
+import random
+import statistics
+import time
+import warnings
+
+from benchmarks.query_load import build_store, install_stubs, percentile
+from benchmarks.stubs import StubEmbeddings, StubLLM
+from src.utils import query_embedding_cache, query_handler
+
+def make_workload(num_questions, repeat_share, rng):
+    """Build a question stream where repeat_share of the questions were asked before."""
+    asked = []
+    workload = []
+    for i in range(num_questions):
+        if asked and rng.random() < repeat_share:
+            question = rng.choice(asked)
+            variant = rng.randrange(3)
+            if variant == 1:
+                question = question.upper()
+            elif variant == 2:
+                question = f"  {question.rstrip('?')} "
+        else:
+            question = f"what does section {i} say about translation error type {i % 9}?"
+            asked.append(question)
+        workload.append(question)
+    return workload
+
+def run(workload, embeddings, max_entries):
+    """Retrieve context for every question; return (embedding calls, latencies)."""
+    query_embedding_cache._query_embedding_cache = query_embedding_cache.QueryEmbeddingCache(max_entries)
+    calls_before = embeddings.calls
+    latencies = []
+    for question in workload:
+        start = time.perf_counter()
+        question_vector = query_handler._embed_question(question, "benchmark")
+        query_handler._search_document("benchmark", question, question_vector)
+        latencies.append(time.perf_counter() - start)
+    return embeddings.calls - calls_before, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--repeat-share", type=float, default=0.5, help="Share of questions asked before")
+    parser.add_argument("--embed-latency", type=float, default=0.1, help="Seconds per embedding API call")
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--cache-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    embeddings = StubEmbeddings()
+    db = build_store(args.chunks, embeddings)
+    embeddings.latency = args.embed_latency
+    install_stubs(db, StubLLM(latency=0.0))
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+
+    workload = make_workload(args.questions, args.repeat_share, random.Random(0))
+    print(f"{'cache':>8} {'embed calls':>12} {'p50 ms':>8} {'p95 ms':>8} {'total s':>8}")
+    for label, max_entries in (("off", 0), ("on", args.cache_size)):
+        calls, latencies = run(workload, embeddings, max_entries)
+        print(f"{label:>8} {calls:>12} {statistics.median(latencies) * 1000:>8.1f} "
+              f"{percentile(latencies, 0.95) * 1000:>8.1f} {sum(latencies):>8.1f}")
+
+if __name__ == "__main__":
+    main()
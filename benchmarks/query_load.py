@@ -0,0 +1,135 @@
+"""Load test comparing the sync query path with aquery_document.
+
+Both paths run against an in-memory Chroma store built with stub embeddings and
+a stub LLM, so the results measure the query pipeline itself, not the network.
+The sync path runs on a bounded thread pool, like Gradio's worker threads; the
+async path runs every request on one event loop.
+
+Usage:
+    python -m benchmarks.query_load [--requests 200] [--llm-latency 0.5] [--p95-target 1.0]
+"""
+import argparse
+import asyncio
+from contextlib import nullcontext
+import statistics
+import threading
+import time
+import warnings
+
+from langchain_chroma import Chroma
+
+from benchmarks.stubs import StubEmbeddings, StubLLM, make_stub_chain
+from src.utils import query_handler, tracing
+from src.utils.semantic_cache import get_semantic_cache
+
+def build_store(num_chunks, embeddings):
+    """Build an in-memory Chroma store with synthetic chunks."""
+    texts = [f"chunk {i} discusses translation quality topic {i % 50} and error category {i % 7}"
+             for i in range(num_chunks)]
+    return Chroma.from_texts(texts, embedding=embeddings, collection_name=f"load_test_{time.time_ns()}")
+
+def install_stubs(db, llm):
+    """Point query_handler at the stub store and LLM chain."""
+    chain = make_stub_chain(llm, query_handler.PROMPT_TEMPLATE)
+    query_handler.open_database = lambda doc_path=None: nullcontext(db)
+    query_handler.get_chain = lambda use_fallback=False: chain
+
+def percentile(values, fraction):
+    """Get a percentile of a list of latencies."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run_sync(num_requests, concurrency, threads):
+    """Fire num_requests at the sync path with `concurrency` clients.
+
+    Only `threads` requests run at once; time spent waiting for a worker thread
+    counts towards a request's latency, as it does for a user.
+    """
+    latencies = []
+    workers = threading.Semaphore(threads)
+    remaining = iter(range(num_requests))
+    remaining_lock = threading.Lock()
+
+    def client():
+        while True:
+            with remaining_lock:
+                i = next(remaining, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            with workers:
+                query_handler.query_document(f"sync question {concurrency} {i}", "load-test")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+async def run_async(num_requests, concurrency):
+    """Fire num_requests at the async path with `concurrency` clients."""
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(num_requests):
+        queue.put_nowait(i)
+
+    async def client():
+        while not queue.empty():
+            i = queue.get_nowait()
+            start = time.perf_counter()
+            await query_handler.aquery_document(f"async question {concurrency} {i}", "load-test")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32, 64])
+    parser.add_argument("--sync-threads", type=int, default=40, help="Worker threads available to the sync path")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--p95-target", type=float, default=1.0, help="p95 latency budget in seconds")
+    args = parser.parse_args()
+
+    embeddings = StubEmbeddings()
+    db = build_store(args.chunks, embeddings)
+    embeddings.latency = args.embed_latency
+    install_stubs(db, StubLLM(latency=args.llm_latency))
+
+    # Keep the per-request prints and relevance-score warnings out of the measurements
+    tracing.LOG_FORMAT = "none"
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+
+    # Every question is unique, but the stub embeddings collide often enough to
+    # produce semantic cache hits, so only exact repeats may hit the cache
+    get_semantic_cache().threshold = 1.01
+
+    best = {"sync": 0.0, "async": 0.0}
+    print(f"{'path':>6} {'clients':>8} {'QPS':>8} {'p50':>7} {'p95':>7} {'p99':>7}")
+    for concurrency in args.concurrency:
+        for path in ("sync", "async"):
+            get_semantic_cache().clear()
+            if path == "sync":
+                elapsed, latencies = run_sync(args.requests, concurrency, args.sync_threads)
+            else:
+                elapsed, latencies = asyncio.run(run_async(args.requests, concurrency))
+
+            qps = len(latencies) / elapsed
+            p95 = percentile(latencies, 0.95)
+            if p95 <= args.p95_target:
+                best[path] = max(best[path], qps)
+            print(f"{path:>6} {concurrency:>8} {qps:>8.1f} {statistics.median(latencies):>7.3f} "
+                  f"{p95:>7.3f} {percentile(latencies, 0.99):>7.3f}")
+
+    print(f"\nSustained QPS with p95 <= {args.p95_target:.2f}s: "
+          f"sync {best['sync']:.1f}, async {best['async']:.1f}")
+
+if __name__ == "__main__":
+    main()
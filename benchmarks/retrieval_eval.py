@@ -0,0 +1,118 @@
+"""Retrieval quality eval: recall and prompt size with and without reranking.
+
+Indexes a PDF (the bundled paper by default) into a temporary store with a
+keyword index, asks each question of an eval set, and checks whether a
+retrieved chunk contains the expected answer text. Each reranker keeps the
+best k of the same over-fetched candidates and is reported with hit rate
+(recall@k), MRR, context characters sent to the LLM and reranking latency.
+Embeddings are NumPy feature hashing by default so the eval runs offline;
+pass --configured-embeddings to use EMBEDDING_PROVIDER.
+
+Usage:
+    python -m benchmarks.retrieval_eval [--doc paper.pdf --eval-set questions.jsonl] [--k 3] [--candidates 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import warnings
+
+from langchain_chroma import Chroma
+
+from benchmarks.query_load import percentile
+from src.config.settings import RERANK_CANDIDATES
+from src.database import document_store
+from src.database.embedding_pipeline import chunk_ids
+from src.database.embedding_providers import HashingEmbeddings
+from src.database.lexical_index import LexicalIndex, LexicalIndexBuilder
+from src.utils.reranker import CrossEncoderReranker, OverlapReranker, RerankScoreCache, rerank
+
+# The eval set's questions are about the paper bundled at the repository root
+EVAL_SET_PATH = os.path.join(os.path.dirname(__file__), "retrieval_eval_set.jsonl")
+EVAL_DOC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "GPT-4_VS_Human_translators.pdf")
+
+def load_eval_set(path):
+    """Load (question, expected answer text) pairs from a JSON-lines file."""
+    with open(path, encoding="utf-8") as f:
+        return [(entry["question"], entry["answer"]) for entry in map(json.loads, f) if entry]
+
+def _normalize(text):
+    return " ".join(text.split()).lower()
+
+def build_store(doc_path, root, embeddings):
+    """Index a document's chunks into a Chroma store and keyword index under root."""
+    db = Chroma(persist_directory=root, embedding_function=embeddings)
+    builder = LexicalIndexBuilder()
+    for _pages_read, _total_pages, chunks in document_store.iter_document_chunks(doc_path):
+        ids = chunk_ids(len(builder.ids), len(chunks))
+        db.add_documents(chunks, ids=ids)
+        builder.add(ids, [chunk.page_content for chunk in chunks])
+    builder.save(document_store.lexical_index_path(root))
+    return db
+
+def evaluate(candidates, eval_set, reranker, index, k, budget_ms):
+    """Rerank each question's candidates and score the kept chunks.
+
+    Returns:
+        dict: hit rate, MRR, mean context characters, and reranking latency percentiles (ms)
+    """
+    cache = RerankScoreCache()  # Fresh per reranker, so latencies include scoring
+    hits, reciprocal_ranks, context_chars, latencies = 0, [], [], []
+    for (question, answer), results in zip(eval_set, candidates):
+        start = time.perf_counter()
+        kept = rerank(question, results, k, reranker, index, cache=cache, budget_ms=budget_ms)
+        latencies.append(time.perf_counter() - start)
+
+        ranks = [rank for rank, (doc, _score) in enumerate(kept, 1) if _normalize(answer) in _normalize(doc.page_content)]
+        hits += bool(ranks)
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+        context_chars.append(sum(len(doc.page_content) for doc, _score in kept))
+    return {
+        "hit_rate": hits / len(eval_set),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "context_chars": statistics.mean(context_chars),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doc", default=EVAL_DOC_PATH)
+    parser.add_argument("--eval-set", default=EVAL_SET_PATH)
+    parser.add_argument("--k", type=int, default=3, help="Chunks kept for the prompt")
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES, help="Chunks over-fetched for reranking")
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="Reranking latency budget per question")
+    parser.add_argument("--configured-embeddings", action="store_true",
+                        help="Embed with EMBEDDING_PROVIDER instead of offline feature hashing")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    eval_set = load_eval_set(args.eval_set)
+    embeddings = document_store.get_embedding_function() if args.configured_embeddings else HashingEmbeddings()
+
+    with tempfile.TemporaryDirectory() as root:
+        db = build_store(args.doc, root, embeddings)
+        candidates = [document_store.hybrid_search(db, root, question, embeddings.embed_query(question), args.candidates)
+                      for question, _answer in eval_set]
+        index = LexicalIndex(document_store.lexical_index_path(root))
+
+        rerankers = [("none", None), ("overlap", OverlapReranker())]
+        try:
+            rerankers.append(("cross-encoder", CrossEncoderReranker()))
+        except Exception as e:
+            print(f"cross-encoder reranker unavailable: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+
+        print(f"\n{len(eval_set)} questions, best {args.k} of {args.candidates} hybrid candidates")
+        pool = evaluate(candidates, eval_set, None, index, args.candidates, args.budget_ms)
+        print(f"{'reranker':>14} {'hit@k':>6} {'MRR':>6} {'context chars':>14} {'p50 ms':>7} {'p95 ms':>7}")
+        print(f"{'(candidates)':>14} {pool['hit_rate']:>6.0%} {pool['mrr']:>6.2f} {pool['context_chars']:>14.0f}")
+        for name, reranker in rerankers:
+            result = evaluate(candidates, eval_set, reranker, index, args.k, args.budget_ms)
+            print(f"{name:>14} {result['hit_rate']:>6.0%} {result['mrr']:>6.2f} {result['context_chars']:>14.0f} "
+                  f"{result['p50_ms']:>7.2f} {result['p95_ms']:>7.2f}")
+
+if __name__ == "__main__":
+    main()
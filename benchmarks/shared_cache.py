@@ -0,0 +1,127 @@
+"""Benchmark of the shared cache backends used by query_document.
+
+Measures get/set latency of each backend, then runs several worker processes
+that answer the same questions about the same document, counting how many LLM
+calls each backend saves. The Redis backend runs against the in-process stand-in
+server from benchmarks/stubs.py.
+
+Usage:
+    python -m benchmarks.shared_cache [--workers 4] [--questions 20] [--ops 2000]
+"""
+import argparse
+from contextlib import nullcontext
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import warnings
+
+from benchmarks.stubs import StubEmbeddings, StubLLM, StubRedisServer, make_stub_chain
+from src.database.document_registry import DocumentRegistry
+from src.utils.shared_cache import MemoryCacheBackend, SQLiteCacheBackend, RedisCacheBackend
+
+def create_backend(name, workdir, redis_url):
+    """Create a backend by name, storing any files under workdir."""
+    if name == "memory":
+        return MemoryCacheBackend()
+    if name == "sqlite":
+        return SQLiteCacheBackend(cache_path=os.path.join(workdir, "shared_cache.sqlite3"))
+    return RedisCacheBackend(url=redis_url)
+
+def measure_ops(backend, num_ops, value_size):
+    """Time num_ops sets followed by num_ops gets, returning microseconds per op."""
+    value = "x" * value_size
+    start = time.perf_counter()
+    for i in range(num_ops):
+        backend.set(f"bench:{i}", value)
+    set_us = (time.perf_counter() - start) / num_ops * 1e6
+
+    start = time.perf_counter()
+    for i in range(num_ops):
+        backend.get(f"bench:{i}")
+    get_us = (time.perf_counter() - start) / num_ops * 1e6
+    return set_us, get_us
+
+def run_worker(worker_id, backend_name, workdir, redis_url, doc_path, questions, llm_latency):
+    """Answer every question once in a fresh process and return the number of LLM calls."""
+    from langchain_chroma import Chroma
+    from src.database import document_registry
+    from src.utils import query_handler, shared_cache, tracing
+    from src.utils.semantic_cache import get_semantic_cache
+
+    warnings.filterwarnings("ignore")
+    tracing.LOG_FORMAT = "none"
+
+    embeddings = StubEmbeddings()
+    texts = [f"chunk {i} discusses translation quality topic {i % 50}" for i in range(200)]
+    db = Chroma.from_texts(texts, embedding=embeddings, collection_name=f"shared_cache_{worker_id}")
+    llm = StubLLM(latency=llm_latency)
+    chain = make_stub_chain(llm, query_handler.PROMPT_TEMPLATE)
+    query_handler.open_database = lambda doc_path=None: nullcontext(db)
+    query_handler.get_chain = lambda use_fallback=False: chain
+
+    document_registry._registry = DocumentRegistry(os.path.join(workdir, "registry.sqlite3"))
+    shared_cache._shared_cache = create_backend(backend_name, workdir, redis_url)
+    # Stub embeddings collide often; keep the per-process semantic tier to exact repeats
+    get_semantic_cache().threshold = 1.01
+
+    order = list(questions)
+    random.Random(worker_id).shuffle(order)
+    for question in order:
+        query_handler.query_document(question, doc_path)
+    return llm.calls
+
+def run_workers(backend_name, num_workers, questions, llm_latency, redis_url):
+    """Run num_workers processes against one backend; return (LLM calls, seconds)."""
+    with tempfile.TemporaryDirectory() as workdir:
+        doc_path = os.path.join(workdir, "document.pdf")
+        with open(doc_path, "w") as f:
+            f.write("stand-in document contents")
+        # Register the document as fully indexed, since only those answers are shared
+        db_path = os.path.join(workdir, "document")
+        os.makedirs(db_path)
+        with open(os.path.join(db_path, "chroma.sqlite3"), "w") as f:
+            f.write("stand-in store")
+        registry = DocumentRegistry(os.path.join(workdir, "registry.sqlite3"))
+        registry.register(registry.content_hash(doc_path), db_path, doc_path)
+
+        context = multiprocessing.get_context("spawn")
+        start = time.perf_counter()
+        with context.Pool(num_workers) as pool:
+            calls = pool.starmap(run_worker, [
+                (i, backend_name, workdir, redis_url, doc_path, questions, llm_latency)
+                for i in range(num_workers)
+            ])
+        return sum(calls), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite", "redis"])
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--value-size", type=int, default=2000, help="Bytes per cached value")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = StubRedisServer().start()
+
+    print(f"{'backend':>8} {'set us':>9} {'get us':>9}")
+    for name in args.backends:
+        with tempfile.TemporaryDirectory() as workdir:
+            set_us, get_us = measure_ops(create_backend(name, workdir, server.url), args.ops, args.value_size)
+        print(f"{name:>8} {set_us:>9.1f} {get_us:>9.1f}")
+
+    questions = [f"What does section {i} say about translation quality?" for i in range(args.questions)]
+    print(f"\n{args.workers} workers x {args.questions} questions:")
+    print(f"{'backend':>8} {'LLM calls':>10} {'saved':>7} {'seconds':>8}")
+    for name in args.backends:
+        calls, elapsed = run_workers(name, args.workers, questions, args.llm_latency, server.url)
+        saved = 1 - calls / (args.workers * args.questions)
+        print(f"{name:>8} {calls:>10} {saved:>7.0%} {elapsed:>8.2f}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
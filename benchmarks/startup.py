@@ -0,0 +1,170 @@
+"""Benchmark of startup time: import cost and time until the app is listening and ready.
+
+Runs `python -X importtime` on what startup imports before the interface
+can listen and on the modules deferred to the background warm-up, and
+lists the top-level packages costing the most. Then starts the app in a
+child process, with a fresh temporary CHROMA_PATH and the hashing
+embeddings, in two orders:
+
+- eager: import everything, index the default document, then launch (as
+  main.py used to)
+- deferred: start the /ready probe, import Gradio, launch, then warm up in
+  the background (as main.py does)
+
+It reports the seconds from process start until the probe answers, the
+interface accepts connections and the default document is ready. The
+public share link is not created.
+
+Usage:
+    python -m benchmarks.startup [--repeat 3] [--top 15]
+"""
+import argparse
+from collections import defaultdict
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.pdf_parsing import BUNDLED_PDF
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What startup imports before the interface can listen, and what the warm-up imports after
+STARTUP_IMPORTS = "import main; import src.ui.app"
+DEFERRED_IMPORTS = ("import src.database.ingestion_jobs, src.utils.query_handler; "
+                    "import langchain_groq, langchain_google_genai")
+
+# Child process bodies; {pdf} is the default document and the ports come from the environment
+_EAGER = """
+import os
+import langchain_community.document_loaders, langchain_google_genai, langchain_groq
+from src.database.document_store import initialize_database
+from src.ui.app import create_chat_interface
+import src.database.ingestion_jobs, src.utils.query_handler
+initialize_database({pdf!r})
+create_chat_interface().launch(server_port=int(os.environ["UI_PORT"]), prevent_thread_lock=True)
+input()
+"""
+_DEFERRED = """
+import os
+from src.utils.metrics import start_metrics_server
+from src.utils.warmup import get_readiness, start_warmup
+start_metrics_server(port=int(os.environ["METRICS_PORT"]), readiness=get_readiness)
+from src.ui.app import create_chat_interface
+create_chat_interface().launch(server_port=int(os.environ["UI_PORT"]), prevent_thread_lock=True)
+start_warmup({pdf!r})
+input()
+"""
+
+def free_port():
+    """Get a port nothing is listening on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def child_env(chroma_path, **extra):
+    """Get the environment of an offline child process with its own store."""
+    return dict(os.environ, CHROMA_PATH=chroma_path, SHARED_CHROMA_PATH=os.path.join(chroma_path, "shared"),
+                EMBEDDING_CACHE_PATH=os.path.join(chroma_path, "embedding_cache.sqlite3"),
+                EMBEDDING_PROVIDER="hashing", SHARED_CACHE_BACKEND="none", DOC_PATH=BUNDLED_PDF,
+                LOG_FORMAT="none", GRADIO_ANALYTICS_ENABLED="False", **extra)
+
+def import_times(code):
+    """Import modules in a fresh interpreter with -X importtime.
+
+    Returns:
+        tuple: (total seconds, {top-level package: seconds spent importing its own modules})
+    """
+    with tempfile.TemporaryDirectory() as chroma_path:
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                                   env=child_env(chroma_path), capture_output=True, text=True, check=True)
+    packages = defaultdict(float)
+    total = 0.0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1e6
+        if not name.startswith("  "):
+            total += int(cumulative_us) / 1e6
+    return total, packages
+
+def get_status(url):
+    """Get the HTTP status of a URL, or None if nothing answers."""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+def time_startup(order, pdf, timeout=300):
+    """Start the app in a child process.
+
+    Returns:
+        dict: Seconds from process start until the probe answered (deferred order
+            only), the interface listened and the default document was ready
+    """
+    ui_port, metrics_port = free_port(), free_port()
+    code = (_EAGER if order == "eager" else _DEFERRED).format(pdf=pdf)
+    with tempfile.TemporaryDirectory() as chroma_path:
+        env = child_env(chroma_path, UI_PORT=str(ui_port), METRICS_PORT=str(metrics_port))
+        start = time.perf_counter()
+        child = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT, env=env, stdin=subprocess.PIPE,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times = {"probe": None, "listening": None, "ready": None}
+        try:
+            while None in (times["listening"], times["ready"]) and time.perf_counter() - start < timeout:
+                elapsed = time.perf_counter() - start
+                if order == "deferred":
+                    status = get_status(f"http://127.0.0.1:{metrics_port}/ready")
+                    if status is not None and times["probe"] is None:
+                        times["probe"] = elapsed
+                    if status == 200:
+                        times["ready"] = elapsed
+                if times["listening"] is None and get_status(f"http://127.0.0.1:{ui_port}/") is not None:
+                    times["listening"] = elapsed
+                    if order == "eager":
+                        # The eager order indexes the document before launching
+                        times["ready"] = elapsed
+                if child.poll() is not None:
+                    raise RuntimeError(f"The {order} app exited with status {child.returncode}")
+                time.sleep(0.02)
+        finally:
+            child.kill()
+            child.wait()
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each measurement, reporting the median")
+    parser.add_argument("--top", type=int, default=15, help="Packages listed in the import breakdown")
+    args = parser.parse_args()
+
+    import_times(STARTUP_IMPORTS)  # Compile and cache bytecode before measuring
+    for label, code in (("Before listening", STARTUP_IMPORTS), ("Deferred to warm-up", DEFERRED_IMPORTS)):
+        runs = [import_times(code) for _ in range(args.repeat)]
+        total = statistics.median(run[0] for run in runs)
+        print(f"\n{label}: {total:.2f}s of imports ({code})")
+        print(f"{'package':>28} {'seconds':>8}")
+        packages = {name: statistics.median(run[1].get(name, 0.0) for run in runs) for name in runs[0][1]}
+        for name, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"{name:>28} {seconds:>8.3f}")
+
+    print(f"\nSeconds from process start, median of {args.repeat} runs")
+    print(f"{'order':>9} {'probe up':>9} {'listening':>10} {'ready':>8}")
+    for order in ("eager", "deferred"):
+        runs = [time_startup(order, BUNDLED_PDF) for _ in range(args.repeat)]
+        medians = {key: statistics.median(run[key] for run in runs) if runs[0][key] is not None else None
+                   for key in runs[0]}
+        probe = f"{medians['probe']:.2f}" if medians["probe"] is not None else "-"
+        print(f"{order:>9} {probe:>9} {medians['listening']:>10.2f} {medians['ready']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Deterministic stand-ins for the embedding and LLM providers with injected latency."""
+import asyncio
+import fnmatch
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import os
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableGenerator
+
+class StubEmbeddings(Embeddings):
+    """Hash-based embeddings: identical text always maps to the same unit vector."""
+
+    def __init__(self, dimensions=64, latency=0.0, per_text_latency=0.0):
+        """Initialize the stub.
+
+        Args:
+            dimensions: Length of the returned vectors
+            latency: Seconds slept per call, simulating the network round-trip
+            per_text_latency: Extra seconds slept per embedded text
+        """
+        self.dimensions = dimensions
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def _vector(self, text):
+        """Build a deterministic unit vector from the words of a text."""
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _delay(self, count):
+        """Seconds a call embedding `count` texts takes."""
+        return self.latency + self.per_text_latency * count
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        time.sleep(self._delay(len(texts)))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        await asyncio.sleep(self._delay(len(texts)))
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+class StubLLM:
+    """Chat model stand-in that streams a canned answer with injected latency.
+
+    Use as_runnable() to get a LangChain runnable that can replace a real LLM in
+    a prompt | llm | parser chain. It supports invoke/ainvoke and stream/astream:
+    the first token arrives after `latency` seconds plus `prompt_token_latency`
+    seconds per 4-character prompt token (simulating prefill), and each further
+    token after `token_latency` seconds. With fail_after set, the stream raises
+    after that many tokens, simulating a provider failing mid-response.
+    """
+
+    def __init__(self, latency=0.5, token_latency=0.0, answer="Stub answer based on the provided context.",
+                 fail=False, fail_after=None, prompt_token_latency=0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.answer = answer
+        self.fail = fail
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def _tokens(self, prompt_value):
+        """Split the answer for a prompt into streamed tokens."""
+        if self.fail:
+            raise RuntimeError("Stub LLM failure")
+        text = f"{self.answer} ({len(prompt_value.to_string())} prompt chars)"
+        words = text.split(" ")
+        return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+    def _first_token_delay(self, prompt_value):
+        """Get the seconds before the first token of the answer to a prompt."""
+        return self.latency + self.prompt_token_latency * len(prompt_value.to_string()) / 4
+
+    def _check_failure(self, index):
+        if self.fail_after is not None and index >= self.fail_after:
+            raise RuntimeError(f"Stub LLM failed after {index} tokens")
+
+    def stream(self, inputs):
+        for prompt_value in inputs:
+            self.calls += 1
+            time.sleep(self._first_token_delay(prompt_value))
+            for index, token in enumerate(self._tokens(prompt_value)):
+                self._check_failure(index)
+                if index:
+                    time.sleep(self.token_latency)
+                yield token
+
+    async def astream(self, inputs):
+        async for prompt_value in inputs:
+            self.calls += 1
+            await asyncio.sleep(self._first_token_delay(prompt_value))
+            for index, token in enumerate(self._tokens(prompt_value)):
+                self._check_failure(index)
+                if index:
+                    await asyncio.sleep(self.token_latency)
+                yield token
+
+    def as_runnable(self):
+        return RunnableGenerator(self.stream, self.astream)
+
+def make_stub_chain(llm, prompt_template):
+    """Build a prompt | stub LLM | parser chain mirroring query_handler.get_chain."""
+    return ChatPromptTemplate.from_template(prompt_template) | llm.as_runnable() | StrOutputParser()
+
+class _RedisHandler(socketserver.StreamRequestHandler):
+    """Serves one client connection of a StubRedisServer."""
+
+    def handle(self):
+        with self.server.data_lock:
+            self.server.connections += 1
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:-2])):
+                length = int(self.rfile.readline()[1:-2])
+                args.append(self.rfile.read(length + 2)[:-2])
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            self.wfile.write(self.server.execute(args))
+
+class StubRedisServer(socketserver.ThreadingTCPServer):
+    """Local stand-in for a Redis server, implementing the commands RedisCacheBackend uses.
+
+    Supports PING, AUTH, SELECT, GET, SET (with EX), DEL and SCAN. Call start()
+    and point the backend at `url`. `latency` holds each reply back, like the
+    round trip to a remote server.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        super().__init__((host, port), _RedisHandler)
+        self.data = {}  # key -> (expires at or None, value)
+        self.data_lock = threading.Lock()
+        self.latency = latency
+        self.commands = 0
+        self.connections = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    @staticmethod
+    def _bulk(value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def execute(self, args):
+        """Run one command and return its encoded reply."""
+        command = args[0].upper()
+        now = time.time()
+        with self.data_lock:
+            self.commands += 1
+            if command in (b"PING", b"AUTH", b"SELECT"):
+                return b"+OK\r\n" if command != b"PING" else b"+PONG\r\n"
+            if command == b"GET":
+                entry = self.data.get(args[1])
+                if entry is not None and entry[0] is not None and entry[0] < now:
+                    del self.data[args[1]]
+                    entry = None
+                return self._bulk(entry[1] if entry else None)
+            if command == b"SET":
+                expires = now + int(args[4]) if len(args) > 4 and args[3].upper() == b"EX" else None
+                self.data[args[1]] = (expires, args[2])
+                return b"+OK\r\n"
+            if command == b"DEL":
+                removed = sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+                return b":%d\r\n" % removed
+            if command == b"SCAN":
+                # Return every match in one pass, as a server with a small keyspace would
+                pattern = args[3].decode("utf-8") if len(args) > 3 else "*"
+                keys = [key for key in self.data if fnmatch.fnmatchcase(key.decode("utf-8"), pattern)]
+                return b"*2\r\n" + self._bulk(b"0") + b"*%d\r\n" % len(keys) + b"".join(self._bulk(k) for k in keys)
+        return b"-ERR unknown command\r\n"
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    """Serves one connection of a StubChatServer, keeping it alive between requests."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body are written separately
+
+    def setup(self):
+        super().setup()
+        with self.server.counter_lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.server.counter_lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+        answer = "Stub answer based on the provided context."
+        if request.get("stream"):
+            # Server-sent events: one chunk per word, then the end marker
+            events = []
+            for i, word in enumerate(answer.split(" ")):
+                events.append({"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                               "model": request.get("model"),
+                               "choices": [{"index": 0, "finish_reason": None,
+                                            "delta": {"role": "assistant", "content": word if i == 0 else " " + word}}]})
+            events[-1]["choices"][0]["finish_reason"] = "stop"
+            body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+            body, content_type = body.encode("utf-8"), "text/event-stream"
+        else:
+            body = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": request.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode("utf-8")
+            content_type = "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class StubChatServer(ThreadingHTTPServer):
+    """Local stand-in for an OpenAI-compatible chat completions API (as Groq serves).
+
+    Answers every POST with a canned completion (streamed as server-sent
+    events when the request asks for a stream) after `latency` seconds and
+    counts the connections clients open, so connection reuse is visible.
+    With tls=True it serves HTTPS with a self-signed certificate made by the
+    openssl command; `ssl_context` then holds a client context trusting it.
+    Call start() and point the client at `url`.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, tls=False):
+        super().__init__((host, port), _ChatHandler)
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self.counter_lock = threading.Lock()
+        self.ssl_context = None
+        if tls:
+            self._cert_dir = tempfile.TemporaryDirectory()
+            cert = os.path.join(self._cert_dir.name, "cert.pem")
+            key = os.path.join(self._cert_dir.name, "key.pem")
+            subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                            "-keyout", key, "-out", cert], check=True, capture_output=True)
+            server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            server_context.load_cert_chain(cert, key)
+            self.socket = server_context.wrap_socket(self.socket, server_side=True)
+            self.ssl_context = ssl.create_default_context(cafile=cert)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"{'https' if self.ssl_context else 'http'}://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
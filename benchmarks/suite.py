@@ -0,0 +1,306 @@
+"""End-to-end benchmark suite with JSON results for regression comparison between commits.
+
+Runs offline against the deterministic stub embeddings and LLM from
+benchmarks/stubs.py, with injected latency, through the real ingestion and
+query paths:
+
+- ingest_bundled: the bundled PDF through initialize_database (pages/sec, chunks/sec)
+- ingest_synthetic: a generated --pages page PDF, likewise
+- query: questions about the bundled PDF through aquery_document at each
+  --concurrency, --repeat-share of them repeats (QPS, p50/p95/p99 latency,
+  answer and question-embedding cache hit rates)
+
+Each scenario runs in its own process with a fresh temporary CHROMA_PATH, so
+peak RSS is per scenario and nothing is reused from earlier runs; with
+--runs, each figure is the median of that many runs. Results are printed
+and written to --output as JSON. With --compare, every latency,
+throughput, hit rate and memory figure is compared with an earlier results
+file, and the exit status is 1 if any is worse by more than --tolerance.
+
+Usage:
+    python -m benchmarks.suite [--runs 3] [--output results.json] [--compare baseline.json] [--tolerance 0.15]
+    python -m benchmarks.suite --scenarios query --concurrency 1 4 16 64 --llm-latency 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+from benchmarks.pdf_parsing import BUNDLED_PDF
+from benchmarks.query_load import percentile
+from benchmarks.stubs import StubEmbeddings, StubLLM, make_stub_chain
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from src.database import document_store, embedding_providers
+from src.utils import query_handler, tracing
+from src.utils.query_embedding_cache import get_query_embedding_cache
+from src.utils.semantic_cache import get_semantic_cache
+
+SCENARIOS = ("ingest_bundled", "ingest_synthetic", "query")
+
+# Questions about the bundled PDF, combined with topics into the query workload
+_QUESTIONS = (
+    "What does the study find about {}?",
+    "How do GPT-4 and human translators compare on {}?",
+    "Which errors are most common in {}?",
+    "Summarize the results for {}.",
+    "What methodology was used to evaluate {}?",
+)
+_TOPICS = (
+    "translation quality", "fluency", "adequacy", "terminology", "style consistency", "legal texts",
+    "medical texts", "junior translators", "senior translators", "error categories", "annotator agreement",
+    "Chinese to English", "English to Russian", "domain knowledge", "hallucinations", "literal translation",
+)
+
+def peak_rss_mb():
+    """Get the peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def install_stub_embeddings(args):
+    """Make the stub embeddings the local provider used for ingestion and questions."""
+    embeddings = StubEmbeddings(latency=args.embed_latency)
+    embedding_providers._local_embeddings = embeddings
+    return embeddings
+
+def ingest(path):
+    """Ingest a PDF into a new store; return its pages, chunks and seconds taken."""
+    done = {"pages": 0, "chunks": 0}
+
+    def progress(pages_done, _total_pages, chunks_done):
+        done["pages"], done["chunks"] = pages_done, chunks_done
+
+    start = time.perf_counter()
+    document_store.initialize_database(path, progress=progress)
+    return done["pages"], done["chunks"], time.perf_counter() - start
+
+def run_ingest(path, args):
+    """Measure ingestion throughput of one PDF."""
+    embeddings = install_stub_embeddings(args)
+    pages, chunks, seconds = ingest(path)
+    return {
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": seconds,
+        "pages_per_sec": pages / seconds,
+        "chunks_per_sec": chunks / seconds,
+        "embedding_calls": embeddings.calls,
+    }
+
+def make_workload(num_queries, repeat_share, rng):
+    """Build a list of questions, about repeat_share of them repeats of earlier ones."""
+    questions = []
+    for i in range(num_queries):
+        if questions and rng.random() < repeat_share:
+            questions.append(rng.choice(questions))
+        else:
+            template = _QUESTIONS[i % len(_QUESTIONS)]
+            questions.append(f"{template.format(rng.choice(_TOPICS))} (variant {i})")
+    return questions
+
+async def run_clients(questions, doc_path, concurrency):
+    """Answer the questions with `concurrency` clients; return the elapsed time and each latency."""
+    latencies = []
+    remaining = iter(questions)
+
+    async def client():
+        for question in remaining:
+            start = time.perf_counter()
+            await query_handler.aquery_document(question, doc_path)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+def run_query(args):
+    """Measure query latency, QPS and cache hit rates against the bundled PDF."""
+    install_stub_embeddings(args)
+    ingest(BUNDLED_PDF)
+    # Only the LLM is replaced; questions go through the store's real handle pool, caches and search
+    chain = make_stub_chain(StubLLM(latency=args.llm_latency), query_handler.PROMPT_TEMPLATE)
+    query_handler.get_chain = lambda use_fallback=False: chain
+    # The stub embeddings of different questions collide often, so only repeats may hit the answer cache
+    get_semantic_cache().threshold = 1.01
+
+    rng = random.Random(args.seed)
+    results = {"concurrency": {}}
+    for concurrency in args.concurrency:
+        get_semantic_cache().clear()
+        get_query_embedding_cache().clear()
+        questions = make_workload(args.queries, args.repeat_share, rng)
+        elapsed, latencies = asyncio.run(run_clients(questions, BUNDLED_PDF, concurrency))
+        results["concurrency"][str(concurrency)] = {
+            "qps": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "answer_cache_hit_rate": get_semantic_cache().get_stats()["hit_rate"],
+            "question_embedding_hit_rate": get_query_embedding_cache().get_stats()["hit_rate"],
+        }
+    return results
+
+def run_scenario(name, args):
+    """Run one scenario in this process; return its results."""
+    tracing.LOG_FORMAT = "none"
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    if name == "ingest_bundled":
+        results = run_ingest(BUNDLED_PDF, args)
+    elif name == "ingest_synthetic":
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_synthetic_pdf(os.path.join(tmp_dir, f"synthetic_{args.pages}.pdf"), args.pages)
+            results = run_ingest(path, args)
+    else:
+        results = run_query(args)
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def spawn_scenario(name, argv):
+    """Run a scenario in a child process with a fresh temporary store; return its results."""
+    with tempfile.TemporaryDirectory() as chroma_path:
+        env = dict(os.environ, CHROMA_PATH=chroma_path, SHARED_CHROMA_PATH=os.path.join(chroma_path, "shared"),
+                   EMBEDDING_CACHE_PATH=os.path.join(chroma_path, "embedding_cache.sqlite3"),
+                   SHARED_CACHE_BACKEND="none", EMBEDDING_PROVIDER="hashing", DOC_PATH=BUNDLED_PDF,
+                   TRACE_SAMPLE_RATE="0", LOG_FORMAT="none")
+        completed = subprocess.run([sys.executable, "-m", "benchmarks.suite", "--run-scenario", name] + argv,
+                                   env=env, stdout=subprocess.PIPE, check=True, text=True)
+    # The results are the last line; libraries may print before it
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def median_results(runs):
+    """Combine the results of repeated runs of a scenario, taking each figure's median."""
+    if isinstance(runs[0], dict):
+        return {key: median_results([run[key] for run in runs]) for key in runs[0]}
+    return statistics.median(runs)
+
+def git_commit():
+    """Get the checked-out commit, marked "-dirty" with uncommitted changes, or None outside git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+def flatten(results, prefix=""):
+    """Flatten nested results into {"scenario.metric": value}."""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def direction(metric):
+    """Get 1 if a metric is better higher, -1 if better lower, or 0 if it isn't compared."""
+    name = metric.rsplit(".", 1)[-1]
+    if name.endswith(("_per_sec", "hit_rate")) or name == "qps":
+        return 1
+    if name.endswith(("_ms", "_mb")) or name == "seconds":
+        return -1
+    return 0
+
+def compare(baseline, current, tolerance):
+    """Print each compared metric's change from a baseline run; return the regressed metrics."""
+    before, after = flatten(baseline["results"]), flatten(current["results"])
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} (tolerance {tolerance:.0%})")
+    print(f"{'metric':<52} {'baseline':>10} {'current':>10} {'change':>8}")
+    regressions = []
+    for metric, value in after.items():
+        better = direction(metric)
+        if not better or not before.get(metric):
+            continue
+        change = (value - before[metric]) / abs(before[metric])
+        regressed = change * better < -tolerance
+        if regressed:
+            regressions.append(metric)
+        print(f"{metric:<52} {before[metric]:>10.2f} {value:>10.2f} {change:>+8.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def print_results(results):
+    """Print the headline figures of each scenario."""
+    for name, scenario in results.items():
+        if "concurrency" in scenario:
+            print(f"\n{name} (peak RSS {scenario['peak_rss_mb']:.0f} MiB)")
+            print(f"{'clients':>8} {'QPS':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'answer hits':>12} "
+                  f"{'vector hits':>12}")
+            for concurrency, level in scenario["concurrency"].items():
+                print(f"{concurrency:>8} {level['qps']:>8.1f} {level['p50_ms']:>8.1f} {level['p95_ms']:>8.1f} "
+                      f"{level['p99_ms']:>8.1f} {level['answer_cache_hit_rate']:>12.1%} "
+                      f"{level['question_embedding_hit_rate']:>12.1%}")
+        else:
+            print(f"\n{name}: {scenario['pages']} pages, {scenario['chunks']} chunks in {scenario['seconds']:.2f}s "
+                  f"({scenario['pages_per_sec']:.1f} pages/sec, {scenario['chunks_per_sec']:.1f} chunks/sec, "
+                  f"peak RSS {scenario['peak_rss_mb']:.0f} MiB)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--pages", type=int, default=200, help="Pages in the synthetic PDF")
+    parser.add_argument("--queries", type=int, default=200, help="Questions per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--repeat-share", type=float, default=0.3, help="Share of questions repeating earlier ones")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Seconds before the stub LLM answers")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="Seconds per stub embedding call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=1, help="Runs of each scenario, reporting each figure's median")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Relative change counted as a regression")
+    parser.add_argument("--run-scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        print(json.dumps(run_scenario(args.run_scenario, args)))
+        return
+
+    # Everything but the output options is passed on to each scenario's process
+    argv = ["--pages", str(args.pages), "--queries", str(args.queries),
+            "--concurrency", *map(str, args.concurrency), "--repeat-share", str(args.repeat_share),
+            "--llm-latency", str(args.llm_latency), "--embed-latency", str(args.embed_latency),
+            "--seed", str(args.seed)]
+    run = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {"pages": args.pages, "queries": args.queries, "concurrency": args.concurrency,
+                   "repeat_share": args.repeat_share, "llm_latency": args.llm_latency,
+                   "embed_latency": args.embed_latency, "seed": args.seed},
+        "runs": args.runs,
+        "results": {name: median_results([spawn_scenario(name, argv) for _ in range(args.runs)])
+                    for name in args.scenarios},
+    }
+    print_results(run["results"])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != run["config"]:
+            print("\nWarning: the baseline was run with different options, so the figures may not be comparable")
+        regressions = compare(baseline, run, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Synthetic text PDFs for benchmarks, written without any PDF library."""
+import random
+
+_WORDS = (
+    "translation quality fluency adequacy evaluation corpus annotator model human "
+    "error analysis sentence document context terminology style consistency score "
+    "benchmark language source target reference metric judgment domain legal medical"
+).split()
+
+def _page_lines(rng, lines_per_page, words_per_line):
+    """Generate the lines of text for one page."""
+    return [" ".join(rng.choice(_WORDS) for _ in range(words_per_line)) for _ in range(lines_per_page)]
+
+def _escape(text):
+    """Escape a string for use inside a PDF literal string."""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_synthetic_pdf(path, num_pages=1000, lines_per_page=45, words_per_line=12, seed=0):
+    """Write a PDF with num_pages pages of deterministic pseudo-random text.
+
+    Args:
+        path: Where to write the PDF
+        num_pages: Number of pages
+        lines_per_page: Lines of text on each page
+        words_per_line: Words on each line
+        seed: Random seed, so the same arguments always produce the same file
+
+    Returns:
+        str: The path written
+    """
+    rng = random.Random(seed)
+
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then (page, content) pairs
+    objects = {}
+    page_ids = []
+    for page_number in range(num_pages):
+        page_id = 4 + page_number * 2
+        content_id = page_id + 1
+        page_ids.append(page_id)
+
+        text_ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        text_ops.append(f"(Page {page_number + 1}) Tj T*")
+        for line in _page_lines(rng, lines_per_page, words_per_line):
+            text_ops.append(f"({_escape(line)}) Tj T*")
+        text_ops.append("ET")
+        stream = "\n".join(text_ops).encode("latin-1")
+
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode("latin-1")
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[2] = f"<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>".encode("latin-1")
+    objects[3] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for object_id in sorted(objects):
+            offsets[object_id] = f.tell()
+            f.write(b"%d 0 obj\n" % object_id + objects[object_id] + b"\nendobj\n")
+
+        xref_offset = f.tell()
+        size = max(objects) + 1
+        f.write(b"xref\n0 %d\n" % size)
+        f.write(b"0000000000 65535 f \n")
+        for object_id in range(1, size):
+            f.write(b"%010d 00000 n \n" % offsets[object_id])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_offset))
+
+    return path
@@ -1,16 +1,31 @@
 """Main entry point for the application."""
-from src.database.document_store import initialize_database
-from src.ui.app import create_chat_interface
 from src.config.settings import DEFAULT_DOC_PATH
+from src.utils.metrics import start_metrics_server
+from src.utils.tracing import log_event
+from src.utils.warmup import get_readiness, start_warmup
 
 def main():
-    """Initialize the database and launch the chat interface."""
-    # Initialize the database with the default document
-    initialize_database(DEFAULT_DOC_PATH)
+    """Launch the chat interface, then index the default document in the background."""
+    # Serve /metrics and the /ready probe first, so the process answers while the app loads
+    # (METRICS_PORT=0 turns both off). A taken port shouldn't stop the chat app from starting.
+    try:
+        start_metrics_server(readiness=get_readiness)
+    except OSError as e:
+        log_event("metrics_error", f"Could not start the metrics server: {str(e)}; serving without /metrics and /ready",
+                  error=str(e))
     
-    # Create and launch the chat interface
+    # Gradio takes seconds to import, so it's only loaded once the probe is up
+    from src.ui.app import create_chat_interface
+    
+    # Create and launch the chat interface without blocking, so warm-up starts once it's listening.
+    # debug=True isn't passed because it makes launch() block; block_thread() below does that instead.
     app = create_chat_interface()
-    app.launch(debug=True,share=True)
+    app.launch(share=True, prevent_thread_lock=True)
+    
+    # Index the default document and load the LLM providers in the background; /ready reports when done
+    start_warmup(DEFAULT_DOC_PATH)
+    
+    app.block_thread()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
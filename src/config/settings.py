@@ -9,12 +9,162 @@ load_dotenv()
 # API and model configuration
 API_KEY = get_api_key  # Now a function that returns the next API key
 GEMINI_MODEL = "gemini-2.0-flash-thinking-exp-01-21"
+GROQ_MODEL = "llama-3.3-70b-specdec"
 EMBEDDING_MODEL = "models/text-embedding-004"
 
+# Gemini API key scheduling: per-key quotas of requests and tokens per minute (0 = no token
+# quota), requests in flight per key, and the quarantine after a 429 (API_KEY_COOLDOWN_BASE
+# seconds, doubling for each 429 in a row up to API_KEY_COOLDOWN_MAX)
+API_KEY_REQUESTS_PER_MINUTE = int(os.getenv("API_KEY_REQUESTS_PER_MINUTE", "15"))
+API_KEY_TOKENS_PER_MINUTE = int(os.getenv("API_KEY_TOKENS_PER_MINUTE", "1000000"))
+API_KEY_MAX_IN_FLIGHT = int(os.getenv("API_KEY_MAX_IN_FLIGHT", "4"))
+API_KEY_COOLDOWN_BASE = float(os.getenv("API_KEY_COOLDOWN_BASE", "2.0"))
+API_KEY_COOLDOWN_MAX = float(os.getenv("API_KEY_COOLDOWN_MAX", "60.0"))
+
+# Long-lived LLM and embedding clients, one per (provider, API key): a client is rebuilt after
+# CLIENT_MAX_FAILURES errors in a row (429s aside) or once unused for CLIENT_IDLE_TIMEOUT seconds
+CLIENT_MAX_FAILURES = int(os.getenv("CLIENT_MAX_FAILURES", "3"))
+CLIENT_IDLE_TIMEOUT = float(os.getenv("CLIENT_IDLE_TIMEOUT", "300"))
+
+# Embedding provider: "google" (EMBEDDING_MODEL over the API), "onnx" (all-MiniLM-L6-v2 on
+# the CPU) or "hashing" (feature hashing on the CPU, for offline use and tests)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google").lower()
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+HASHING_EMBEDDING_DIMENSIONS = int(os.getenv("HASHING_EMBEDDING_DIMENSIONS", "1024"))
+
+# Async query path: questions processed at once and per-stage timeouts (seconds)
+QUERY_CONCURRENCY = int(os.getenv("QUERY_CONCURRENCY", "16"))
+RETRIEVAL_TIMEOUT = float(os.getenv("RETRIEVAL_TIMEOUT", "10"))
+GENERATION_TIMEOUT = float(os.getenv("GENERATION_TIMEOUT", "60"))
+
+# Multi-document questions: stores searched in parallel, total chunks used, and per-document
+# quotas (at most MAX_PER_DOC from one document; each document's best MIN_PER_DOC reserved)
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "8"))
+MULTI_DOC_K = int(os.getenv("MULTI_DOC_K", "6"))
+MULTI_DOC_MAX_PER_DOC = int(os.getenv("MULTI_DOC_MAX_PER_DOC", "3"))
+MULTI_DOC_MIN_PER_DOC = int(os.getenv("MULTI_DOC_MIN_PER_DOC", "1"))
+
+# Hybrid retrieval: fuse the top HYBRID_CANDIDATES chunks of vector search and of BM25 keyword
+# search with reciprocal rank fusion (score = sum of 1 / (RRF_K + rank) over both rankings).
+# Off by default, since it changes which chunks answer every question; new stores get a keyword index regardless
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "false").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Chunks per single-document question: "fixed" uses RETRIEVAL_K; "adaptive" keeps between
+# RETRIEVAL_MIN_K and RETRIEVAL_MAX_K, dropping chunks under RETRIEVAL_SCORE_RATIO of the
+# candidates' score range and cutting at the first drop of RETRIEVAL_GAP_RATIO of it.
+# RETRIEVAL_MMR diversifies the chosen chunks (RETRIEVAL_MMR_LAMBDA weighs relevance vs. novelty)
+RETRIEVAL_K_MODE = os.getenv("RETRIEVAL_K_MODE", "fixed").lower()
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+RETRIEVAL_MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "2"))
+RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "8"))
+RETRIEVAL_GAP_RATIO = float(os.getenv("RETRIEVAL_GAP_RATIO", "0.3"))
+RETRIEVAL_SCORE_RATIO = float(os.getenv("RETRIEVAL_SCORE_RATIO", "0.5"))
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "false").lower() == "true"
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.7"))
+
+# Reranking: over-fetch RERANK_CANDIDATES chunks and keep the best by RERANKER: "none" (off),
+# "overlap" (question coverage, NumPy) or "cross-encoder" (ONNX model.onnx and tokenizer.json in
+# RERANKER_MODEL_DIR). Candidates are scored RERANK_BATCH_SIZE at a time until
+# RERANK_BUDGET_MS runs out; scores are cached per (store, question, chunk)
+RERANKER = os.getenv("RERANKER", "none").lower()
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANKER_MODEL_DIR = os.getenv("RERANKER_MODEL_DIR", "models/reranker")
+RERANKER_THREADS = int(os.getenv("RERANKER_THREADS", str(os.cpu_count() or 1)))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+
+# Context packing: chunks sharing CONTEXT_DEDUP_THRESHOLD of their word 3-grams with a more
+# relevant chunk are dropped, overlapping chunks of a page merged, and the rest packed into the
+# context token budget of the model answering (tokens estimated as characters / CHARS_PER_TOKEN).
+# Budgets are for the 3 chunks of a single-document question and scale with the chunks retrieved;
+# the Groq default fits 3 whole 800-character chunks with their source labels
+CONTEXT_TOKEN_BUDGET_GROQ = int(os.getenv("CONTEXT_TOKEN_BUDGET_GROQ", "768"))
+CONTEXT_TOKEN_BUDGET_GEMINI = int(os.getenv("CONTEXT_TOKEN_BUDGET_GEMINI", "1536"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "4"))
+
+# Hedged generation: launch the fallback LLM when the primary's first token is later
+# than its recent p95 (clamped to [HEDGE_MIN_DELAY, HEDGE_MAX_DELAY] seconds)
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0"))  # Used until enough samples exist
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.25"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "10.0"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "500"))
+
+# Semantic answer cache: rephrased questions with at least this cosine similarity share an answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))  # Seconds
+SEMANTIC_CACHE_MAX_ENTRIES_PER_DOC = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES_PER_DOC", "256"))
+SEMANTIC_CACHE_MAX_BYTES = int(os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Question vectors kept in memory, so repeated questions skip the embedding API call
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+
 # Default document and database paths
 DEFAULT_DOC_PATH = os.getenv("DOC_PATH", "documents/GPT-4_VS_Human_translators.pdf")
 DEFAULT_CHROMA_PATH = os.getenv("CHROMA_PATH", "chroma")
 
+# Vector store layout: "directory" gives each document its own Chroma directory; "shared"
+# stores each document as a collection in one persistent client under SHARED_CHROMA_PATH
+CHROMA_LAYOUT = os.getenv("CHROMA_LAYOUT", "directory").lower()
+SHARED_CHROMA_PATH = os.getenv("SHARED_CHROMA_PATH", os.path.join(DEFAULT_CHROMA_PATH, "shared"))
+SHARED_CHROMA_MEMORY_LIMIT = int(os.getenv("SHARED_CHROMA_MEMORY_LIMIT", str(1024 * 1024 * 1024)))  # Bytes of loaded indexes
+
+# Registry mapping document content hashes to their vector stores
+DOCUMENT_REGISTRY_PATH = os.path.join(DEFAULT_CHROMA_PATH, "registry.sqlite3")
+
+# Maximum number of document vector stores kept open at once (least recently used are closed)
+MAX_OPEN_DATABASES = int(os.getenv("MAX_OPEN_DATABASES", "32"))
+
+# Persistent chunk embedding cache shared by all documents
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(DEFAULT_CHROMA_PATH, "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Answer and retrieval cache shared by worker processes: "sqlite" (one host), "redis"
+# (any Redis-protocol server), "memory" (this process only) or "none"
+SHARED_CACHE_BACKEND = os.getenv("SHARED_CACHE_BACKEND", "sqlite").lower()
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(DEFAULT_CHROMA_PATH, "shared_cache.sqlite3"))
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "redis://localhost:6379/0")
+SHARED_CACHE_TTL = float(os.getenv("SHARED_CACHE_TTL", str(24 * 3600)))  # Seconds
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "50000"))  # sqlite and memory backends
+SHARED_CACHE_CONNECTIONS = int(os.getenv("SHARED_CACHE_CONNECTIONS", "8"))  # redis backend, per process
+
+# Batched embedding pipeline (batch size is capped at 100 texts per request by the API); keys
+# are scheduled like API_KEY_* above, with a 429 quarantining a key for EMBEDDING_RETRY_BASE_DELAY
+# seconds, doubling for each 429 in a row
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "1500"))  # Per API key
+EMBEDDING_WORKERS_PER_KEY = int(os.getenv("EMBEDDING_WORKERS_PER_KEY", "2"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+EMBEDDING_RETRY_BASE_DELAY = float(os.getenv("EMBEDDING_RETRY_BASE_DELAY", "1.0"))
+
+# Number of PDF pages read, split and indexed together during streaming ingestion
+INGEST_WINDOW_PAGES = int(os.getenv("INGEST_WINDOW_PAGES", "20"))
+
+# Worker processes used to parse and split PDFs (1 parses on the calling thread)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+# Background ingestion: documents ingested concurrently and finished jobs kept for status polling
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "100"))
+
+# Metrics and tracing: per-stage latency histograms by document and provider, served in the
+# Prometheus text format at http://METRICS_HOST:METRICS_PORT/metrics next to the /ready startup
+# probe (port 0 turns both off). TRACE_SAMPLE_RATE of requests also log their spans; logs are
+# "text", "json" or "none"
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_MAX_DOCUMENTS = int(os.getenv("METRICS_MAX_DOCUMENTS", "100"))  # Further documents are labelled "other"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
 # Uploaded documents directory
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
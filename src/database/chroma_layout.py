@@ -0,0 +1,131 @@
+"""Where document vector stores live: one directory each, or collections in one shared client."""
+import os
+import shutil
+import threading
+
+import chromadb
+from chromadb.config import Settings
+from langchain_chroma import Chroma
+
+from src.config.settings import CHROMA_LAYOUT, SHARED_CHROMA_PATH, SHARED_CHROMA_MEMORY_LIMIT
+
+# Separates the client directory from the collection name in a shared-layout store path
+SHARED_SEPARATOR = "#"
+
+# Collection langchain_chroma uses when none is given, i.e. in per-directory stores
+DEFAULT_COLLECTION = "langchain"
+
+# Collection metadata key recording the embedding model that built a store
+EMBEDDING_MODEL_KEY = "embedding_model"
+
+class EmbeddingModelMismatchError(ValueError):
+    """A store was built with a different embedding model than the one configured."""
+
+def shared_db_path(content_hash):
+    """Get the store path of a document in the shared layout, from its content hash."""
+    return f"{SHARED_CHROMA_PATH}{SHARED_SEPARATOR}doc_{content_hash[:48]}"
+
+def is_shared_db_path(db_path):
+    """Check whether a store path refers to a collection in the shared client."""
+    return SHARED_SEPARATOR in db_path
+
+def split_db_path(db_path):
+    """Split a store path into (persist directory, collection name)."""
+    if is_shared_db_path(db_path):
+        directory, collection = db_path.split(SHARED_SEPARATOR, 1)
+        return directory, collection
+    return db_path, DEFAULT_COLLECTION
+
+def lexical_index_path(db_path):
+    """Get where the keyword index of the store at a store path is kept.
+
+    Directory stores keep it inside their directory; shared-layout stores in
+    a folder of the shared client's directory, one file per collection.
+    """
+    directory, collection = split_db_path(db_path)
+    if is_shared_db_path(db_path):
+        return os.path.join(directory, "lexical", f"{collection}.npz")
+    return os.path.join(directory, "lexical_index.npz")
+
+def use_shared_layout():
+    """Check whether new documents are stored as collections in the shared client."""
+    return CHROMA_LAYOUT == "shared"
+
+# Singleton instance
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_shared_client():
+    """Get the persistent Chroma client holding every shared-layout document.
+
+    Loaded collection indexes are kept in an LRU cache bounded by
+    SHARED_CHROMA_MEMORY_LIMIT, so memory stays flat as documents are added.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            os.makedirs(SHARED_CHROMA_PATH, exist_ok=True)
+            settings = Settings(anonymized_telemetry=False)
+            if SHARED_CHROMA_MEMORY_LIMIT > 0:
+                settings.chroma_segment_cache_policy = "LRU"
+                settings.chroma_memory_limit_bytes = SHARED_CHROMA_MEMORY_LIMIT
+            _shared_client = chromadb.PersistentClient(path=SHARED_CHROMA_PATH, settings=settings)
+    return _shared_client
+
+def open_store(db_path, embedding_function, embedding_model):
+    """Open the Chroma store at a store path, creating it if it doesn't exist.
+
+    New stores record embedding_model in their collection metadata.
+    """
+    metadata = {EMBEDDING_MODEL_KEY: embedding_model}
+    if is_shared_db_path(db_path):
+        _directory, collection = split_db_path(db_path)
+        return Chroma(client=get_shared_client(), collection_name=collection,
+                      embedding_function=embedding_function, collection_metadata=metadata)
+    os.makedirs(db_path, exist_ok=True)
+    return Chroma(persist_directory=db_path, embedding_function=embedding_function,
+                  collection_metadata=metadata)
+
+def store_embedding_model(db, default=None):
+    """Get the embedding model recorded by an open store.
+
+    Args:
+        db: The open Chroma store
+        default: Model assumed for stores built before models were recorded
+    """
+    metadata = db._collection.metadata or {}
+    return metadata.get(EMBEDDING_MODEL_KEY, default)
+
+def store_exists(db_path):
+    """Check whether a store path holds an indexed document."""
+    if is_shared_db_path(db_path):
+        _directory, collection = split_db_path(db_path)
+        try:
+            return get_shared_client().get_collection(collection).count() > 0
+        except Exception:
+            return False
+    return os.path.isdir(db_path) and len(os.listdir(db_path)) > 0
+
+def delete_store(db_path):
+    """Delete the store at a store path.
+
+    Returns:
+        bool: True if something was deleted
+    """
+    if is_shared_db_path(db_path):
+        _directory, collection = split_db_path(db_path)
+        if os.path.exists(lexical_index_path(db_path)):
+            os.remove(lexical_index_path(db_path))
+        try:
+            get_shared_client().delete_collection(collection)
+        except Exception:
+            return False
+        return True
+    if os.path.exists(db_path):
+        shutil.rmtree(db_path)
+        return True
+    return False
+
+def list_shared_db_paths():
+    """Get the store paths of every document in the shared client."""
+    return [f"{SHARED_CHROMA_PATH}{SHARED_SEPARATOR}{name}" for name in get_shared_client().list_collections()]
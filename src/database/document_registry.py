@@ -0,0 +1,203 @@
+"""Content-addressed registry mapping document contents to vector stores."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import weakref
+
+from src.config.settings import DOCUMENT_REGISTRY_PATH
+from src.database.chroma_layout import store_exists
+from src.utils.tracing import log_event
+
+# Read files in 1 MB blocks when hashing so large PDFs aren't loaded at once
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# JSON file the registry was kept in before SQLite, imported on first use
+_LEGACY_REGISTRY_NAME = "registry.json"
+
+class DocumentRegistry:
+    """Registry of ingested documents keyed by the SHA-256 of their contents.
+
+    Every upload gets a fresh timestamped filename, so the file path alone can't
+    tell us whether a document was already embedded. The registry maps each
+    content hash to the Chroma directory built for it, letting duplicate uploads
+    share one collection instead of being parsed and embedded again. Entries
+    live in SQLite, so worker processes sharing a CHROMA_PATH see each other's
+    documents and concurrent registrations don't overwrite one another.
+    """
+
+    def __init__(self, registry_path=DOCUMENT_REGISTRY_PATH):
+        """Initialize the registry.
+
+        Args:
+            registry_path: SQLite file the registry is persisted to
+        """
+        self.registry_path = registry_path
+        self.lock = threading.Lock()
+
+        # One lock per content hash so identical uploads ingest only once; a lock
+        # disappears once no ingestion holds or waits for it
+        self._ingest_locks = weakref.WeakValueDictionary()
+
+        # Hashes of files we've already read, keyed by (path, size, mtime)
+        self._hash_cache = {}
+
+        os.makedirs(os.path.dirname(registry_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(registry_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                content_hash TEXT PRIMARY KEY,
+                db_path TEXT NOT NULL,
+                source TEXT NOT NULL,
+                complete INTEGER NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_db_path ON documents (db_path)")
+        self.conn.commit()
+
+        self._import_json(os.path.join(os.path.dirname(registry_path), _LEGACY_REGISTRY_NAME))
+
+    def _import_json(self, json_path):
+        """Move the entries of a registry from before it was kept in SQLite into the database."""
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            log_event("registry_error", f"Ignoring unreadable document registry {json_path}: {str(e)}",
+                      path=json_path, error=str(e))
+            return
+
+        with self.lock:
+            # Entries registered since take precedence over the old file's
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO documents (content_hash, db_path, source, complete) VALUES (?, ?, ?, ?)",
+                [(content_hash, entry["db_path"], entry.get("source", ""), int(entry.get("complete", True)))
+                 for content_hash, entry in entries.items()]
+            )
+            self.conn.commit()
+        try:
+            # Renamed, not deleted, so an older version can still be pointed at it
+            os.replace(json_path, f"{json_path}.imported")
+        except OSError:
+            pass  # Another process imported it first
+        log_event("registry_imported", f"Imported {len(entries)} documents from {json_path}",
+                  path=json_path, documents=len(entries))
+
+    def _entry(self, content_hash):
+        """Get the entry for a content hash as a dict, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT db_path, source, complete FROM documents WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        return None if row is None else {"db_path": row[0], "source": row[1], "complete": bool(row[2])}
+
+    def content_hash(self, doc_path):
+        """Get the SHA-256 hex digest of a document's contents.
+
+        Args:
+            doc_path: Path to the document
+
+        Returns:
+            str: The hex digest, or None if the file doesn't exist
+        """
+        try:
+            stat = os.stat(doc_path)
+        except OSError:
+            return None
+
+        cache_key = (os.path.abspath(doc_path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if cache_key in self._hash_cache:
+                return self._hash_cache[cache_key]
+
+        digest = hashlib.sha256()
+        with open(doc_path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+
+        with self.lock:
+            self._hash_cache[cache_key] = content_hash
+        return content_hash
+
+    def ingest_lock(self, content_hash):
+        """Get the lock serializing ingestion of one document's contents."""
+        with self.lock:
+            lock = self._ingest_locks.get(content_hash)
+            if lock is None:
+                lock = self._ingest_locks[content_hash] = threading.Lock()
+            return lock
+
+    def lookup(self, content_hash):
+        """Get the database path registered for a content hash, if it's fully indexed."""
+        entry = self._entry(content_hash)
+        if entry is None or not entry["complete"]:
+            return None
+
+        db_path = entry["db_path"]
+        return db_path if store_exists(db_path) else None
+
+    def list_db_paths(self):
+        """Get the database paths of every fully indexed document."""
+        with self.lock:
+            rows = self.conn.execute("SELECT db_path FROM documents WHERE complete ORDER BY rowid").fetchall()
+        return [db_path for db_path in dict.fromkeys(row[0] for row in rows) if store_exists(db_path)]
+
+    def entries(self):
+        """Get a copy of every registry entry, keyed by content hash."""
+        with self.lock:
+            rows = self.conn.execute("SELECT content_hash, db_path, source, complete FROM documents").fetchall()
+        return {content_hash: {"db_path": db_path, "source": source, "complete": bool(complete)}
+                for content_hash, db_path, source, complete in rows}
+
+    def pending_db_path(self, content_hash):
+        """Get the database path of an ingestion that started but never completed."""
+        entry = self._entry(content_hash)
+        if entry is None or entry["complete"]:
+            return None
+        return entry["db_path"]
+
+    def register(self, content_hash, db_path, doc_path, complete=True):
+        """Record that a document's contents are stored at db_path.
+
+        Args:
+            content_hash: SHA-256 of the document contents
+            db_path: The document's Chroma directory, or shared-layout collection path
+            doc_path: Path of the uploaded document
+            complete: False while the document is still being indexed
+        """
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (content_hash, db_path, source, complete) VALUES (?, ?, ?, ?)",
+                (content_hash, db_path, os.path.basename(doc_path), int(complete))
+            )
+            self.conn.commit()
+
+    def content_hashes(self, db_path):
+        """Get the content hashes of every document stored at db_path."""
+        with self.lock:
+            rows = self.conn.execute("SELECT content_hash FROM documents WHERE db_path = ?", (db_path,)).fetchall()
+        return [row[0] for row in rows]
+
+    def unregister_db_path(self, db_path):
+        """Remove every registry entry pointing at db_path."""
+        with self.lock:
+            removed = self.conn.execute("DELETE FROM documents WHERE db_path = ?", (db_path,)).rowcount
+            self.conn.commit()
+        return removed > 0
+
+# Singleton instance
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Get the singleton document registry instance."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DocumentRegistry()
+    return _registry
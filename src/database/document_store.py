@@ -1,118 +1,524 @@
 """Document storage and retrieval functionality."""
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
 import os
-import shutil
+import threading
+import time
 
-from src.config.settings import API_KEY, DEFAULT_DOC_PATH, DEFAULT_CHROMA_PATH, EMBEDDING_MODEL, get_document_db_path
+from src.config.settings import (
+    DEFAULT_DOC_PATH, DEFAULT_CHROMA_PATH, EMBEDDING_MODEL, INGEST_WINDOW_PAGES, PARSE_WORKERS,
+    RETRIEVAL_TIMEOUT, RETRIEVAL_WORKERS, MULTI_DOC_K, MULTI_DOC_MAX_PER_DOC, MULTI_DOC_MIN_PER_DOC,
+    HYBRID_SEARCH, HYBRID_CANDIDATES, RRF_K, get_document_db_path,
+)
+from src.database.chroma_layout import (
+    EmbeddingModelMismatchError, delete_store, lexical_index_path, open_store, shared_db_path, store_embedding_model,
+    store_exists, use_shared_layout,
+)
+from src.database.document_registry import get_registry
+from src.database.embedding_cache import CachedEmbeddings
+from src.database.embedding_pipeline import chunk_ids, get_embedding_pipeline
+from src.database.embedding_providers import create_embeddings, get_embedding_model_name
+from src.database.handle_pool import HANDLE_POOL_METRICS, ChromaHandlePool, close_database
+from src.database.lexical_index import (
+    LexicalIndexBuilder, build_lexical_index, discard_lexical_index, get_lexical_index,
+)
+from src.database.pdf_parser import get_text_splitter, iter_parsed_windows
+from src.utils.metrics import get_metrics
+from src.utils.semantic_cache import get_semantic_cache
+from src.utils.shared_cache import document_prefix, get_shared_cache
+from src.utils.tracing import document_label, log_event, observe, span, trace
 
-# Global variable to cache database instances
-_db_instances = {}
+def get_embedding_function():
+    """Get an embedding function for EMBEDDING_PROVIDER backed by the persistent chunk embedding cache."""
+    # Only chunks that were never embedded before reach the model
+    return CachedEmbeddings(create_embeddings(), get_embedding_model_name())
+
+def _open_database(db_path):
+    """Open the vector database stored at db_path.
+    
+    Raises:
+        EmbeddingModelMismatchError: If the store was built with another embedding model,
+            whose vectors can't be compared with the configured model's
+    """
+    embedding_model = get_embedding_model_name()
+    db = open_store(db_path, get_embedding_function(), embedding_model)
+    
+    # Stores built before models were recorded all used the Google model
+    store_model = store_embedding_model(db, default=EMBEDDING_MODEL)
+    if store_model != embedding_model:
+        close_database(db)
+        raise EmbeddingModelMismatchError(
+            f"Vector database at {db_path} was built with embedding model {store_model}, "
+            f"not the configured {embedding_model}"
+        )
+    return db
+
+# Open database handles, keyed by database path
+_handle_pool = None
+_handle_pool_lock = threading.Lock()
+
+def get_handle_pool():
+    """Get the singleton pool of open database handles."""
+    global _handle_pool
+    with _handle_pool_lock:
+        if _handle_pool is None:
+            _handle_pool = ChromaHandlePool(_open_database)
+            get_metrics().add_collector("handle_pool", _handle_pool.collect_metrics, HANDLE_POOL_METRICS)
+    return _handle_pool
 
 def load_document(path):
     """Load and split a PDF document into chunks."""
-    print(f"Loading document from: {path}")
+    from langchain_community.document_loaders import PyPDFLoader  # Slow to import; only needed to ingest
+    
+    log_event("load", f"Loading document from: {path}", path=path)
     doc_loader = PyPDFLoader(path)
-    documents = doc_loader.load()
-    print(f"Loaded {len(documents)} pages")
-    
-    # Optimize chunk size for better retrieval performance
-    # Smaller chunks with moderate overlap for better semantic matching
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,  # Reduced from 1000 for more precise retrieval
-        chunk_overlap=100,  # Reduced from 200 to minimize redundancy
-        length_function=len,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    
-    chunks = text_splitter.split_documents(documents)
-    print(f"Split into {len(chunks)} chunks")
+    with span("pdf_parse"):
+        documents = doc_loader.load()
+    log_event("loaded", f"Loaded {len(documents)} pages", pages=len(documents))
+    
+    with span("split"):
+        chunks = get_text_splitter().split_documents(documents)
+    log_event("split", f"Split into {len(chunks)} chunks", chunks=len(chunks))
     return chunks
 
-def initialize_database(doc_path=None):
-    """Initialize and populate the vector database for a specific document."""
-    global _db_instances
+def iter_document_chunks(path, window_pages=INGEST_WINDOW_PAGES):
+    """Lazily load a PDF and yield its chunks one window of pages at a time.
     
-    # Use default document if none provided
-    doc_path = doc_path or DEFAULT_DOC_PATH
+    Only a bounded number of windows is held in memory, so peak memory stays
+    flat regardless of document size. With PARSE_WORKERS > 1 the windows are
+    parsed and split in parallel worker processes and still yielded in page order.
     
-    # Get document-specific database path
-    db_path = get_document_db_path(doc_path)
+    Args:
+        path: Path to the PDF document
+        window_pages: Number of pages read and split per window
     
-    # Check if database already exists to avoid rebuilding
-    if os.path.exists(db_path) and os.path.isdir(db_path) and len(os.listdir(db_path)) > 0:
-        print(f"Using existing database at: {db_path}")
-        db = get_database(doc_path)
-        _db_instances[doc_path] = db
-        return db
+    Yields:
+        tuple: (pages read so far, total pages or None, chunks for this window)
+    """
+    log_event("load", f"Streaming document from: {path}", path=path)
+    if PARSE_WORKERS > 1:
+        yield from iter_parsed_windows(path, window_pages)
+        return
     
-    # Ensure the database directory exists
-    os.makedirs(db_path, exist_ok=True)
+    from langchain_community.document_loaders import PyPDFLoader  # Slow to import; only needed to ingest
     
-    documents = load_document(doc_path)
+    text_splitter = get_text_splitter()
+    pages_read = 0
+    total_pages = None
+    window = []
     
-    embedding_function = GoogleGenerativeAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        google_api_key=API_KEY(),  # Call the function to get the next API key
-        # Add caching to avoid redundant embedding calculations
-        cache=True
-    )
+    # Parse time is the time spent reading each window's pages, not the consumer's time between windows
+    parse_start = time.perf_counter()
+    for page in PyPDFLoader(path).lazy_load():
+        pages_read += 1
+        total_pages = total_pages or page.metadata.get("total_pages")
+        window.append(page)
+        if len(window) >= window_pages:
+            observe("pdf_parse", time.perf_counter() - parse_start)
+            with span("split"):
+                chunks = text_splitter.split_documents(window)
+            yield pages_read, total_pages, chunks
+            window = []
+            parse_start = time.perf_counter()
     
-    print(f"Creating vector database at: {db_path}")
-    db = Chroma.from_documents(
-        documents=documents,
-        embedding=embedding_function,
-        persist_directory=db_path
-    )
-    print("Database created successfully")
+    if window:
+        observe("pdf_parse", time.perf_counter() - parse_start)
+        with span("split"):
+            chunks = text_splitter.split_documents(window)
+        yield pages_read, total_pages, chunks
+
+def _default_db_path(doc_path, content_hash):
+    """Get where a document's store goes when the registry has no entry for it.
     
-    # Cache the database instance
-    _db_instances[doc_path] = db
-    return db
+    With CHROMA_LAYOUT=shared new documents become collections in the shared
+    client, but an unmigrated per-document directory is still used if present.
+    """
+    directory_path = get_document_db_path(doc_path)
+    if use_shared_layout() and content_hash and not store_exists(directory_path):
+        return shared_db_path(content_hash)
+    return directory_path
 
-def get_database(doc_path=None):
-    """Get an instance of the vector database for a specific document."""
-    global _db_instances
+def resolve_db_path(doc_path):
+    """Get the database path for a document, sharing stores between identical files."""
+    registry = get_registry()
+    content_hash = registry.content_hash(doc_path)
+    if content_hash:
+        db_path = registry.lookup(content_hash)
+        if db_path:
+            return db_path
+    return _default_db_path(doc_path, content_hash)
+
+def _matches_embedding_model(db_path):
+    """Check whether an existing store was built with the configured embedding model.
     
+    A store built with another model is deleted so the caller rebuilds it.
+    """
+    try:
+        with get_handle_pool().lease(db_path):
+            return True
+    except EmbeddingModelMismatchError as e:
+        log_event("embedding_model_mismatch", f"{str(e)}; rebuilding it", db_path=db_path)
+        get_registry().unregister_db_path(db_path)
+        delete_store(db_path)
+        return False
+
+def _ensure_lexical_index(db_path):
+    """Build the keyword index of a store indexed before keyword indexes existed."""
+    index_path = lexical_index_path(db_path)
+    if not HYBRID_SEARCH or os.path.exists(index_path):
+        return
+    log_event("keyword_index", f"Building keyword index for: {db_path}", db_path=db_path)
+    with get_handle_pool().lease(db_path) as db:
+        build_lexical_index(db, index_path)
+
+def _invalidate_answers(db_path, content_hashes):
+    """Drop the answers and retrievals cached for a store, in this process and in the shared cache."""
+    get_semantic_cache().invalidate(db_path)
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        for content_hash in content_hashes:
+            shared_cache.clear(document_prefix(content_hash))
+
+def initialize_database(doc_path=None, progress=None):
+    """Initialize and populate the vector database for a specific document.
+    
+    Args:
+        doc_path: Path to the PDF document (defaults to DEFAULT_DOC_PATH)
+        progress: Optional callback called as progress(pages_done, total_pages, chunks_done)
+            after each window of pages is indexed
+    """
     # Use default document if none provided
     doc_path = doc_path or DEFAULT_DOC_PATH
     
-    # Return cached instance if available
-    if doc_path in _db_instances:
-        return _db_instances[doc_path]
+    registry = get_registry()
+    content_hash = registry.content_hash(doc_path)
+    if content_hash is None:
+        # Let the loader report the missing file
+        return _build_database(doc_path, get_document_db_path(doc_path), progress)
     
-    # Get document-specific database path
-    db_path = get_document_db_path(doc_path)
-    
-    embedding_function = GoogleGenerativeAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        google_api_key=API_KEY(),  # Call the function to get the next API key
-        # Add caching to avoid redundant embedding calculations
-        cache=True
-    )
-    
-    # Create and cache the database instance
-    db = Chroma(persist_directory=db_path, embedding_function=embedding_function)
-    _db_instances[doc_path] = db
-    return db
+    # Identical uploads (including the upload and change events firing together)
+    # wait here for the first one to finish, then reuse its store
+    with registry.ingest_lock(content_hash):
+        db_path = registry.lookup(content_hash)
+        if db_path and _matches_embedding_model(db_path):
+            log_event("reuse_database", f"Reusing database for identical document at: {db_path}", db_path=db_path)
+            _ensure_lexical_index(db_path)
+            return get_database(doc_path)
+        
+        # A previous ingestion of this document was interrupted; start it over
+        pending_path = registry.pending_db_path(content_hash)
+        if pending_path:
+            log_event("discard_database", f"Discarding partially indexed database at: {pending_path}",
+                      db_path=pending_path)
+            get_handle_pool().discard(pending_path)
+            delete_store(pending_path)
+        
+        # Get document-specific database path
+        db_path = _default_db_path(doc_path, content_hash)
+        
+        # Check if database already exists to avoid rebuilding
+        if store_exists(db_path) and _matches_embedding_model(db_path):
+            log_event("reuse_database", f"Using existing database at: {db_path}", db_path=db_path)
+            _ensure_lexical_index(db_path)
+            registry.register(content_hash, db_path, doc_path)
+            return get_database(doc_path)
+        
+        registry.register(content_hash, db_path, doc_path, complete=False)
+        db = _build_database(doc_path, db_path, progress)
+        registry.register(content_hash, db_path, doc_path)
+        return db
+
+def _build_database(doc_path, db_path, progress=None):
+    """Stream a document into a new vector database one window of pages at a time."""
+    with trace("ingest", document=document_label(doc_path)):
+        # Close any handle on an earlier build first, since Chroma shares one client per path
+        pool = get_handle_pool()
+        pool.discard(db_path)
+        
+        log_event("create_database", f"Creating vector database at: {db_path}", db_path=db_path)
+        db = _open_database(db_path)
+        
+        # Answers cached for an earlier build of this store are stale, and so is its keyword index
+        content_hash = get_registry().content_hash(doc_path)
+        content_hashes = [content_hash] if content_hash else []
+        _invalidate_answers(db_path, content_hashes)
+        discard_lexical_index(lexical_index_path(db_path))
+        
+        # Publish the handle right away so the document is queryable while later
+        # pages are still being indexed; holding it keeps it open until we're done
+        handle = pool.put(db_path, db)
+        try:
+            pipeline = get_embedding_pipeline()
+            keyword_index = LexicalIndexBuilder()
+            chunks_done = 0
+            for pages_done, total_pages, chunks in iter_document_chunks(doc_path):
+                keyword_index.add(chunk_ids(chunks_done, len(chunks)), [chunk.page_content for chunk in chunks])
+                # Embed in batches across all API keys, inserting each batch as it completes
+                chunks_done += pipeline.embed_and_store(db, chunks, first_id=chunks_done)
+                log_event("indexed", f"Indexed {pages_done}/{total_pages or '?'} pages ({chunks_done} chunks)",
+                          pages=pages_done, total_pages=total_pages, chunks=chunks_done)
+                if progress:
+                    progress(pages_done, total_pages, chunks_done)
+            with span("persist"):
+                keyword_index.save(lexical_index_path(db_path))
+        finally:
+            pool.release(handle)
+            # Queries answered while the store was being built only saw part of it
+            _invalidate_answers(db_path, content_hashes)
+        
+        log_event("database_created", "Database created successfully", db_path=db_path, chunks=chunks_done)
+        return db
+
+def open_database(doc_path=None):
+    """Use the vector database for a specific document in a with block.
+    
+    The handle can't be closed by pool eviction until the block exits.
+    
+    Usage:
+        with open_database(doc_path) as db:
+            results = db.similarity_search(question)
+    """
+    # Use default document if none provided
+    doc_path = doc_path or DEFAULT_DOC_PATH
+    return get_handle_pool().lease(resolve_db_path(doc_path))
+
+def get_database(doc_path=None):
+    """Get an instance of the vector database for a specific document.
+    
+    The returned handle isn't leased, so the pool may close it once it's the
+    least recently used; use open_database() for anything beyond a quick call.
+    """
+    with open_database(doc_path) as db:
+        return db
 
 def delete_database(doc_path):
     """Delete a document's vector database."""
-    global _db_instances
-    
     # Get document-specific database path
-    db_path = get_document_db_path(doc_path)
+    db_path = resolve_db_path(doc_path)
     
-    # Remove from cache if present
-    if doc_path in _db_instances:
-        del _db_instances[doc_path]
+    # Close the open handle (deferred until in-flight queries release it)
+    get_handle_pool().discard(db_path)
     
-    # Delete the database directory if it exists
-    if os.path.exists(db_path):
-        shutil.rmtree(db_path)
-        print(f"Deleted database at: {db_path}")
+    # Cached answers refer to the deleted store
+    registry = get_registry()
+    _invalidate_answers(db_path, registry.content_hashes(db_path))
+    discard_lexical_index(lexical_index_path(db_path))
+    
+    # Forget the content hash so a re-upload is ingested again
+    registry.unregister_db_path(db_path)
+    
+    # Delete the database directory (or shared-layout collection) if it exists
+    if delete_store(db_path):
+        log_event("delete_database", f"Deleted database at: {db_path}", db_path=db_path)
         return True
     
     return False
+
+def search_by_vector(db, question_vector, k=3):
+    """Search a store by question vector, returning (document, relevance score) pairs."""
+    relevance_fn = db._select_relevance_score_fn()
+    results = db.similarity_search_by_vector_with_relevance_scores(question_vector, k=k)
+    return [(doc, relevance_fn(distance)) for doc, distance in results]
+
+def _fuse_rankings(rankings, k):
+    """Combine rankings of chunk ids with reciprocal rank fusion.
+    
+    Returns:
+        list: The k best (chunk id, fused score) pairs
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+def _vector_distance(space, a, b):
+    """Get the distance Chroma reports between two vectors in a collection with the given hnsw:space."""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    if space == "cosine":
+        return 1.0 - float(a @ b) / ((np.linalg.norm(a) * np.linalg.norm(b)) or 1.0)
+    if space == "ip":
+        return 1.0 - float(a @ b)
+    return float(np.sum((a - b) ** 2))  # Chroma's l2 is the squared distance
+
+def _hybrid_candidates(db, db_path, question, question_vector, k):
+    """Search a store by meaning and by exact words.
+    
+    Returns:
+        tuple: (fused, documents, relevance), where fused holds the k best (chunk id,
+            fused score) pairs, documents maps chunk ids to documents and relevance
+            maps chunk ids to their vector relevance scores
+    """
+    candidates = max(k, HYBRID_CANDIDATES)
+    vector_results = search_by_vector(db, question_vector, k=candidates)
+    documents = {doc.id: doc for doc, _score in vector_results}
+    relevance = {doc.id: score for doc, score in vector_results}
+    rankings = [[doc.id for doc, _score in vector_results]]
+    
+    index = get_lexical_index(lexical_index_path(db_path))
+    if index is not None:
+        rankings.append([chunk_id for chunk_id, _score in index.search(question, candidates)])
+    
+    fused = _fuse_rankings(rankings, k)
+    missing = [chunk_id for chunk_id, _score in fused if chunk_id not in documents]
+    if missing:
+        # Keyword-only matches aren't among the vector results; fetch their text and score their vectors
+        found = db.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+        relevance_fn = db._select_relevance_score_fn()
+        space = (db._collection.metadata or {}).get("hnsw:space", "l2")
+        for chunk_id, text, metadata, embedding in zip(found["ids"], found["documents"], found["metadatas"],
+                                                       found["embeddings"]):
+            documents[chunk_id] = Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            relevance[chunk_id] = relevance_fn(_vector_distance(space, question_vector, embedding))
+    return [(chunk_id, score) for chunk_id, score in fused if chunk_id in documents], documents, relevance
+
+def hybrid_search(db, db_path, question, question_vector, k=3):
+    """Search a store by meaning and by exact words, fusing the two rankings.
+    
+    Vector search finds paraphrases; BM25 over the store's keyword index finds
+    exact terms, IDs and names that embeddings blur. The top HYBRID_CANDIDATES
+    chunks of each are fused with reciprocal rank fusion, so scores are
+    rank-based (higher is better) rather than similarities. A store without a
+    keyword index is ranked by vector search alone. With HYBRID_SEARCH off
+    this is plain vector search.
+    
+    Returns:
+        list: (document, score) pairs, best first
+    """
+    if not HYBRID_SEARCH:
+        return search_by_vector(db, question_vector, k=k)
+    
+    fused, documents, _relevance = _hybrid_candidates(db, db_path, question, question_vector, k)
+    return [(documents[chunk_id], score) for chunk_id, score in fused]
+
+def hybrid_search_with_relevance(db, db_path, question, question_vector, k=3):
+    """Search a store like hybrid_search, but score the chunks by vector relevance.
+    
+    Fused scores depend only on a chunk's rank within its own store, so every
+    store's top chunk scores about the same whether or not it is relevant.
+    The chunks are chosen and ordered by the fused ranking as usual, and each
+    is scored by its relevance to the question vector, which is on the same
+    scale in every store built with the embedding model.
+    
+    Returns:
+        list: (document, relevance score) pairs in fused order
+    """
+    if not HYBRID_SEARCH:
+        return search_by_vector(db, question_vector, k=k)
+    
+    fused, documents, relevance = _hybrid_candidates(db, db_path, question, question_vector, k)
+    return [(documents[chunk_id], relevance[chunk_id]) for chunk_id, _score in fused]
+
+def get_chunk_embeddings(db, ids):
+    """Get the stored embeddings of chunks.
+    
+    Returns:
+        dict: Chunk id -> embedding (a NumPy array), for the ids found in the store
+    """
+    found = db.get(ids=list(ids), include=["embeddings"])
+    return dict(zip(found["ids"], found["embeddings"]))
+
+# Thread pool shared by every multi-document search
+_retrieval_executor = None
+_retrieval_executor_lock = threading.Lock()
+
+def get_retrieval_executor():
+    """Get the shared thread pool that searches document stores in parallel."""
+    global _retrieval_executor
+    with _retrieval_executor_lock:
+        if _retrieval_executor is None:
+            _retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieve")
+    return _retrieval_executor
+
+def _search_store(db_path, question, question_vector, k):
+    """Search one store, holding its handle meanwhile."""
+    with get_handle_pool().lease(db_path) as db:
+        return hybrid_search_with_relevance(db, db_path, question, question_vector, k)
+
+def _merge_results(per_store, k, max_per_document, min_per_document):
+    """Merge per-store results into a global top-k under per-document quotas.
+    
+    Each document's best min_per_document chunks are reserved first (best
+    ranks first, as far as k allows), then the remaining slots go to the most
+    relevant chunks overall, with at most max_per_document from any document.
+    A store's chunks are taken in its own ranking order; stores are compared
+    by the relevance score of their next chunk.
+    """
+    selected = []
+    counts = {db_path: 0 for db_path in per_store}
+    
+    # Reserve each document's best chunks first so no document is crowded out
+    for rank in range(min_per_document):
+        reserved = [(doc, score, db_path) for db_path, results in per_store.items()
+                    if rank < len(results) for doc, score in [results[rank]]]
+        for doc, score, db_path in sorted(reserved, key=lambda result: result[1], reverse=True):
+            if len(selected) < k and counts[db_path] < max_per_document:
+                selected.append((doc, score, db_path))
+                counts[db_path] += 1
+    
+    # Then repeatedly take the next chunk of the store whose next chunk is most relevant
+    next_rank = {db_path: min_per_document for db_path in per_store}
+    while len(selected) < k:
+        open_stores = [db_path for db_path, results in per_store.items()
+                       if next_rank[db_path] < len(results) and counts[db_path] < max_per_document]
+        if not open_stores:
+            break
+        db_path = max(open_stores, key=lambda path: per_store[path][next_rank[path]][1])
+        doc, score = per_store[db_path][next_rank[db_path]]
+        selected.append((doc, score, db_path))
+        counts[db_path] += 1
+        next_rank[db_path] += 1
+    
+    selected.sort(key=lambda result: result[1], reverse=True)
+    return selected
+
+def search_documents(question, question_vector, doc_paths=None, k=MULTI_DOC_K,
+                     max_per_document=MULTI_DOC_MAX_PER_DOC, min_per_document=MULTI_DOC_MIN_PER_DOC):
+    """Search several documents with one question vector and merge the results.
+    
+    Stores are searched concurrently, so latency tracks the slowest store
+    rather than the sum. Each store is searched with
+    hybrid_search_with_relevance(), which picks its chunks by the fused
+    ranking but scores them by vector relevance, so scores from different
+    stores can be compared. Stores that fail or take longer than
+    RETRIEVAL_TIMEOUT are skipped.
+    
+    Args:
+        question: The question text, for keyword search
+        question_vector: The embedded question, reused for every store
+        doc_paths: Documents to search (defaults to every fully indexed document)
+        k: Number of results to return overall
+        max_per_document: Maximum results taken from any one document
+        min_per_document: Results reserved for each document's best chunks
+    
+    Returns:
+        list: (document, score, database path) triples, best first
+    """
+    if doc_paths is None:
+        db_paths = get_registry().list_db_paths()
+    else:
+        db_paths = list(dict.fromkeys(resolve_db_path(doc_path or DEFAULT_DOC_PATH) for doc_path in doc_paths))
+    if not db_paths:
+        return []
+    
+    fetch_k = max(min(k, max_per_document), min_per_document)
+    executor = get_retrieval_executor()
+    futures = {executor.submit(_search_store, db_path, question, question_vector, fetch_k): db_path
+               for db_path in db_paths}
+    done, not_done = wait(futures, timeout=RETRIEVAL_TIMEOUT)
+    
+    per_store = {}
+    for future in not_done:
+        future.cancel()
+        log_event("timeout", f"Search of {futures[future]} timed out after {RETRIEVAL_TIMEOUT} seconds, skipping it",
+                  db_path=futures[future], stage="vector_search")
+    for future in done:
+        try:
+            per_store[futures[future]] = future.result()
+        except Exception as e:
+            log_event("search_failed", f"Search of {futures[future]} failed, skipping it: {str(e)}",
+                      db_path=futures[future], error=str(e))
+    
+    return _merge_results(per_store, k, max_per_document, min_per_document)
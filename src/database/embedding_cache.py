@@ -0,0 +1,210 @@
+"""Persistent chunk-level embedding cache shared across documents."""
+from array import array
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from src.config.settings import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+from src.utils.metrics import get_metrics
+from src.utils.tracing import log_event
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+def normalize_text(text):
+    """Normalize chunk text so whitespace-only differences share a cache entry."""
+    return " ".join(text.split())
+
+def text_hash(text):
+    """Get the cache key for a chunk of text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """On-disk embedding store keyed by (embedding model, normalized text hash).
+
+    Vectors are stored as float32 blobs in SQLite. When the store grows past
+    max_entries the least recently used vectors are evicted.
+    """
+
+    def __init__(self, cache_path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        """Initialize the cache.
+
+        Args:
+            cache_path: SQLite file the vectors are persisted to
+            max_entries: Maximum number of vectors kept before eviction
+        """
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self.conn.commit()
+
+        # Counters for monitoring cache effectiveness
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, model, texts):
+        """Look up cached vectors for a list of texts.
+
+        Args:
+            model: Name of the embedding model the vectors came from
+            texts: The texts to look up
+
+        Returns:
+            list: One vector (list of floats) per text, or None for cache misses
+        """
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        now = time.time()
+
+        with self.lock:
+            unique_hashes = list(set(hashes))
+            for start in range(0, len(unique_hashes), _LOOKUP_BATCH_SIZE):
+                batch = unique_hashes[start:start + _LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for row_hash, blob in rows:
+                    found[row_hash] = array("f", blob).tolist()
+
+            # Refresh recency so frequently shared chunks survive eviction
+            if found:
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self.conn.commit()
+
+            vectors = [found.get(h) for h in hashes]
+            hit_count = sum(1 for v in vectors if v is not None)
+            self.hits += hit_count
+            self.misses += len(vectors) - hit_count
+
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        """Store vectors for a list of texts, evicting old entries if needed."""
+        now = time.time()
+        rows = [
+            (model, text_hash(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Drop the least recently used vectors above max_entries. Caller must hold the lock."""
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+
+        self.conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (overflow,)
+        )
+        self.evictions += overflow
+
+    def get_stats(self):
+        """Get hit/miss counters and the current size of the cache."""
+        with self.lock:
+            (count,) = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": count,
+                "max_entries": self.max_entries,
+            }
+
+    def collect_metrics(self):
+        """Get the cache's statistics as (metric name, labels, value) samples for /metrics."""
+        stats = self.get_stats()
+        return [
+            ("rag_embedding_cache_lookups_total", {"result": "hit"}, stats["hits"]),
+            ("rag_embedding_cache_lookups_total", {"result": "miss"}, stats["misses"]),
+            ("rag_embedding_cache_evictions_total", {}, stats["evictions"]),
+            ("rag_embedding_cache_entries", {}, stats["entries"]),
+        ]
+
+EMBEDDING_CACHE_METRICS = {
+    "rag_embedding_cache_lookups_total": ("counter", "Chunk embedding cache lookups, by result"),
+    "rag_embedding_cache_evictions_total": ("counter", "Embeddings evicted from the cache"),
+    "rag_embedding_cache_entries": ("gauge", "Embeddings in the cache"),
+}
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model."""
+
+    def __init__(self, embeddings, model, cache=None):
+        """Initialize the wrapper.
+
+        Args:
+            embeddings: The underlying LangChain embeddings instance
+            model: Name of the embedding model, used to namespace cached vectors
+            cache: The EmbeddingCache to use (defaults to the shared instance)
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache or get_embedding_cache()
+
+    def embed_documents(self, texts):
+        """Embed documents, reusing cached vectors for previously seen chunks."""
+        vectors = self.cache.get_many(self.model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            miss_texts = [texts[i] for i in missing]
+            new_vectors = self.embeddings.embed_documents(miss_texts)
+            self.cache.put_many(self.model, miss_texts, new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = list(vector)
+
+        log_event("embedding_cache", f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses",
+                  hits=len(texts) - len(missing), misses=len(missing))
+        return vectors
+
+    def embed_query(self, text):
+        """Embed a query (query vectors use a different task type, so aren't cached here)."""
+        return self.embeddings.embed_query(text)
+
+# Singleton instance
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """Get the singleton embedding cache instance."""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+            get_metrics().add_collector("embedding_cache", _embedding_cache.collect_metrics, EMBEDDING_CACHE_METRICS)
+    return _embedding_cache
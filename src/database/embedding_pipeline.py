@@ -0,0 +1,190 @@
+"""Batched, concurrent embedding of document chunks across all API keys."""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextvars
+import threading
+
+from src.config.settings import (
+    EMBEDDING_MODEL,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_PROVIDER,
+    LOCAL_EMBEDDING_BATCH_SIZE,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_WORKERS_PER_KEY,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RETRY_BASE_DELAY,
+    API_KEY_COOLDOWN_MAX,
+)
+from src.database.embedding_cache import get_embedding_cache
+from src.database.embedding_providers import (
+    PooledGoogleEmbeddings, get_embedding_model_name, get_local_embeddings, is_local_provider,
+)
+from src.utils.api_load_balancer import ApiKeyLoadBalancer, get_embedding_scheduler, is_rate_limit_error
+from src.utils.tracing import log_event, span
+
+def chunk_ids(first_id, count):
+    """Get the stable vector store ids of `count` chunks numbered from first_id."""
+    return [f"chunk-{first_id + i}" for i in range(count)]
+
+class EmbeddingPipeline:
+    """Embeds chunks in maximum-size batches fanned out across every API key.
+
+    Each key's long-lived client comes from the client pool, and batches
+    go to the key with the most quota left, so ingest time scales with the
+    number of keys instead of the number of pages. Cached vectors are reused
+    and only cache misses are sent to the API.
+    """
+
+    def __init__(self, api_keys=None, model=EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE):
+        """Initialize the pipeline.
+
+        Args:
+            api_keys: Keys to spread requests over (defaults to every key, sharing the
+                embedding scheduler with question embeddings)
+            model: Name of the embedding model
+            batch_size: Number of texts per embedding request
+        """
+        if api_keys is None:
+            self.scheduler = get_embedding_scheduler()
+        else:
+            self.scheduler = ApiKeyLoadBalancer(
+                api_keys=api_keys,
+                requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+                max_in_flight=EMBEDDING_WORKERS_PER_KEY,
+                cooldown_base=EMBEDDING_RETRY_BASE_DELAY,
+                cooldown_max=API_KEY_COOLDOWN_MAX,
+            )
+        self.api_keys = self.scheduler.api_keys
+        self.model = model
+        self.batch_size = batch_size
+        self.cache = get_embedding_cache()
+        self.embeddings = PooledGoogleEmbeddings(model, scheduler=self.scheduler)
+        self.description = f"{len(self.api_keys)} keys"
+
+        # Each key runs at most EMBEDDING_WORKERS_PER_KEY batches at once
+        self.executor = ThreadPoolExecutor(
+            max_workers=len(self.api_keys) * EMBEDDING_WORKERS_PER_KEY,
+            thread_name_prefix="embed"
+        )
+
+    def _embed_batch(self, texts):
+        """Embed one batch, moving to another key when one is rate limited.
+
+        A rate-limited key is quarantined by the scheduler, which holds the
+        retry until some key has quota again.
+        """
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                with span("embed", provider=EMBEDDING_PROVIDER):
+                    vectors = self.embeddings.embed_documents(texts, batch_size=len(texts))
+                self.cache.put_many(self.model, texts, vectors)
+                return vectors
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                log_event("rate_limited", f"Embedding batch rate limited, retrying on another key: {str(e)}",
+                          error=str(e))
+
+    def embed_and_store(self, db, chunks, first_id=0, progress=None):
+        """Embed chunks and insert them into a Chroma store as batches complete.
+
+        Args:
+            db: The Chroma vector store to insert into
+            chunks: The LangChain documents to embed
+            first_id: Number of the first chunk, used to build stable chunk ids
+            progress: Optional callback called with the number of chunks stored so far
+
+        Returns:
+            int: The number of chunks stored
+        """
+        if not chunks:
+            return 0
+
+        texts = [chunk.page_content for chunk in chunks]
+        ids = chunk_ids(first_id, len(chunks))
+        vectors = self.cache.get_many(self.model, texts)
+
+        stored = 0
+        hits = [i for i, vector in enumerate(vectors) if vector is not None]
+        if hits:
+            self._insert(db, chunks, ids, hits, [vectors[i] for i in hits])
+            stored += len(hits)
+            if progress:
+                progress(stored)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+        log_event("embedding", f"Embedding {len(missing)} chunks in {len(batches)} batches with {self.description} "
+                  f"({len(hits)} served from cache)", chunks=len(missing), batches=len(batches), cached=len(hits))
+
+        # Each batch runs in a copy of this context, so its spans belong to the ingestion's trace
+        futures = {
+            self.executor.submit(contextvars.copy_context().run, self._embed_batch, [texts[i] for i in batch]): batch
+            for batch in batches
+        }
+        try:
+            for future in as_completed(futures):
+                batch = futures[future]
+                self._insert(db, chunks, ids, batch, future.result())
+                stored += len(batch)
+                if progress:
+                    progress(stored)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+        return stored
+
+    def _insert(self, db, chunks, ids, indices, vectors):
+        """Bulk-insert precomputed vectors for the given chunk indices."""
+        with span("persist"):
+            db._collection.upsert(
+                ids=[ids[i] for i in indices],
+                embeddings=[list(vector) for vector in vectors],
+                documents=[chunks[i].page_content for i in indices],
+                metadatas=[chunks[i].metadata for i in indices],
+            )
+
+class LocalEmbeddingPipeline(EmbeddingPipeline):
+    """Embeds chunks in batches with a CPU-local model instead of the API.
+
+    The model already spreads each batch over its own threads, so batches are
+    embedded one at a time, overlapping only with inserting the previous one.
+    """
+
+    def __init__(self, embeddings, model, batch_size=LOCAL_EMBEDDING_BATCH_SIZE):
+        """Initialize the pipeline.
+
+        Args:
+            embeddings: The local LangChain embeddings instance
+            model: Name of the embedding model
+            batch_size: Number of texts per batch
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.batch_size = batch_size
+        self.cache = get_embedding_cache()
+        self.description = model
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+
+    def _embed_batch(self, texts):
+        """Embed one batch with the local model."""
+        with span("embed", provider=EMBEDDING_PROVIDER):
+            vectors = self.embeddings.embed_documents(texts)
+        self.cache.put_many(self.model, texts, vectors)
+        return vectors
+
+# Singleton instance
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_embedding_pipeline():
+    """Get the singleton embedding pipeline instance."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            if is_local_provider():
+                _pipeline = LocalEmbeddingPipeline(get_local_embeddings(), get_embedding_model_name())
+            else:
+                _pipeline = EmbeddingPipeline()
+    return _pipeline
@@ -0,0 +1,268 @@
+"""Embedding providers: the remote Google model or a CPU-local model."""
+from functools import cached_property
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.config.settings import (
+    EMBEDDING_MODEL,
+    EMBEDDING_PROVIDER,
+    HASHING_EMBEDDING_DIMENSIONS,
+    LOCAL_EMBEDDING_BATCH_SIZE,
+    LOCAL_EMBEDDING_THREADS,
+)
+from src.utils.api_load_balancer import get_embedding_scheduler
+from src.utils.client_pool import get_client_pool
+
+ONNX_MODEL_NAME = "onnx/all-MiniLM-L6-v2"
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Hashed token columns are memoized; the memo is cleared when it grows past this
+_MAX_MEMOIZED_TOKENS = 500000
+
+class HashingEmbeddings(Embeddings):
+    """Feature-hashing embeddings computed with NumPy, with no model to download.
+
+    Each word and word pair is hashed to a signed column of a fixed-width
+    vector; counts are log-scaled and rows L2-normalized. Similar wording
+    gives similar vectors, which is enough for offline use and tests, but
+    it doesn't capture meaning like a trained model.
+    """
+
+    def __init__(self, dimensions=HASHING_EMBEDDING_DIMENSIONS, batch_size=LOCAL_EMBEDDING_BATCH_SIZE):
+        """Initialize the embeddings.
+
+        Args:
+            dimensions: Length of the returned vectors
+            batch_size: Number of texts turned into one matrix at a time
+        """
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.columns = {}  # token -> signed column (column + 1, negated for -1 weights)
+        self.lock = threading.Lock()
+
+    def _column(self, token):
+        """Get the signed column a token is counted in."""
+        column = self.columns.get(token)
+        if column is None:
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            column = int.from_bytes(digest[:4], "little") % self.dimensions + 1
+            if digest[4] & 1:
+                column = -column
+            with self.lock:
+                if len(self.columns) >= _MAX_MEMOIZED_TOKENS:
+                    self.columns.clear()
+                self.columns[token] = column
+        return column
+
+    def _embed_batch(self, texts):
+        """Embed a batch of texts as one (len(texts), dimensions) matrix."""
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            words = _TOKEN_PATTERN.findall(text.lower())
+            tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            rows.extend([row] * len(tokens))
+            columns.extend(self._column(token) for token in tokens)
+
+        columns = np.array(columns, dtype=np.int64)
+        cells = np.array(rows, dtype=np.int64) * self.dimensions + np.abs(columns) - 1
+        counts = np.bincount(cells, weights=np.sign(columns), minlength=len(texts) * self.dimensions)
+        matrix = counts.reshape(len(texts), self.dimensions)
+
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
+
+    def embed_documents(self, texts):
+        """Embed a list of texts."""
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        """Embed a question."""
+        return self.embed_documents([text])[0]
+
+class _MiniLM:
+    """Runs Chroma's bundled all-MiniLM-L6-v2 files with a thread count and per-batch padding."""
+
+    def __init__(self, files, threads):
+        """Initialize the runner.
+
+        Args:
+            files: Chroma's ONNXMiniLM_L6_V2, which downloads the model and loads ONNX Runtime
+            threads: ONNX Runtime threads used by each forward pass
+        """
+        self.files = files
+        self.threads = threads
+        self.model_dir = os.path.join(files.DOWNLOAD_PATH, files.EXTRACTED_FOLDER_NAME)
+
+    def download(self):
+        """Download and extract the model if it isn't cached yet."""
+        self.files._download_model_if_not_exists()
+
+    @cached_property
+    def tokenizer(self):
+        tokenizer = self.files.Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        # Pad to the longest text of each batch rather than always to 256 tokens;
+        # pooling is masked, so the vectors are the same but short texts run much faster
+        tokenizer.enable_truncation(max_length=256)
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        return tokenizer
+
+    def forward(self, documents, batch_size=32):
+        """Embed texts batch by batch, each a single forward pass with mean pooling."""
+        batches = []
+        for start in range(0, len(documents), batch_size):
+            encoded = self.tokenizer.encode_batch(documents[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            hidden = self.model.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids),
+            })[0]
+            mask = attention_mask[:, :, np.newaxis].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(self.files._normalize(pooled).astype(np.float32))
+        return np.concatenate(batches)
+
+    @cached_property
+    def model(self):
+        options = self.files.ort.SessionOptions()
+        options.log_severity_level = 3
+        options.intra_op_num_threads = self.threads
+        return self.files.ort.InferenceSession(
+            os.path.join(self.model_dir, "model.onnx"),
+            providers=self.files._preferred_providers,
+            sess_options=options,
+        )
+
+class OnnxEmbeddings(Embeddings):
+    """all-MiniLM-L6-v2 sentence embeddings run on the CPU with ONNX Runtime.
+
+    The model (about 80 MB) is downloaded to ~/.cache/chroma on first use.
+    Texts are embedded in batches, each one forward pass over a padded
+    token matrix using `threads` intra-op threads.
+    """
+
+    def __init__(self, batch_size=LOCAL_EMBEDDING_BATCH_SIZE, threads=LOCAL_EMBEDDING_THREADS):
+        """Initialize the embeddings.
+
+        Args:
+            batch_size: Number of texts per forward pass
+            threads: ONNX Runtime threads used by each forward pass
+        """
+        # Chroma's embedding functions load ONNX Runtime and tokenizers, so they're only
+        # imported once the local model is used
+        from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+        self.batch_size = batch_size
+        self.runner = _MiniLM(ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"]), threads)
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        """Embed a list of texts."""
+        if not texts:
+            return []
+        with self.lock:
+            self.runner.download()
+        return self.runner.forward(list(texts), batch_size=self.batch_size).tolist()
+
+    def embed_query(self, text):
+        """Embed a question."""
+        return self.embed_documents([text])[0]
+
+class PooledGoogleEmbeddings(Embeddings):
+    """Google embeddings sent through warm clients, one per API key, from the client pool.
+
+    Each request goes to the key the scheduler picks and reuses that key's
+    client and its open connections.
+    """
+
+    provider = "google-embeddings"
+
+    def __init__(self, model=EMBEDDING_MODEL, scheduler=None, pool=None):
+        """Initialize the embeddings.
+
+        Args:
+            model: Name of the embedding model
+            scheduler: ApiKeyLoadBalancer choosing each request's key (defaults to the embedding scheduler)
+            pool: ClientPool holding the clients (defaults to the shared pool)
+        """
+        self.model = model
+        self.scheduler = scheduler or get_embedding_scheduler()
+        self.pool = pool or get_client_pool()
+
+    def _create_client(self, key):
+        # The Google SDK takes a while to import, so it's only loaded once a client is needed
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model=self.model, google_api_key=key)
+
+    def _request(self, call):
+        """Run one request on a checked-out client."""
+        key, client = self.pool.checkout(self.provider, self._create_client, self.scheduler)
+        error = None
+        try:
+            return call(client)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.pool.checkin(self.provider, key, client, self.scheduler, error)
+
+    def embed_documents(self, texts, batch_size=100):
+        """Embed a list of texts in one request per batch_size texts."""
+        return self._request(lambda client: client.embed_documents(texts, batch_size=batch_size))
+
+    def embed_query(self, text):
+        """Embed a question."""
+        return self._request(lambda client: client.embed_query(text))
+
+def get_embedding_model_name(provider=EMBEDDING_PROVIDER):
+    """Get the name of the embedding model a provider uses, recorded in the stores it builds."""
+    if provider == "google":
+        return EMBEDDING_MODEL
+    if provider == "onnx":
+        return ONNX_MODEL_NAME
+    if provider == "hashing":
+        return f"hashing-{HASHING_EMBEDDING_DIMENSIONS}"
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider}")
+
+def is_local_provider(provider=EMBEDDING_PROVIDER):
+    """Check whether a provider embeds on this machine rather than through an API."""
+    return provider != "google"
+
+# Singleton instance
+_local_embeddings = None
+_local_embeddings_lock = threading.Lock()
+
+def get_local_embeddings():
+    """Get the singleton CPU-local embedding model, so it's only loaded once."""
+    global _local_embeddings
+    with _local_embeddings_lock:
+        if _local_embeddings is None:
+            if EMBEDDING_PROVIDER == "onnx":
+                _local_embeddings = OnnxEmbeddings()
+            else:
+                _local_embeddings = HashingEmbeddings()
+    return _local_embeddings
+
+def create_embeddings():
+    """Create an embedding function for the configured provider.
+
+    Google requests are spread over the API keys by the embedding scheduler,
+    reusing one long-lived client per key.
+    """
+    if EMBEDDING_PROVIDER == "google":
+        return PooledGoogleEmbeddings()
+    get_embedding_model_name()  # Reject unknown providers
+    return get_local_embeddings()
@@ -0,0 +1,242 @@
+"""Bounded pool of open Chroma handles shared by every request thread."""
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+
+from chromadb.api.shared_system_client import SharedSystemClient
+
+from src.config.settings import MAX_OPEN_DATABASES
+from src.utils.tracing import log_event
+
+def detach_client_system(client):
+    """Unregister a persistent Chroma client's system so new clients for its path start fresh.
+
+    Chroma shares one system (SQLite connections, loaded HNSW segments) per
+    persist directory. Returns the system, to be stopped once nothing uses it.
+    """
+    identifier = getattr(client, "_identifier", None)
+    system = SharedSystemClient._identifier_to_system.get(identifier)
+    if system is not None and system is getattr(client, "_system", system):
+        del SharedSystemClient._identifier_to_system[identifier]
+    return system
+
+def stop_client_system(system):
+    """Stop a detached client system, releasing its file handles and memory."""
+    if system is None:
+        return
+    try:
+        system.stop()
+    except Exception as e:
+        log_event("close_error", f"Error closing vector database: {str(e)}", error=str(e))
+
+def _detach_system(db):
+    """Detach the client system of a Chroma handle.
+
+    Handles on the shared-layout client don't own it, so there's nothing to stop.
+    """
+    if db._persist_directory is None:
+        return None
+    return detach_client_system(db._client)
+
+def close_database(db):
+    """Close a Chroma handle that was never added to a pool."""
+    stop_client_system(_detach_system(db))
+
+class _Handle:
+    """One open database and the number of requests currently using it."""
+
+    def __init__(self, key, db):
+        self.key = key
+        self.db = db
+        self.refcount = 0
+        self.system = None  # Set once the handle is detached and waiting to close
+
+class ChromaHandlePool:
+    """Keeps at most max_open Chroma handles open, closing the least recently used.
+
+    Handles are reference counted: a handle that is in use by a query or an
+    ingestion is never closed under it, only once its last user releases it.
+    Concurrent first requests for the same database open it once; the others
+    wait for that open to finish and share the handle.
+    """
+
+    def __init__(self, opener, max_open=MAX_OPEN_DATABASES):
+        """Initialize the pool.
+
+        Args:
+            opener: Function creating a Chroma handle for a database path
+            max_open: Maximum number of idle and in-use handles kept open
+        """
+        self.opener = opener
+        self.max_open = max_open
+        self.lock = threading.Lock()
+        self.handles = OrderedDict()  # key -> _Handle, least recently used first
+        self.opening = {}  # key -> threading.Event set when the open finishes
+
+        # Counters for monitoring the pool
+        self.opens = 0
+        self.hits = 0
+        self.waits = 0
+        self.evictions = 0
+
+    def acquire(self, key):
+        """Get the handle for a database path, opening it if needed.
+
+        Every acquire must be matched by a release().
+
+        Returns:
+            _Handle: The handle; its database is `handle.db`
+        """
+        while True:
+            with self.lock:
+                handle = self.handles.get(key)
+                if handle is not None:
+                    self.hits += 1
+                    return self._lease(handle)
+                opening = self.opening.get(key)
+                if opening is None:
+                    opening = self.opening[key] = threading.Event()
+                    break
+                self.waits += 1
+            # Another thread is opening this database; use its handle when it's done
+            opening.wait()
+
+        try:
+            db = self.opener(key)
+        except BaseException:
+            with self.lock:
+                del self.opening[key]
+            opening.set()
+            raise
+        return self.put(key, db, opening)
+
+    def put(self, key, db, opening=None):
+        """Add an already open database to the pool, replacing any existing handle.
+
+        The handle is returned acquired; the caller must release() it.
+        """
+        to_close = []
+        with self.lock:
+            old = self.handles.pop(key, None)
+            if old is not None:
+                to_close.append(self._detach(old))
+            handle = _Handle(key, db)
+            self.handles[key] = handle
+            self.opens += 1
+            self._lease(handle)
+            to_close.extend(self._evict())
+            if opening is not None:
+                del self.opening[key]
+        if opening is not None:
+            opening.set()
+        for system in to_close:
+            stop_client_system(system)
+        return handle
+
+    def release(self, handle):
+        """Return a handle acquired with acquire() or put()."""
+        with self.lock:
+            handle.refcount -= 1
+            if handle.refcount > 0:
+                return
+            if handle.system is not None:
+                # Discarded while in use: close it now that it's idle
+                to_close, handle.system = [handle.system], None
+            else:
+                to_close = self._evict()
+        for system in to_close:
+            stop_client_system(system)
+
+    @contextmanager
+    def lease(self, key):
+        """Use a database for the duration of a with block."""
+        handle = self.acquire(key)
+        try:
+            yield handle.db
+        finally:
+            self.release(handle)
+
+    def discard(self, key):
+        """Close a database's handle, e.g. before its directory is deleted.
+
+        If the handle is in use it is closed when its last user releases it;
+        new requests get a fresh handle.
+        """
+        with self.lock:
+            handle = self.handles.pop(key, None)
+            system = self._detach(handle) if handle is not None else None
+        stop_client_system(system)
+
+    def _lease(self, handle):
+        """Take a reference and mark the handle as recently used. Caller must hold the lock."""
+        handle.refcount += 1
+        self.handles.move_to_end(handle.key)
+        return handle
+
+    def _detach(self, handle):
+        """Detach a handle removed from the pool. Caller must hold the lock.
+
+        Returns:
+            The client system to stop now, or None if the handle is still in use
+        """
+        system = _detach_system(handle.db)
+        if handle.refcount > 0:
+            handle.system = system
+            return None
+        return system
+
+    def _evict(self):
+        """Close idle handles, least recently used first, while over budget. Caller must hold the lock.
+
+        Returns:
+            list: Client systems to stop once the lock is released
+        """
+        to_close = []
+        overflow = len(self.handles) - self.max_open
+        for key in list(self.handles):
+            if overflow <= 0:
+                break
+            handle = self.handles[key]
+            if handle.refcount > 0:
+                continue
+            del self.handles[key]
+            log_event("close_database", f"Closing idle vector database: {key}", db_path=key)
+            to_close.append(self._detach(handle))
+            self.evictions += 1
+            overflow -= 1
+        return to_close
+
+    def get_stats(self):
+        """Get the number of open handles and open/eviction counters."""
+        with self.lock:
+            return {
+                "open_handles": len(self.handles),
+                "in_use": sum(1 for handle in self.handles.values() if handle.refcount > 0),
+                "max_open": self.max_open,
+                "opens": self.opens,
+                "hits": self.hits,
+                "waits": self.waits,
+                "evictions": self.evictions,
+                "eviction_rate": self.evictions / self.opens if self.opens else 0.0,
+            }
+
+    def collect_metrics(self):
+        """Get the pool's statistics as (metric name, labels, value) samples for /metrics."""
+        stats = self.get_stats()
+        return [
+            ("rag_db_handles_open", {}, stats["open_handles"]),
+            ("rag_db_handles_in_use", {}, stats["in_use"]),
+            ("rag_db_handle_opens_total", {}, stats["opens"]),
+            ("rag_db_handle_reuses_total", {}, stats["hits"]),
+            ("rag_db_handle_waits_total", {}, stats["waits"]),
+            ("rag_db_handle_evictions_total", {}, stats["evictions"]),
+        ]
+
+HANDLE_POOL_METRICS = {
+    "rag_db_handles_open": ("gauge", "Vector database handles open"),
+    "rag_db_handles_in_use": ("gauge", "Vector database handles leased by a request"),
+    "rag_db_handle_opens_total": ("counter", "Vector databases opened"),
+    "rag_db_handle_reuses_total": ("counter", "Leases served by an already open vector database"),
+    "rag_db_handle_waits_total": ("counter", "Leases that waited for a vector database to be opened or closed"),
+    "rag_db_handle_evictions_total": ("counter", "Idle vector databases closed to stay under MAX_OPEN_DATABASES"),
+}
@@ -0,0 +1,202 @@
+"""Background ingestion scheduler with a job table for status polling."""
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import os
+import threading
+import time
+import uuid
+
+from src.config.settings import INGEST_WORKERS, INGEST_JOB_HISTORY
+from src.database.document_registry import get_registry
+from src.database.document_store import initialize_database, delete_database
+from src.utils.tracing import log_event
+
+# Job states
+QUEUED = "queued"
+PARSING = "parsing"
+EMBEDDING = "embedding"
+READY = "ready"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+ACTIVE_STATES = (QUEUED, PARSING, EMBEDDING)
+
+class IngestionCancelled(Exception):
+    """Raised inside an ingestion job when it has been cancelled."""
+
+class IngestionJob:
+    """State of one document ingestion."""
+
+    def __init__(self, doc_path, content_hash):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.doc_path = doc_path
+        self.content_hash = content_hash
+        self.status = QUEUED
+        self.pages_done = 0
+        self.total_pages = None
+        self.chunks_done = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def is_active(self):
+        """Check whether the job is still queued or running."""
+        return self.status in ACTIVE_STATES
+
+    def is_queryable(self):
+        """Check whether at least part of the document can be searched."""
+        return self.status == READY or (self.status == EMBEDDING and self.chunks_done > 0)
+
+    def describe(self):
+        """Get a human-readable status line for the UI."""
+        name = os.path.basename(self.doc_path)
+        if self.status == QUEUED:
+            return f"Queued: {name}"
+        if self.status == PARSING:
+            return f"Parsing: {name}"
+        if self.status == EMBEDDING:
+            return f"Indexing {name}: {self.pages_done}/{self.total_pages or '?'} pages ({self.chunks_done} chunks)"
+        if self.status == READY:
+            return f"Successfully uploaded and processed: {name}"
+        if self.status == CANCELLED:
+            return f"Cancelled processing of: {name}"
+        return f"Error processing document: {self.error}"
+
+    def to_dict(self):
+        """Get the job state as a plain dict."""
+        return {
+            "job_id": self.job_id,
+            "doc_path": self.doc_path,
+            "status": self.status,
+            "pages_done": self.pages_done,
+            "total_pages": self.total_pages,
+            "chunks_done": self.chunks_done,
+            "error": self.error,
+        }
+
+class IngestionScheduler:
+    """Runs document ingestion on a bounded worker pool.
+
+    Upload handlers submit a job and return immediately; the UI polls the job
+    table for progress. Identical documents (by content hash) that are already
+    queued or running share a single job.
+    """
+
+    def __init__(self, max_workers=INGEST_WORKERS, history=INGEST_JOB_HISTORY):
+        """Initialize the scheduler.
+
+        Args:
+            max_workers: Number of documents ingested concurrently
+            history: Number of finished jobs kept in the job table
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.history = history
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+
+    def submit(self, doc_path):
+        """Queue a document for ingestion.
+
+        Returns:
+            IngestionJob: The new job, or the active job for an identical document
+        """
+        content_hash = get_registry().content_hash(doc_path)
+
+        with self.lock:
+            for job in self.jobs.values():
+                if job.is_active() and (job.doc_path == doc_path or
+                                        (content_hash and job.content_hash == content_hash)):
+                    log_event("ingest_joined", f"Ingestion of {os.path.basename(doc_path)} joins existing job {job.job_id}",
+                              job_id=job.job_id, doc_path=doc_path)
+                    return job
+
+            job = IngestionJob(doc_path, content_hash)
+            self.jobs[job.job_id] = job
+            self._prune()
+            job.future = self.executor.submit(self._run, job)
+            return job
+
+    def _run(self, job):
+        """Ingest a document, updating the job as it progresses."""
+        if job.cancel_event.is_set():
+            return
+
+        def progress(pages_done, total_pages, chunks_done):
+            if job.cancel_event.is_set():
+                raise IngestionCancelled()
+            job.status = EMBEDDING
+            job.pages_done = pages_done
+            job.total_pages = total_pages
+            job.chunks_done = chunks_done
+
+        job.status = PARSING
+        try:
+            initialize_database(job.doc_path, progress=progress)
+            job.status = READY
+        except IngestionCancelled:
+            log_event("ingest_cancelled", f"Ingestion job {job.job_id} cancelled, removing partial database",
+                      job_id=job.job_id)
+            delete_database(job.doc_path)
+            job.status = CANCELLED
+        except Exception as e:
+            log_event("ingest_failed", f"Ingestion job {job.job_id} failed: {str(e)}", job_id=job.job_id, error=str(e))
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job.
+
+        Returns:
+            bool: True if the job was still active
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None or not job.is_active():
+            return False
+
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Never started, so there's nothing to clean up
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        return True
+
+    def get_job(self, job_id):
+        """Get a job by id."""
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def get_job_for_document(self, doc_path):
+        """Get the most recent job for a document path."""
+        with self.lock:
+            for job in reversed(self.jobs.values()):
+                if job.doc_path == doc_path:
+                    return job
+        return None
+
+    def list_jobs(self):
+        """Get every job in the table as plain dicts, oldest first."""
+        with self.lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond the history limit. Caller must hold the lock."""
+        finished = [job_id for job_id, job in self.jobs.items() if not job.is_active()]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+# Singleton instance
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_ingestion_scheduler():
+    """Get the singleton ingestion scheduler instance."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = IngestionScheduler()
+    return _scheduler
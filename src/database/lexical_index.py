@@ -0,0 +1,197 @@
+"""Per-document BM25 keyword index stored next to each vector store."""
+from collections import Counter, OrderedDict
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+
+from src.config.settings import MAX_OPEN_DATABASES
+from src.utils.tracing import log_event
+
+# BM25 term frequency saturation and document length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def term_hash(term):
+    """Get the 64-bit hash a term is stored under, so the vocabulary is a flat integer array."""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+class LexicalIndexBuilder:
+    """Collects chunk texts during ingestion and writes them out as a LexicalIndex."""
+
+    def __init__(self):
+        self.ids = []
+        self.lengths = []
+        self.postings = {}  # term -> [(chunk number, term frequency)]
+
+    def add(self, ids, texts):
+        """Add chunks to the index.
+
+        Args:
+            ids: Chunk ids in the vector store
+            texts: Chunk texts
+        """
+        for chunk_id, text in zip(ids, texts):
+            number = len(self.ids)
+            tokens = tokenize(text)
+            self.ids.append(chunk_id)
+            self.lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                self.postings.setdefault(term, []).append((number, frequency))
+
+    def save(self, path):
+        """Write the index to path, replacing any older index atomically."""
+        terms = sorted(self.postings, key=term_hash)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(self.postings[term]) for term in terms])
+        chunks = np.empty(offsets[-1], dtype=np.int32)
+        frequencies = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            entries = np.array(self.postings[term], dtype=np.int64).reshape(-1, 2)
+            chunks[offsets[i]:offsets[i + 1]] = entries[:, 0]
+            frequencies[offsets[i]:offsets[i + 1]] = np.minimum(entries[:, 1], np.iinfo(np.uint16).max)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp.npz"
+        np.savez(
+            temp_path,
+            terms=np.array([term_hash(term) for term in terms], dtype=np.uint64),
+            offsets=offsets,
+            chunks=chunks,
+            frequencies=frequencies,
+            lengths=np.array(self.lengths, dtype=np.int32),
+            ids=np.array([chunk_id.encode("utf-8") for chunk_id in self.ids], dtype=bytes),
+        )
+        os.replace(temp_path, path)
+        log_event("keyword_index_saved", f"Saved keyword index of {len(self.ids)} chunks and {len(terms)} terms to: {path}",
+                  chunks=len(self.ids), terms=len(terms), path=path)
+
+class LexicalIndex:
+    """BM25 index over a document's chunks, with postings held in flat NumPy arrays.
+
+    The vocabulary is a sorted array of term hashes, so a lookup is a binary
+    search. Each term's postings are a slice of one chunk-number array and
+    one array of precomputed BM25 weights, so scoring a query is a single
+    weighted bincount over the query terms' slices.
+    """
+
+    def __init__(self, path):
+        """Load an index written by LexicalIndexBuilder.save()."""
+        with np.load(path) as data:
+            self.terms = data["terms"]
+            self.offsets = data["offsets"]
+            self.chunks = data["chunks"]
+            frequencies = data["frequencies"].astype(np.float32)
+            lengths = data["lengths"].astype(np.float32)
+            self.ids = data["ids"]
+
+        # Every factor of a term's BM25 score in a chunk is known up front
+        average_length = lengths.mean() if len(lengths) else 0.0
+        length_norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (average_length or 1.0))
+        document_frequencies = np.diff(self.offsets).astype(np.float32)
+        idf = np.log1p((len(self.ids) - document_frequencies + 0.5) / (document_frequencies + 0.5))
+        self.weights = (np.repeat(idf, np.diff(self.offsets)) * frequencies * (BM25_K1 + 1)
+                        / (frequencies + length_norms[self.chunks])).astype(np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def idf(self, terms):
+        """Get the BM25 inverse document frequency of each term (highest for terms in no chunk)."""
+        hashes = np.array([term_hash(term) for term in terms], dtype=np.uint64)
+        document_frequencies = np.zeros(len(hashes), dtype=np.float32)
+        if len(hashes) and len(self.terms):
+            positions = np.minimum(np.searchsorted(self.terms, hashes), len(self.terms) - 1)
+            found = self.terms[positions] == hashes
+            document_frequencies[found] = (self.offsets[positions[found] + 1] - self.offsets[positions[found]])
+        return np.log1p((len(self.ids) - document_frequencies + 0.5) / (document_frequencies + 0.5))
+
+    def search(self, query, k):
+        """Find the chunks that best match the words of a query.
+
+        Returns:
+            list: (chunk id, BM25 score) pairs, best first; chunks sharing no word are left out
+        """
+        terms = np.array(sorted(term_hash(term) for term in set(tokenize(query))), dtype=np.uint64)
+        if not len(terms) or not len(self.terms):
+            return []
+        positions = np.searchsorted(self.terms, terms)
+        found = positions < len(self.terms)
+        found[found] = self.terms[positions[found]] == terms[found]
+
+        slices = [slice(self.offsets[position], self.offsets[position + 1]) for position in positions[found]]
+        if not slices:
+            return []
+        scores = np.bincount(
+            np.concatenate([self.chunks[part] for part in slices]),
+            weights=np.concatenate([self.weights[part] for part in slices]),
+            minlength=len(self.ids),
+        )
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+        matched = matched[np.argsort(scores[matched])[::-1]]
+        return [(self.ids[i].decode("utf-8"), float(scores[i])) for i in matched]
+
+# Loaded indexes, keyed by path, least recently used first
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+
+def get_lexical_index(path):
+    """Get the index stored at path, loading it on first use.
+
+    An index rewritten since it was loaded (by a rebuild in any process) is
+    loaded again.
+
+    Returns:
+        LexicalIndex: The index, or None if the store has no keyword index
+    """
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    with _loaded_lock:
+        entry = _loaded.get(path)
+        if entry is not None and entry[0] == modified:
+            _loaded.move_to_end(path)
+            return entry[1]
+
+    index = LexicalIndex(path)
+    with _loaded_lock:
+        _loaded[path] = (modified, index)
+        _loaded.move_to_end(path)
+        while len(_loaded) > MAX_OPEN_DATABASES:
+            _loaded.popitem(last=False)
+    return index
+
+def discard_lexical_index(path):
+    """Forget a loaded index, e.g. because its store is being rebuilt or deleted."""
+    with _loaded_lock:
+        _loaded.pop(path, None)
+
+def build_lexical_index(db, path, batch_size=1000):
+    """Build the keyword index of an existing store from the chunks stored in it.
+
+    Returns:
+        int: Number of chunks indexed
+    """
+    builder = LexicalIndexBuilder()
+    offset = 0
+    while True:
+        batch = db.get(limit=batch_size, offset=offset, include=["documents"])
+        if not batch["ids"]:
+            break
+        builder.add(batch["ids"], batch["documents"])
+        offset += len(batch["ids"])
+    builder.save(path)
+    return offset
@@ -0,0 +1,149 @@
+"""Move per-document Chroma directories into the shared collection-per-document layout.
+
+Each directory store is copied (ids, embeddings, texts and metadata, so nothing
+is re-embedded) into a collection of the shared client named after the
+document's content hash, and the registry is pointed at it. Stop the app first.
+
+Usage:
+    python -m src.database.migrate_layout [--dry-run] [--delete-old]
+
+Afterwards set CHROMA_LAYOUT=shared so new uploads use the shared layout too.
+"""
+import argparse
+import os
+import shutil
+
+import chromadb
+from chromadb.config import Settings
+
+from src.config.settings import DEFAULT_CHROMA_PATH, DEFAULT_DOC_PATH, SHARED_CHROMA_PATH, UPLOAD_FOLDER, get_document_db_path
+from src.database.chroma_layout import (
+    DEFAULT_COLLECTION, delete_store, get_shared_client, is_shared_db_path, lexical_index_path, shared_db_path,
+    split_db_path, store_exists,
+)
+from src.database.document_registry import get_registry
+from src.database.handle_pool import detach_client_system, stop_client_system
+
+# Rows copied per request
+_COPY_BATCH_SIZE = 500
+
+def find_directory_stores():
+    """Find every per-document directory store and the content hash of its document.
+
+    Registered stores come from the registry. Unregistered directories are
+    matched to a document in the uploads folder (or the default document) by
+    the directory name that document would get. Repeated uploads of one file
+    have identical contents, so their directories are grouped together.
+
+    Returns:
+        tuple: ({content hash: (source name, [db_paths])}, [directories with no known document])
+    """
+    registry = get_registry()
+    stores = {}
+    for content_hash, entry in registry.entries().items():
+        db_path = entry["db_path"]
+        if entry.get("complete", True) and not is_shared_db_path(db_path) and store_exists(db_path):
+            stores[content_hash] = (entry["source"], [db_path])
+
+    # Documents whose stores were built before the registry existed
+    documents = [DEFAULT_DOC_PATH]
+    if os.path.isdir(UPLOAD_FOLDER):
+        documents += [os.path.join(UPLOAD_FOLDER, name) for name in sorted(os.listdir(UPLOAD_FOLDER))]
+    directory_to_document = {get_document_db_path(doc_path): doc_path for doc_path in documents}
+
+    known = {db_paths[0] for _source, db_paths in stores.values()}
+    orphans = []
+    for name in sorted(os.listdir(DEFAULT_CHROMA_PATH)):
+        db_path = os.path.join(DEFAULT_CHROMA_PATH, name)
+        if db_path in known or os.path.abspath(db_path) == os.path.abspath(SHARED_CHROMA_PATH):
+            continue
+        if not os.path.exists(os.path.join(db_path, "chroma.sqlite3")):
+            continue
+        doc_path = directory_to_document.get(db_path)
+        content_hash = registry.content_hash(doc_path) if doc_path else None
+        if content_hash is None:
+            orphans.append(db_path)
+        else:
+            stores.setdefault(content_hash, (os.path.basename(doc_path), []))[1].append(db_path)
+    return stores, orphans
+
+def copy_store(source_path, target_path):
+    """Copy every row of a directory store, and its keyword index, into a shared-layout collection.
+
+    Returns:
+        int: Number of rows copied
+    """
+    source_client = chromadb.PersistentClient(path=source_path, settings=Settings(anonymized_telemetry=False))
+    try:
+        source = source_client.get_collection(DEFAULT_COLLECTION)
+        _directory, collection_name = split_db_path(target_path)
+        target = get_shared_client().get_or_create_collection(collection_name, metadata=source.metadata)
+
+        copied = 0
+        total = source.count()
+        while copied < total:
+            batch = source.get(limit=_COPY_BATCH_SIZE, offset=copied,
+                               include=["embeddings", "documents", "metadatas"])
+            if not batch["ids"]:
+                break
+            target.upsert(ids=batch["ids"], embeddings=batch["embeddings"],
+                          documents=batch["documents"], metadatas=batch["metadatas"])
+            copied += len(batch["ids"])
+
+        if os.path.exists(lexical_index_path(source_path)):
+            os.makedirs(os.path.dirname(lexical_index_path(target_path)), exist_ok=True)
+            shutil.copyfile(lexical_index_path(source_path), lexical_index_path(target_path))
+        return copied
+    finally:
+        # Close the source directory so it can be deleted
+        stop_client_system(detach_client_system(source_client))
+
+def migrate(dry_run=False, delete_old=False):
+    """Migrate every directory store into the shared layout.
+
+    Args:
+        dry_run: Only report what would be migrated
+        delete_old: Delete each directory once its rows are copied
+
+    Returns:
+        int: Number of stores migrated
+    """
+    registry = get_registry()
+    stores, orphans = find_directory_stores()
+    for db_path in orphans:
+        print(f"Skipping {db_path}: no source document found to compute its content hash")
+
+    migrated = 0
+    for content_hash, (source, db_paths) in stores.items():
+        target_path = shared_db_path(content_hash)
+        duplicates = f" and {len(db_paths) - 1} duplicate directories" if len(db_paths) > 1 else ""
+        if dry_run:
+            print(f"Would migrate {db_paths[0]}{duplicates} ({source}) -> {target_path}")
+            continue
+
+        if store_exists(target_path):
+            print(f"{db_paths[0]} ({source}) already migrated to {target_path}")
+        else:
+            registry.register(content_hash, target_path, source, complete=False)
+            rows = copy_store(db_paths[0], target_path)
+            print(f"Migrated {db_paths[0]}{duplicates} ({source}): {rows} chunks -> {target_path}")
+        registry.register(content_hash, target_path, source)
+        migrated += 1
+
+        if delete_old:
+            for db_path in db_paths:
+                if delete_store(db_path):
+                    print(f"Deleted {db_path}")
+
+    print(f"{'Found' if dry_run else 'Migrated'} {len(stores)} stores, skipped {len(orphans)}")
+    return migrated
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="Only list the stores that would be migrated")
+    parser.add_argument("--delete-old", action="store_true", help="Delete directory stores after copying them")
+    args = parser.parse_args()
+    migrate(dry_run=args.dry_run, delete_old=args.delete_old)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Multi-process PDF parsing and chunking."""
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import threading
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+from src.config.settings import INGEST_WINDOW_PAGES, PARSE_WORKERS
+from src.utils.tracing import span
+
+def get_text_splitter():
+    """Get the text splitter used to chunk document pages."""
+    # Optimize chunk size for better retrieval performance
+    # Smaller chunks with moderate overlap for better semantic matching
+    return RecursiveCharacterTextSplitter(
+        chunk_size=800,  # Reduced from 1000 for more precise retrieval
+        chunk_overlap=100,  # Reduced from 200 to minimize redundancy
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+def count_pages(path):
+    """Get the number of pages in a PDF."""
+    return len(PdfReader(path).pages)
+
+def parse_page_range(path, start, end):
+    """Extract and split pages [start, end) of a PDF.
+
+    Runs inside a worker process. Page text and metadata match what PyPDFLoader
+    produces, so chunks are identical whichever path parsed them.
+
+    Returns:
+        list: The chunks for the page range, in page order
+    """
+    # langchain_community is slow to import; only worker processes and the ingestion path need it
+    from langchain_community.document_loaders.parsers.pdf import _purge_metadata
+
+    reader = PdfReader(path)
+    total_pages = len(reader.pages)
+    doc_metadata = _purge_metadata(
+        {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+        | dict(reader.metadata or {})
+        | {"source": path, "total_pages": total_pages}
+    )
+    page_labels = reader.page_labels
+
+    pages = []
+    for page_number in range(start, min(end, total_pages)):
+        pages.append(Document(
+            page_content=reader.pages[page_number].extract_text().strip(),
+            metadata=doc_metadata | {"page": page_number, "page_label": page_labels[page_number]}
+        ))
+    return get_text_splitter().split_documents(pages)
+
+# Process pool shared by every ingestion so several uploads parse in parallel
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_parse_executor():
+    """Get the shared process pool used for PDF parsing."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    return _executor
+
+def iter_parsed_windows(path, window_pages=INGEST_WINDOW_PAGES, executor=None, workers=PARSE_WORKERS):
+    """Parse a PDF in parallel page windows and yield the chunks in page order.
+
+    At most two windows per worker are in flight at once, so memory stays bounded
+    while every worker is kept busy.
+
+    Args:
+        path: Path to the PDF document
+        window_pages: Number of pages parsed per task
+        executor: Process pool to use (defaults to the shared pool)
+        workers: Number of worker processes in the pool
+
+    Yields:
+        tuple: (pages read so far, total pages, chunks for this window)
+    """
+    executor = executor or get_parse_executor()
+    total_pages = count_pages(path)
+    max_in_flight = max(1, workers * 2)
+
+    pending = deque()
+    next_start = 0
+    while next_start < total_pages or pending:
+        while next_start < total_pages and len(pending) < max_in_flight:
+            end = min(next_start + window_pages, total_pages)
+            pending.append((end, executor.submit(parse_page_range, path, next_start, end)))
+            next_start = end
+
+        # Windows are consumed in submission order, which is page order. Workers parse and
+        # split together, so the time spent waiting for each window is recorded as parsing
+        end, future = pending.popleft()
+        with span("pdf_parse"):
+            chunks = future.result()
+        yield end, total_pages, chunks
@@ -5,10 +5,16 @@ import tempfile
 import time
 import shutil
 
-from src.utils.query_handler import chat_response
 from src.ui.styles import CUSTOM_CSS
-from src.database.document_store import initialize_database, delete_database
 from src.config.settings import UPLOAD_FOLDER, DEFAULT_DOC_PATH
+from src.utils.warmup import warmup_pending
+
+# The ingestion and query modules load Chroma and LangChain, which take seconds to import,
+# so handlers import them on first use and the interface starts serving without them
+def get_ingestion_scheduler():
+    """Get the singleton ingestion scheduler, importing the ingestion modules on first use."""
+    from src.database.ingestion_jobs import get_ingestion_scheduler
+    return get_ingestion_scheduler()
 
 def create_chat_interface():
     """Create and configure the professional dark futuristic chat interface."""
@@ -59,7 +65,8 @@ def create_chat_interface():
     # Function to handle PDF uploads
     def handle_upload(file):
         if file is None:
-            return None, gr.update(visible=False), gr.update(visible=True), "No file uploaded"
+            return (None, None, gr.update(visible=False), gr.update(visible=True), "No file uploaded",
+                    gr.Timer(active=False))
         
         # Create a unique filename to avoid conflicts
         timestamp = int(time.time())
@@ -70,29 +77,62 @@ def create_chat_interface():
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         shutil.copy(file.name, file_path)
         
-        # Initialize the database for this document
-        try:
-            initialize_database(file_path)
-            return file_path, gr.update(visible=True), gr.update(visible=False), f"Successfully uploaded and processed: {os.path.basename(file_path)}"
-        except Exception as e:
-            return None, gr.update(visible=False), gr.update(visible=True), f"Error processing document: {str(e)}"
+        # Queue the document for background ingestion; the status box is polled for progress until it's done
+        job = get_ingestion_scheduler().submit(file_path)
+        return (job.doc_path, job.job_id, gr.update(visible=True), gr.update(visible=False), job.describe(),
+                gr.Timer(active=job.is_active()))
+    
+    # Function to poll the status of the current ingestion job, stopping the timer once it has finished
+    def poll_upload_status(job_id, current_status):
+        job = get_ingestion_scheduler().get_job(job_id) if job_id else None
+        if job is None:
+            return current_status, gr.Timer(active=False)
+        return job.describe(), gr.Timer(active=job.is_active())
     
-    # Function to handle document-specific chat
-    def document_chat(message, history, active_document):
+    # Function to cancel the current ingestion job
+    def cancel_upload(job_id):
+        if job_id and get_ingestion_scheduler().cancel(job_id):
+            return DEFAULT_DOC_PATH, gr.update(visible=False), gr.update(visible=True), "Cancelling document processing..."
+        return gr.update(), gr.update(), gr.update(), "No document is being processed"
+    
+    # Function to handle document-specific chat, streaming the answer as it's generated
+    async def document_chat(message, history, active_document):
         if not active_document:
-            return "", history + [
+            yield "", history + [
                 {"role": "user", "content": message},
                 {"role": "assistant", "content": "Please upload a document first before asking questions."}
             ]
+            return
+        
+        # The default document is queued by the startup warm-up; until then nothing can be searched
+        if active_document == DEFAULT_DOC_PATH and warmup_pending():
+            yield "", history + [
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": "The app is still starting up. Please try again in a few seconds."}
+            ]
+            return
+        
+        # Wait until at least the first pages of the document are indexed
+        job = get_ingestion_scheduler().get_job_for_document(active_document)
+        if job is not None and not job.is_queryable():
+            yield "", history + [
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": f"The document isn't ready yet. {job.describe()}"}
+            ]
+            return
+        
+        from src.utils.query_handler import astream_chat_response
         
-        return chat_response(message, history, active_document)
+        async for update in astream_chat_response(message, history, active_document):
+            yield update
     
     # Create the interface with full-screen dark styling
     with gr.Blocks(theme=theme, css=CUSTOM_CSS) as app:
         header.render()
         
-        # State for tracking the active document
+        # State for tracking the active document and its ingestion job
         active_document = gr.State(DEFAULT_DOC_PATH)
+        active_job = gr.State(None)
         
         # Using Column instead of Box with enhanced design
         with gr.Column(elem_classes=["container", "fullscreen-container"]):
@@ -119,12 +159,16 @@ def create_chat_interface():
                     elem_classes=["status-box"]
                 )
                 
+                # Polls the ingestion job table while a document is processing; started by an upload
+                status_timer = gr.Timer(1.0, active=False)
+                
                 with gr.Row(visible=False) as active_doc_row:
                     active_doc_display = gr.Textbox(
                         label="Active Document",
                         interactive=False,
                         elem_classes=["active-doc"]
                     )
+                    cancel_btn = gr.Button("Cancel Processing", variant="secondary")
                     reset_btn = gr.Button("Use Default Document", variant="secondary")
                 
                 with gr.Row(visible=True) as default_doc_row:
@@ -193,16 +237,29 @@ def create_chat_interface():
                     label="Example Queries"
                 )
         
-        # Event handlers
+        # Event handlers (both events may fire for one upload; the scheduler de-duplicates them)
         file_upload.upload(
             handle_upload,
             inputs=[file_upload],
-            outputs=[active_document, active_doc_row, default_doc_row, upload_status]
+            outputs=[active_document, active_job, active_doc_row, default_doc_row, upload_status, status_timer]
         )
         
         file_upload.change(
             handle_upload,
             inputs=[file_upload],
+            outputs=[active_document, active_job, active_doc_row, default_doc_row, upload_status, status_timer]
+        )
+        
+        status_timer.tick(
+            poll_upload_status,
+            inputs=[active_job, upload_status],
+            outputs=[upload_status, status_timer],
+            show_progress="hidden"
+        )
+        
+        cancel_btn.click(
+            cancel_upload,
+            inputs=[active_job],
             outputs=[active_document, active_doc_row, default_doc_row, upload_status]
         )
         
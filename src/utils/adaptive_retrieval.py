@@ -0,0 +1,162 @@
+"""Adaptive choice of how many chunks to retrieve, and MMR diversification."""
+import numpy as np
+
+from src.config.settings import (
+    RETRIEVAL_GAP_RATIO,
+    RETRIEVAL_K,
+    RETRIEVAL_K_MODE,
+    RETRIEVAL_MAX_K,
+    RETRIEVAL_MIN_K,
+    RETRIEVAL_MMR,
+    RETRIEVAL_MMR_LAMBDA,
+    RETRIEVAL_SCORE_RATIO,
+)
+
+class RetrievalOptions:
+    """How many chunks a question retrieves and whether they are diversified.
+
+    Defaults come from the RETRIEVAL_* settings; pass options to a query
+    function to override them for one question.
+    """
+
+    def __init__(self, k_mode=RETRIEVAL_K_MODE, k=RETRIEVAL_K, min_k=RETRIEVAL_MIN_K, max_k=RETRIEVAL_MAX_K,
+                 gap_ratio=RETRIEVAL_GAP_RATIO, score_ratio=RETRIEVAL_SCORE_RATIO, mmr=RETRIEVAL_MMR,
+                 mmr_lambda=RETRIEVAL_MMR_LAMBDA):
+        """Initialize the options.
+
+        Args:
+            k_mode: "fixed" to use k chunks, or "adaptive" to choose between min_k and max_k
+            k: Number of chunks in fixed mode
+            min_k: Fewest chunks in adaptive mode
+            max_k: Most chunks in adaptive mode
+            gap_ratio: Score drop, as a share of the candidates' score range, that ends an adaptive cut
+            score_ratio: Share of the score range a chunk must reach to be kept in adaptive mode
+            mmr: Whether to diversify the chosen chunks with maximal marginal relevance
+            mmr_lambda: Weight of relevance against novelty in MMR (1 is plain relevance order)
+        """
+        if k_mode not in ("fixed", "adaptive"):
+            raise ValueError(f"Unknown retrieval k mode: {k_mode}")
+        self.k_mode = k_mode
+        self.k = k
+        self.min_k = min_k
+        self.max_k = max(min_k, max_k)
+        self.gap_ratio = gap_ratio
+        self.score_ratio = score_ratio
+        self.mmr = mmr
+        self.mmr_lambda = mmr_lambda
+
+    @property
+    def adaptive(self):
+        return self.k_mode == "adaptive"
+
+    @property
+    def most_chunks(self):
+        """Get the most chunks a question can use with these options."""
+        return self.max_k if self.adaptive else self.k
+
+    def fingerprint(self):
+        """Get a string identifying the options, for cache keys."""
+        if self.adaptive:
+            k = f"adaptive:{self.min_k}-{self.max_k}:{self.gap_ratio}:{self.score_ratio}"
+        else:
+            k = f"k={self.k}"
+        return f"{k}|mmr:{self.mmr_lambda}" if self.mmr else k
+
+def choose_k(scores, min_k, max_k, gap_ratio, score_ratio):
+    """Choose how many of the best-first candidates to keep from their scores.
+
+    Scores are scaled to the candidates' range. Candidates scoring under
+    score_ratio of the range are dropped, and the list is cut at the first
+    drop of at least gap_ratio between neighbours. A pinpoint question with
+    one or two standout chunks keeps few; a broad question whose candidates
+    score alike keeps many. The result is clamped to [min_k, max_k].
+
+    Args:
+        scores: Candidate scores, best first
+        min_k: Fewest candidates kept
+        max_k: Most candidates kept
+
+    Returns:
+        int: Number of candidates to keep
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) <= min_k:
+        return len(scores)
+    span = scores[0] - scores.min()
+    if span <= 0:
+        return min(max_k, len(scores))  # No candidate stands out, so use as many as allowed
+
+    scaled = (scores - scores.min()) / span
+    keep = int(np.count_nonzero(scaled >= score_ratio))
+    gaps = np.flatnonzero(scaled[:-1] - scaled[1:] >= gap_ratio)
+    gaps = gaps[gaps + 1 >= min_k]
+    if len(gaps):
+        keep = min(keep, int(gaps[0]) + 1)
+    return max(min_k, min(max_k, keep, len(scores)))
+
+def mmr_select(vectors, relevance, k, mmr_lambda):
+    """Pick k candidates by maximal marginal relevance.
+
+    Each step takes the candidate maximizing mmr_lambda * relevance minus
+    (1 - mmr_lambda) * its highest cosine similarity to those already taken.
+    Pairwise similarities are one matrix product and each step is a
+    vectorized update, so the cost is O(n^2 d + k n) for n candidates.
+
+    Args:
+        vectors: (n, d) candidate embeddings
+        relevance: n relevance scores in [0, 1]
+        k: Number of candidates to pick
+        mmr_lambda: Weight of relevance against novelty
+
+    Returns:
+        list: Indices of the picked candidates, in pick order
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    relevance = np.asarray(relevance, dtype=np.float32)
+    k = min(k, len(relevance))
+    if k <= 0:
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    unit = vectors / norms
+    similarity = unit @ unit.T
+
+    picked = [int(np.argmax(relevance))]
+    closest = similarity[picked[0]].copy()  # Highest similarity of each candidate to the picked ones
+    available = np.ones(len(relevance), dtype=bool)
+    available[picked[0]] = False
+    for _ in range(k - 1):
+        marginal = np.where(available, mmr_lambda * relevance - (1 - mmr_lambda) * closest, -np.inf)
+        best = int(np.argmax(marginal))
+        picked.append(best)
+        available[best] = False
+        np.maximum(closest, similarity[best], out=closest)
+    return picked
+
+def scaled_relevance(scores):
+    """Scale best-first scores to [0, 1] for MMR, so any retrieval or reranker score works."""
+    scores = np.asarray(scores, dtype=np.float32)
+    span = scores.max() - scores.min() if len(scores) else 0.0
+    if span <= 0:
+        return np.ones(len(scores), dtype=np.float32)
+    return (scores - scores.min()) / span
+
+def select_results(results, options, vectors=None):
+    """Choose the chunks a question uses from its best-first candidates.
+
+    Args:
+        results: (document, score) pairs, best first
+        options: RetrievalOptions for the question
+        vectors: Embeddings of the candidates, in the same order (needed for MMR)
+
+    Returns:
+        list: The chosen (document, score) pairs, best first (in MMR pick order with MMR)
+    """
+    scores = [score for _doc, score in results]
+    if options.adaptive:
+        k = choose_k(scores, options.min_k, options.max_k, options.gap_ratio, options.score_ratio)
+    else:
+        k = options.k
+    if not options.mmr or vectors is None or len(results) <= k:
+        return results[:k]
+    return [results[i] for i in mmr_select(vectors, scaled_relevance(scores), k, options.mmr_lambda)]
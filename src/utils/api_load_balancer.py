@@ -1,88 +1,370 @@
 """API key load balancing functionality."""
+from contextlib import contextmanager
 import os
 from dotenv import load_dotenv
 import threading
-import random
+import time
+
+def is_rate_limit_error(error):
+    """Check whether an API error is a quota / 429 response.
+
+    Recognizes google.api_core's ResourceExhausted, errors with a 429
+    status_code (as Groq's client raises) and gRPC RESOURCE_EXHAUSTED
+    statuses, including when LangChain wraps them in another exception.
+    Messages that merely contain "429" or "quota" don't count, since a
+    misread error would quarantine a healthy key.
+    """
+    while error is not None:
+        if type(error).__name__ == "ResourceExhausted" or getattr(error, "status_code", None) == 429:
+            return True
+        if "RESOURCE_EXHAUSTED" in str(error):
+            return True
+        error = error.__cause__
+    return False
+
+class KeyState:
+    """Quota, concurrency and health of one API key.
+
+    Requests and tokens are token buckets refilled continuously over the
+    quota window, so a key's headroom is known without waiting for a 429.
+    """
+
+    def __init__(self, key, requests_per_minute, tokens_per_minute, max_in_flight, window):
+        """Initialize the key's state with full buckets.
+
+        Args:
+            key: The API key
+            requests_per_minute: Requests allowed per window
+            tokens_per_minute: Tokens allowed per window (0 for no token quota)
+            max_in_flight: Requests allowed at once
+            window: Seconds the quotas refill over
+        """
+        self.key = key
+        self.request_capacity = max(1, requests_per_minute)
+        self.request_rate = self.request_capacity / window
+        self.requests = float(self.request_capacity)
+        self.token_capacity = tokens_per_minute
+        self.token_rate = tokens_per_minute / window
+        self.tokens = float(tokens_per_minute)
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        self.updated = time.monotonic()
+
+        # Quarantine after 429s: doubles with each one in a row, cleared by a success
+        self.cooldown_until = 0.0
+        self.strikes = 0
+
+        # Counters for monitoring
+        self.sent = 0
+        self.rate_limited = 0
+
+    def refill(self, now):
+        """Add the requests and tokens earned since the last update."""
+        elapsed = now - self.updated
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_rate)
+        if self.token_capacity:
+            self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_rate)
+        self.updated = now
+
+    def headroom(self, tokens, now):
+        """Get the share of the key's tightest limit left after one more request, or None if it has none."""
+        if now < self.cooldown_until or self.in_flight >= self.max_in_flight or self.requests < 1:
+            return None
+        shares = [(self.requests - 1) / self.request_capacity, 1 - (self.in_flight + 1) / self.max_in_flight]
+        if self.token_capacity:
+            tokens = min(tokens, self.token_capacity)  # A request larger than the quota waits for a full bucket
+            if self.tokens < tokens:
+                return None
+            shares.append((self.tokens - tokens) / self.token_capacity)
+        return min(shares)
+
+    def wait_time(self, tokens, now):
+        """Get the seconds until the key's quotas allow a request (None if only a release can free it)."""
+        if self.in_flight >= self.max_in_flight:
+            return None
+        wait = max(self.cooldown_until - now, (1 - self.requests) / self.request_rate)
+        if self.token_capacity:
+            wait = max(wait, (min(tokens, self.token_capacity) - self.tokens) / self.token_rate)
+        return max(0.0, wait)
 
 class ApiKeyLoadBalancer:
-    """Load balancer for API keys using Round Robin technique."""
-    
-    def __init__(self, key_prefix="GEMINI_API_KEY", num_keys=5):
+    """Scheduler for API keys that tracks each key's quota, load and health.
+
+    Every key has request and token buckets matching its per-minute quota
+    and a limit on requests in flight. A request goes to the key with the
+    most headroom left on its tightest limit, so bursts spread over the keys
+    with quota to spare instead of landing on exhausted ones. A key that
+    returns a 429 is quarantined for an exponentially growing cooldown.
+    When every key is saturated or cooling down, callers wait for one to
+    free up instead of sending requests that would be rejected.
+    """
+
+    def __init__(self, key_prefix="GEMINI_API_KEY", num_keys=5, api_keys=None, requests_per_minute=15,
+                 tokens_per_minute=0, max_in_flight=4, cooldown_base=2.0, cooldown_max=60.0, window=60.0):
         """Initialize the load balancer.
-        
+
         Args:
             key_prefix: The prefix for API keys in the .env file
             num_keys: The number of API keys available
+            api_keys: Keys to schedule, instead of reading them from the environment
+            requests_per_minute: Requests each key may send per minute
+            tokens_per_minute: Tokens each key may use per minute (0 for no token quota)
+            max_in_flight: Requests each key may have in flight at once
+            cooldown_base: Seconds a key is quarantined after a 429, doubled for each one in a row
+            cooldown_max: Longest quarantine in seconds
+            window: Seconds the per-minute quotas refill over (shorter in simulations)
         """
-        # Load environment variables
-        load_dotenv()
-        
-        # Get API keys
-        self.api_keys = []
-        for i in range(1, num_keys + 1):
-            key_name = f"{key_prefix}_{i}"
-            key = os.getenv(key_name)
-            if key:
-                self.api_keys.append(key)
-        
+        if api_keys is None:
+            # Load environment variables
+            load_dotenv()
+
+            # Get API keys
+            api_keys = []
+            for i in range(1, num_keys + 1):
+                key_name = f"{key_prefix}_{i}"
+                key = os.getenv(key_name)
+                if key:
+                    api_keys.append(key)
+        self.api_keys = list(api_keys)
+
         if not self.api_keys:
             raise ValueError(f"No API keys found with prefix {key_prefix}")
-        
-        # Initialize current key index
+
+        self.states = [KeyState(key, requests_per_minute, tokens_per_minute, max_in_flight, window)
+                       for key in self.api_keys]
+        self.by_key = {state.key: state for state in self.states}
+        self.cooldown_base = cooldown_base
+        self.cooldown_max = cooldown_max
+
+        # Keys with equal headroom are taken in turn, starting after the last one used
         self.current_index = 0
-        
-        # Thread lock for thread safety
-        self.lock = threading.Lock()
-        
-        # Track last used key to ensure change
-        self.last_used_key = None
-        
-        print(f"API Key Load Balancer initialized with {len(self.api_keys)} keys")
-    
+
+        # One condition guards every key's state and wakes waiting callers on release
+        self.condition = threading.Condition()
+
+        from src.utils.tracing import log_event  # Imported here because the settings module imports this one
+
+        log_event("key_scheduler", f"API Key Load Balancer initialized with {len(self.api_keys)} keys",
+                  keys=len(self.api_keys))
+
+    def _best_key(self, tokens, now):
+        """Get the index of the usable key with the most headroom, or None if every key is saturated."""
+        best, best_headroom = None, None
+        for offset in range(len(self.states)):
+            index = (self.current_index + offset) % len(self.states)
+            state = self.states[index]
+            state.refill(now)
+            headroom = state.headroom(tokens, now)
+            if headroom is not None and (best_headroom is None or headroom > best_headroom):
+                best, best_headroom = index, headroom
+        return best
+
+    def acquire(self, tokens=0, timeout=None):
+        """Reserve a request on the key with the most headroom, waiting while every key is saturated.
+
+        Every acquire must be followed by a release() of the returned key;
+        lease() does both.
+
+        Args:
+            tokens: Estimated tokens the request uses
+            timeout: Most seconds to wait for a key (None waits indefinitely)
+
+        Returns:
+            str: The API key to send the request with
+
+        Raises:
+            TimeoutError: If no key had headroom within the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                index = self._best_key(tokens, now)
+                if index is not None:
+                    state = self.states[index]
+                    state.requests -= 1
+                    if state.token_capacity:
+                        state.tokens -= min(tokens, state.token_capacity)
+                    state.in_flight += 1
+                    state.sent += 1
+                    self.current_index = (index + 1) % len(self.states)
+                    return state.key
+
+                # Sleep until the first bucket refills or cooldown ends, or until a release
+                waits = [wait for wait in (state.wait_time(tokens, now) for state in self.states) if wait is not None]
+                wait = min(waits) if waits else None
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise TimeoutError(f"No API key had quota left within {timeout} seconds")
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.condition.wait(timeout=wait)
+
+    def release(self, key, rate_limited=False):
+        """Finish a request acquired on a key.
+
+        Args:
+            key: The key returned by acquire()
+            rate_limited: Whether the request was rejected with a 429, which quarantines the key
+        """
+        with self.condition:
+            state = self.by_key[key]
+            state.in_flight -= 1
+            if rate_limited:
+                cooldown = min(self.cooldown_max, self.cooldown_base * 2 ** state.strikes)
+                state.strikes += 1
+                state.rate_limited += 1
+                state.requests = 0.0  # The server says the quota is spent, whatever the bucket thinks
+                state.cooldown_until = time.monotonic() + cooldown
+                from src.utils.tracing import log_event  # Imported here because the settings module imports this one
+
+                log_event("key_rate_limited", f"API key {self.api_keys.index(key) + 1} rate limited; "
+                          f"cooling down for {cooldown:.1f}s", key=self.api_keys.index(key) + 1, cooldown=cooldown)
+            else:
+                state.strikes = 0
+            self.condition.notify_all()
+
+    @contextmanager
+    def lease(self, tokens=0, timeout=None):
+        """Hold a key for one request, releasing it afterwards and quarantining it on a 429.
+
+        Yields:
+            str: The API key to send the request with
+        """
+        key = self.acquire(tokens, timeout)
+        try:
+            yield key
+        except BaseException as e:
+            # Cancellation and generator closing release the key too
+            self.release(key, rate_limited=is_rate_limit_error(e))
+            raise
+        self.release(key)
+
     def get_next_key(self):
-        """Get the next API key, ensuring it's different from the last used key.
-        
+        """Get the key with the most headroom, without reserving a request on it.
+
+        Used to pick the key a new client is created with. Keys cooling down
+        are skipped unless every key is.
+
         Returns:
             str: The next API key
         """
-        with self.lock:
-            # If we only have one key, just return it
-            if len(self.api_keys) == 1:
-                return self.api_keys[0]
-            
-            # If we have multiple keys, ensure we don't use the same key twice in a row
-            if len(self.api_keys) > 1:
-                # Get available keys (excluding the last used key)
-                available_keys = [key for key in self.api_keys if key != self.last_used_key]
-                
-                # If somehow all keys were used (shouldn't happen with our implementation)
-                # or this is the first request, use standard round-robin
-                if not available_keys:
-                    key = self.api_keys[self.current_index]
-                    self.current_index = (self.current_index + 1) % len(self.api_keys)
-                else:
-                    # Randomly select from available keys for better distribution
-                    key = random.choice(available_keys)
-                    
-                    # Update the index to match the selected key for next round-robin continuation
-                    self.current_index = self.api_keys.index(key)
-                    self.current_index = (self.current_index + 1) % len(self.api_keys)
-            
-            # Remember this key as the last used
-            self.last_used_key = key
-            
-            return key
-
-# Singleton instance
+        with self.condition:
+            now = time.monotonic()
+            index = self._best_key(0, now)
+            if index is None:
+                # Every key is saturated: take the one that frees up soonest
+                index = min(range(len(self.states)),
+                            key=lambda i: (self.states[i].wait_time(0, now) or 0.0, self.states[i].in_flight))
+            self.current_index = (index + 1) % len(self.states)
+            return self.states[index].key
+
+    def get_stats(self):
+        """Get per-key scheduling statistics for monitoring."""
+        with self.condition:
+            now = time.monotonic()
+            keys = []
+            for number, state in enumerate(self.states, 1):
+                state.refill(now)
+                keys.append({
+                    "key": number,
+                    "sent": state.sent,
+                    "rate_limited": state.rate_limited,
+                    "in_flight": state.in_flight,
+                    "requests_left": int(state.requests),
+                    "tokens_left": int(state.tokens) if state.token_capacity else None,
+                    "cooling_down": now < state.cooldown_until,
+                })
+            return {
+                "sent": sum(key["sent"] for key in keys),
+                "rate_limited": sum(key["rate_limited"] for key in keys),
+                "keys": keys,
+            }
+
+    def collect_metrics(self, scheduler):
+        """Get per-key statistics as (metric name, labels, value) samples for /metrics.
+
+        Args:
+            scheduler: Label telling this scheduler's keys apart, e.g. "llm" or "embedding"
+        """
+        samples = []
+        for key in self.get_stats()["keys"]:
+            labels = {"scheduler": scheduler, "key": key["key"]}
+            samples += [
+                ("rag_api_key_in_flight", labels, key["in_flight"]),
+                ("rag_api_key_requests_left", labels, key["requests_left"]),
+                ("rag_api_key_sent_total", labels, key["sent"]),
+                ("rag_api_key_rate_limited_total", labels, key["rate_limited"]),
+                ("rag_api_key_cooling_down", labels, int(key["cooling_down"])),
+            ]
+            if key["tokens_left"] is not None:
+                samples.append(("rag_api_key_tokens_left", labels, key["tokens_left"]))
+        return samples
+
+API_KEY_METRICS = {
+    "rag_api_key_in_flight": ("gauge", "Requests in flight on each API key"),
+    "rag_api_key_requests_left": ("gauge", "Requests left in each API key's per-minute bucket"),
+    "rag_api_key_tokens_left": ("gauge", "Tokens left in each API key's per-minute bucket"),
+    "rag_api_key_sent_total": ("counter", "Requests sent with each API key"),
+    "rag_api_key_rate_limited_total": ("counter", "Requests rejected with a 429 on each API key"),
+    "rag_api_key_cooling_down": ("gauge", "Whether each API key is quarantined after a 429"),
+}
+
+def _add_metrics_collector(scheduler, name):
+    """Export a scheduler's per-key statistics at /metrics."""
+    from src.utils.metrics import get_metrics  # Imported here because the settings module imports this one
+
+    get_metrics().add_collector(f"{name}_keys", lambda: scheduler.collect_metrics(name), API_KEY_METRICS)
+
+# Singleton instances
 _load_balancer = None
+_embedding_scheduler = None
+_load_balancer_lock = threading.Lock()
 
 def get_load_balancer():
-    """Get the singleton load balancer instance."""
+    """Get the singleton load balancer instance for the Gemini API keys."""
     global _load_balancer
-    if _load_balancer is None:
-        _load_balancer = ApiKeyLoadBalancer()
+    with _load_balancer_lock:
+        if _load_balancer is None:
+            # Imported here because the settings module imports this one
+            from src.config.settings import (
+                API_KEY_COOLDOWN_BASE,
+                API_KEY_COOLDOWN_MAX,
+                API_KEY_MAX_IN_FLIGHT,
+                API_KEY_REQUESTS_PER_MINUTE,
+                API_KEY_TOKENS_PER_MINUTE,
+            )
+            _load_balancer = ApiKeyLoadBalancer(
+                requests_per_minute=API_KEY_REQUESTS_PER_MINUTE,
+                tokens_per_minute=API_KEY_TOKENS_PER_MINUTE,
+                max_in_flight=API_KEY_MAX_IN_FLIGHT,
+                cooldown_base=API_KEY_COOLDOWN_BASE,
+                cooldown_max=API_KEY_COOLDOWN_MAX,
+            )
+            _add_metrics_collector(_load_balancer, "llm")
     return _load_balancer
 
+def get_embedding_scheduler():
+    """Get the singleton scheduler for embedding requests, which have their own per-key quota."""
+    global _embedding_scheduler
+    with _load_balancer_lock:
+        if _embedding_scheduler is None:
+            from src.config.settings import (
+                API_KEY_COOLDOWN_MAX,
+                EMBEDDING_REQUESTS_PER_MINUTE,
+                EMBEDDING_RETRY_BASE_DELAY,
+                EMBEDDING_WORKERS_PER_KEY,
+            )
+            _embedding_scheduler = ApiKeyLoadBalancer(
+                requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+                # One slot per key more than ingestion uses, so question embeddings don't queue behind it
+                max_in_flight=EMBEDDING_WORKERS_PER_KEY + 1,
+                cooldown_base=EMBEDDING_RETRY_BASE_DELAY,
+                cooldown_max=API_KEY_COOLDOWN_MAX,
+            )
+            _add_metrics_collector(_embedding_scheduler, "embedding")
+    return _embedding_scheduler
+
 def get_api_key():
     """Get the next API key from the load balancer."""
     return get_load_balancer().get_next_key()
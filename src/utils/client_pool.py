@@ -0,0 +1,274 @@
+"""Long-lived LLM and embedding clients, one per (provider, API key)."""
+import asyncio
+import threading
+import time
+
+from src.config.settings import CLIENT_IDLE_TIMEOUT, CLIENT_MAX_FAILURES
+from src.utils.api_load_balancer import is_rate_limit_error
+from src.utils.context_packer import estimate_tokens
+
+class _PooledClient:
+    """One client and its health."""
+
+    def __init__(self, client):
+        self.client = client
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.in_use = 0
+        self.failures = 0  # Errors other than 429s in a row
+        self.requests = 0
+
+class ClientPool:
+    """Keeps one warm client per (provider, API key) and reuses it for every request.
+
+    LangChain clients hold their HTTP connection pools, so building one per
+    request pays for client construction and a new TLS handshake each time.
+    Clients here live as long as they are healthy: a client is rebuilt after
+    max_failures errors in a row (429s don't count, since they say nothing
+    about the connection) or once it sat unused for idle_timeout seconds,
+    after which the server has likely closed its connections. Every
+    idle_timeout seconds, get() also sweeps out unhealthy clients of keys
+    that are no longer requested, so they don't hold connections forever.
+    """
+
+    def __init__(self, max_failures=CLIENT_MAX_FAILURES, idle_timeout=CLIENT_IDLE_TIMEOUT):
+        """Initialize the pool.
+
+        Args:
+            max_failures: Errors in a row after which a client is rebuilt
+            idle_timeout: Seconds unused after which a client is rebuilt
+        """
+        self.max_failures = max_failures
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.clients = {}  # (provider, key) -> _PooledClient
+        self.last_health_check = time.monotonic()
+
+        # Counters for monitoring the pool
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _is_healthy(self, entry, now):
+        return entry.failures < self.max_failures and (entry.in_use or now - entry.last_used < self.idle_timeout)
+
+    def get(self, provider, key, factory):
+        """Get the client for a provider and key, building it on first use or if it's unhealthy.
+
+        Args:
+            provider: Name of the provider (e.g. "gemini")
+            key: API key the client uses
+            factory: Function building a client from an API key
+
+        Returns:
+            The client, marked in use until checkin()
+        """
+        pool_key = (provider, key)
+        now = time.monotonic()
+        if now - self.last_health_check >= self.idle_timeout:
+            self.health_check()
+        with self.lock:
+            entry = self.clients.get(pool_key)
+            if entry is not None and not self._is_healthy(entry, now):
+                del self.clients[pool_key]
+                self.discarded += 1
+                entry = None
+            if entry is not None:
+                self.reused += 1
+                return self._use(entry, now)
+
+        # Built outside the lock; if two requests race, the first client stored wins
+        client = factory(key)
+        with self.lock:
+            entry = self.clients.get(pool_key)
+            if entry is None:
+                entry = self.clients[pool_key] = _PooledClient(client)
+                self.created += 1
+            return self._use(entry, now)
+
+    def _use(self, entry, now):
+        entry.in_use += 1
+        entry.requests += 1
+        entry.last_used = now
+        return entry.client
+
+    def checkout(self, provider, factory, scheduler=None, key=None, tokens=0):
+        """Check out a client for one request, reserving a request on a key with the scheduler.
+
+        Args:
+            provider: Name of the provider
+            factory: Function building a client from an API key
+            scheduler: ApiKeyLoadBalancer choosing the key, or None to use `key`
+            key: API key to use when there's no scheduler
+            tokens: Estimated tokens the request uses
+
+        Returns:
+            tuple: (API key, client); pass both to checkin() when the request is done
+        """
+        if scheduler is not None:
+            key = scheduler.acquire(tokens)
+        try:
+            return key, self.get(provider, key, factory)
+        except BaseException:
+            if scheduler is not None:
+                scheduler.release(key)
+            raise
+
+    def checkin(self, provider, key, client, scheduler=None, error=None):
+        """Return a checked-out client, recording how its request went.
+
+        Args:
+            provider: Name of the provider
+            key: The key returned by checkout()
+            client: The client returned by checkout()
+            scheduler: The scheduler passed to checkout()
+            error: The exception the request raised, if any
+        """
+        rate_limited = error is not None and is_rate_limit_error(error)
+        with self.lock:
+            entry = self.clients.get((provider, key))
+            if entry is not None and entry.client is client:  # Not a client rebuilt while this one was out
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+                if error is None:
+                    entry.failures = 0
+                elif not rate_limited:
+                    entry.failures += 1
+        if scheduler is not None:
+            scheduler.release(key, rate_limited=rate_limited)
+
+    def health_check(self):
+        """Drop idle clients that have failed or sat unused too long, so the next request rebuilds them.
+
+        Returns:
+            int: Number of clients dropped
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.last_health_check = now
+            stale = [pool_key for pool_key, entry in self.clients.items()
+                     if not entry.in_use and not self._is_healthy(entry, now)]
+            for pool_key in stale:
+                del self.clients[pool_key]
+            self.discarded += len(stale)
+        return len(stale)
+
+    def get_stats(self):
+        """Get pool statistics for monitoring."""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                "clients": len(self.clients),
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+                "unhealthy": sum(1 for entry in self.clients.values() if not self._is_healthy(entry, now)),
+                "in_use": sum(entry.in_use for entry in self.clients.values()),
+            }
+
+class PooledChain:
+    """A prompt | LLM | parser chain whose client is checked out of the pool per request.
+
+    With a scheduler, every request goes to the key with the most quota
+    left; without one, every request uses `key`. Offers the invoke, ainvoke
+    and astream methods the query path uses.
+    """
+
+    def __init__(self, provider, factory, scheduler=None, key=None, pool=None):
+        """Initialize the chain.
+
+        Args:
+            provider: Name of the provider
+            factory: Function building the chain for an API key
+            scheduler: ApiKeyLoadBalancer choosing each request's key, if any
+            key: API key every request uses when there's no scheduler
+            pool: ClientPool holding the chains (defaults to the shared pool)
+        """
+        self.provider = provider
+        self.factory = factory
+        self.scheduler = scheduler
+        self.key = key
+        self.pool = pool or get_client_pool()
+
+    def _tokens(self, inputs):
+        """Estimate a request's prompt tokens, for the scheduler's token quota."""
+        return estimate_tokens("".join(str(value) for value in inputs.values()))
+
+    def _checkout(self, inputs):
+        return self.pool.checkout(self.provider, self.factory, self.scheduler, self.key, self._tokens(inputs))
+
+    async def _acheckout(self, inputs):
+        """Check out a chain off the event loop, since the scheduler may wait for quota.
+
+        The checkout thread can't be stopped, so if the caller is cancelled
+        while it runs (a hedge losing, or a generation timeout), whichever of
+        the two finishes last checks the chain back in.
+        """
+        lock = threading.Lock()
+        handoff = {"abandoned": False, "checkout": None}
+
+        def checkout():
+            key, chain = self._checkout(inputs)
+            with lock:
+                if not handoff["abandoned"]:
+                    handoff["checkout"] = (key, chain)
+                    return key, chain
+            self.pool.checkin(self.provider, key, chain, self.scheduler)
+            return key, chain
+
+        try:
+            return await asyncio.to_thread(checkout)
+        except BaseException:
+            with lock:
+                handoff["abandoned"] = True
+                checked_out = handoff["checkout"]
+            if checked_out is not None:
+                self.pool.checkin(self.provider, *checked_out, self.scheduler)
+            raise
+
+    def invoke(self, inputs):
+        key, chain = self._checkout(inputs)
+        error = None
+        try:
+            return chain.invoke(inputs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.pool.checkin(self.provider, key, chain, self.scheduler, error)
+
+    async def ainvoke(self, inputs):
+        key, chain = await self._acheckout(inputs)
+        error = None
+        try:
+            return await chain.ainvoke(inputs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.pool.checkin(self.provider, key, chain, self.scheduler, error)
+
+    async def astream(self, inputs):
+        key, chain = await self._acheckout(inputs)
+        error = None
+        try:
+            async for chunk in chain.astream(inputs):
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Also reached when a hedged request cancels or closes the stream
+            self.pool.checkin(self.provider, key, chain, self.scheduler, error)
+
+# Singleton instance
+_client_pool = None
+_client_pool_lock = threading.Lock()
+
+def get_client_pool():
+    """Get the singleton client pool, so every request shares the warm clients."""
+    global _client_pool
+    with _client_pool_lock:
+        if _client_pool is None:
+            _client_pool = ClientPool()
+    return _client_pool
@@ -0,0 +1,231 @@
+"""Packing of retrieved chunks into a token-budgeted prompt context."""
+import math
+import os
+import re
+import threading
+
+from src.config.settings import CONTEXT_CHARS_PER_TOKEN, CONTEXT_DEDUP_THRESHOLD
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# Shortest shared text that counts as splitter overlap between consecutive chunks, and
+# between chunks of unknown position (where a coincidental match must be ruled out)
+_MIN_OVERLAP_CHARS = 10
+_MIN_UNORDERED_OVERLAP_CHARS = 50
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+def estimate_tokens(text):
+    """Estimate the number of LLM tokens in a text from its length."""
+    return math.ceil(len(text) / CONTEXT_CHARS_PER_TOKEN)
+
+def _chunk_number(doc):
+    """Get the position of a chunk in its document from its id (chunk-<n>), or None."""
+    prefix, _, number = (doc.id or "").rpartition("-")
+    return int(number) if prefix == "chunk" and number.isdigit() else None
+
+def _shingles(text):
+    """Get the set of word 3-grams of a text, for near-duplicate detection."""
+    words = _WORD_PATTERN.findall(text.lower())
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+def _overlap(first, second, min_length):
+    """Get the length of the longest suffix of first that is a prefix of second (0 if under min_length)."""
+    for length in range(min(len(first), len(second)) - 1, min_length - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+def _label(doc):
+    """Get the source label shown above a section of a multi-document context."""
+    source = os.path.basename(doc.metadata.get("source", "unknown document"))
+    page = doc.metadata.get("page_label", doc.metadata.get("page"))
+    return f"[Source: {source}, page {page}]" if page is not None else f"[Source: {source}]"
+
+class _Section:
+    """Run of consecutive text from one page, built from one or more chunks."""
+
+    def __init__(self, doc, relevance):
+        self.doc = doc
+        self.text = doc.page_content
+        self.relevance = relevance
+        self.rank = relevance  # Relevance of the best chunk, which decides the output order
+        self.number = _chunk_number(doc)
+        self.last_number = self.number
+
+    def same_page(self, other):
+        """Check whether another section comes from the same page of the same document."""
+        return (self.doc.metadata.get("source") == other.doc.metadata.get("source")
+                and self.doc.metadata.get("page") == other.doc.metadata.get("page"))
+
+    def merge(self, other):
+        """Append a following section if it is the next chunk of the page.
+
+        Chunks whose ids don't give their position are merged only if their
+        text overlaps, like consecutive chunks of the splitter do.
+
+        Returns:
+            int: Characters of repeated text removed, or None if the sections can't be merged
+        """
+        if not self.same_page(other):
+            return None
+        if self.last_number is not None and other.number is not None:
+            if other.number != self.last_number + 1:
+                return None
+            overlap = _overlap(self.text, other.text, _MIN_OVERLAP_CHARS)
+        else:
+            overlap = _overlap(self.text, other.text, _MIN_UNORDERED_OVERLAP_CHARS)
+            if not overlap:
+                return None
+        self.text += other.text[overlap:] if overlap else "\n" + other.text
+        self.relevance += other.relevance
+        self.rank = max(self.rank, other.rank)
+        self.last_number = other.last_number
+        return overlap
+
+class ContextPacker:
+    """Builds the prompt context from search results within a token budget.
+
+    Near-duplicate chunks (e.g. the same passage in two uploads) are dropped,
+    chunks of a page that overlap or follow each other are merged so the
+    splitter's overlap isn't sent twice. The most relevant section always goes
+    in, cut to the budget if needed, and the rest are then packed greedily by
+    relevance per token until the budget is full. Relevance comes from
+    each chunk's rank, since retrieval and reranking scores aren't on one
+    scale. Packed sections are emitted best first.
+    """
+
+    def __init__(self, dedup_threshold=CONTEXT_DEDUP_THRESHOLD):
+        """Initialize the packer.
+
+        Args:
+            dedup_threshold: Share of a chunk's word 3-grams found in a more relevant chunk
+                at which it counts as a duplicate
+        """
+        self.dedup_threshold = dedup_threshold
+        self.lock = threading.Lock()
+
+        # Counters for monitoring how many prompt tokens packing saves, and drops to fit the budget
+        self.contexts = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.tokens_dropped = 0
+
+    def _deduplicate(self, results):
+        """Drop chunks that nearly duplicate, or are contained in, a more relevant one."""
+        kept, kept_shingles = [], []
+        for doc, relevance in results:
+            shingles = _shingles(doc.page_content)
+            duplicate = any(len(shingles & other) >= self.dedup_threshold * min(len(shingles), len(other))
+                            for other in kept_shingles)
+            if not duplicate:
+                kept.append((doc, relevance))
+                kept_shingles.append(shingles)
+        return kept
+
+    def _merge(self, results):
+        """Merge chunks of the same page that overlap or are adjacent into sections."""
+        sections = [_Section(doc, relevance) for doc, relevance in results]
+        sections.sort(key=lambda s: (str(s.doc.metadata.get("source")), str(s.doc.metadata.get("page")),
+                                     s.number if s.number is not None else math.inf))
+        merged, overlap_chars = [], 0
+        for section in sections:
+            removed = merged[-1].merge(section) if merged else None
+            if removed is None:
+                merged.append(section)
+            else:
+                overlap_chars += removed
+        return merged, overlap_chars
+
+    def pack(self, results, token_budget, label_sources=False):
+        """Build the context for a question from its search results.
+
+        Args:
+            results: (document, score) pairs, most relevant first
+            token_budget: Maximum estimated tokens of context
+            label_sources: Whether to put a source and page label above each section
+
+        Returns:
+            tuple: (context text, report dict of chunks, sections and tokens before and after
+                packing, with the tokens saved by deduplication and merging apart from those
+                dropped to fit the budget)
+        """
+        # Joining every chunk, as a context without packing would
+        tokens_in = estimate_tokens(CONTEXT_SEPARATOR.join(
+            f"{_label(doc)}\n{doc.page_content}" if label_sources else doc.page_content for doc, _score in results
+        ))
+        ranked = [(doc, 1.0 / (rank + 1)) for rank, (doc, _score) in enumerate(results)]
+
+        unique = self._deduplicate(ranked)
+        sections, overlap_chars = self._merge(unique)
+        texts = {id(s): f"{_label(s.doc)}\n{s.text}" if label_sources else s.text for s in sections}
+        separator_tokens = estimate_tokens(CONTEXT_SEPARATOR)
+
+        # Seed with the best section, cut to the budget if it doesn't fit on its own, then
+        # fill the rest greedily by relevance per token
+        packed, used, truncated_tokens = [], 0, 0
+        if sections:
+            best = max(sections, key=lambda s: s.rank)
+            best_tokens = estimate_tokens(texts[id(best)])
+            if best_tokens > token_budget:
+                texts[id(best)] = texts[id(best)][:int(token_budget * CONTEXT_CHARS_PER_TOKEN)]
+                truncated_tokens = best_tokens - estimate_tokens(texts[id(best)])
+            packed.append(best)
+            used = estimate_tokens(texts[id(best)])
+        dropped_tokens = truncated_tokens
+        for section in sorted(sections, key=lambda s: s.relevance / max(1, estimate_tokens(texts[id(s)])),
+                              reverse=True):
+            if section is packed[0]:
+                continue
+            cost = estimate_tokens(texts[id(section)]) + separator_tokens
+            if used + cost <= token_budget:
+                packed.append(section)
+                used += cost
+            else:
+                dropped_tokens += estimate_tokens(texts[id(section)])
+
+        packed.sort(key=lambda s: s.rank, reverse=True)
+        context = CONTEXT_SEPARATOR.join(texts[id(s)] for s in packed)
+        report = {
+            "chunks": len(results),
+            "duplicates": len(results) - len(unique),
+            "sections": len(packed),
+            "dropped_sections": len(sections) - len(packed),
+            "overlap_tokens": math.ceil(overlap_chars / CONTEXT_CHARS_PER_TOKEN),
+            "tokens_in": tokens_in,
+            "tokens_out": estimate_tokens(context),
+            "tokens_dropped": dropped_tokens,
+        }
+        # Tokens saved without losing content (duplicates and overlap), apart from those cut by the budget
+        report["tokens_saved"] = max(0, report["tokens_in"] - report["tokens_out"] - dropped_tokens)
+        with self.lock:
+            self.contexts += 1
+            self.tokens_in += report["tokens_in"]
+            self.tokens_out += report["tokens_out"]
+            self.tokens_dropped += report["tokens_dropped"]
+        return context, report
+
+    def get_stats(self):
+        """Get packing statistics for monitoring."""
+        with self.lock:
+            tokens_saved = max(0, self.tokens_in - self.tokens_out - self.tokens_dropped)
+            return {
+                "contexts": self.contexts,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "tokens_saved": tokens_saved,
+                "tokens_dropped": self.tokens_dropped,
+                "saved_rate": tokens_saved / self.tokens_in if self.tokens_in else 0.0,
+            }
+
+# Singleton instance
+_context_packer = None
+_context_packer_lock = threading.Lock()
+
+def get_context_packer():
+    """Get the singleton context packer, so its statistics cover every question."""
+    global _context_packer
+    with _context_packer_lock:
+        if _context_packer is None:
+            _context_packer = ContextPacker()
+    return _context_packer
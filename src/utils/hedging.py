@@ -0,0 +1,272 @@
+"""Hedged LLM requests: race the fallback provider against a slow primary."""
+import asyncio
+from collections import deque
+import threading
+
+from src.config.settings import (
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_MIN_DELAY,
+    HEDGE_MAX_DELAY,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_WINDOW,
+)
+from src.utils.metrics import get_metrics
+from src.utils.tracing import log_event, observe
+
+class LatencyHistogram:
+    """Sliding window of recent latencies for one provider and stage."""
+
+    def __init__(self, window=HEDGE_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        """Record one latency sample."""
+        with self.lock:
+            self.samples.append(seconds)
+
+    def count(self):
+        """Get the number of samples in the window."""
+        with self.lock:
+            return len(self.samples)
+
+    def percentile(self, fraction):
+        """Get a percentile of the window, or None if it's empty."""
+        with self.lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class _Attempt:
+    """One provider's in-flight stream inside a hedged request."""
+
+    def __init__(self, provider, chain, inputs, started):
+        self.provider = provider
+        self.iterator = chain.astream(inputs).__aiter__()
+        self.started = started
+        self.task = asyncio.ensure_future(self.iterator.__anext__())
+
+    async def cancel(self):
+        """Cancel the attempt and close its stream."""
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        try:
+            await self.iterator.aclose()
+        except Exception:
+            pass
+
+class LLMHedger:
+    """Starts the fallback LLM when the primary is slower than its recent p95.
+
+    The hedge delay adapts to a sliding window of the primary's time to first
+    token. The first provider to produce a token wins and the other call is
+    cancelled. If the primary fails outright the fallback is started at once, as
+    a plain failover. Counters record how often a hedge fired and how many extra
+    calls and prompt characters that cost.
+    """
+
+    def __init__(self, primary="groq", fallback="gemini"):
+        """Initialize the hedger.
+
+        Args:
+            primary: Name of the primary provider
+            fallback: Name of the fallback provider
+        """
+        self.primary = primary
+        self.fallback = fallback
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+        # Counters for monitoring hedging
+        self.requests = 0
+        self.hedges_fired = 0
+        self.primary_wins = 0
+        self.fallback_wins = 0
+        self.failovers = 0
+        self.extra_calls = 0
+        self.extra_prompt_chars = 0
+
+    def histogram(self, provider, stage):
+        """Get the latency histogram for a provider and stage ("first_token" or "total")."""
+        with self.lock:
+            key = (provider, stage)
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+            return self.histograms[key]
+
+    def get_delay(self):
+        """Get how long to wait for the primary's first token before launching the fallback."""
+        histogram = self.histogram(self.primary, "first_token")
+        if histogram.count() < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, histogram.percentile(HEDGE_PERCENTILE)))
+
+    def _count(self, counter, amount=1):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    async def astream(self, primary_chain, fallback_chain, inputs):
+        """Stream from whichever provider produces the first token first.
+
+        Args:
+            primary_chain: Chain for the primary provider, or None if it's unavailable
+            fallback_chain: Chain for the fallback provider
+            inputs: The chain inputs
+
+        Yields:
+            tuple: (provider name, chunk)
+
+        Raises:
+            Exception: The last error if both providers fail before a first token.
+                Errors after the first token propagate to the caller unchanged.
+        """
+        self._count("requests")
+        loop = asyncio.get_running_loop()
+        chains = {self.primary: primary_chain, self.fallback: fallback_chain}
+        prompt_chars = sum(len(str(value)) for value in inputs.values())
+
+        if primary_chain is None:
+            self._count("failovers")
+            attempts = [_Attempt(self.fallback, fallback_chain, inputs, loop.time())]
+            launched_fallback = True
+        else:
+            attempts = [_Attempt(self.primary, primary_chain, inputs, loop.time())]
+            launched_fallback = False
+        deadline = loop.time() + (self.get_delay() if HEDGE_ENABLED else float("inf"))
+        winner = None
+        first_chunk = None
+        exhausted = False
+        last_error = None
+
+        try:
+            while winner is None:
+                if not attempts:
+                    raise last_error
+                timeout = None if launched_fallback else max(0, deadline - loop.time())
+                done, _ = await asyncio.wait([a.task for a in attempts], timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # The primary is slower than usual: hedge with the fallback
+                    log_event("hedge_fired", f"No first token from {self.primary} after {self.get_delay():.2f}s, "
+                              f"hedging with {self.fallback}", primary=self.primary, fallback=self.fallback)
+                    self._count("hedges_fired")
+                    self._count("extra_calls")
+                    self._count("extra_prompt_chars", prompt_chars)
+                    attempts.append(_Attempt(self.fallback, chains[self.fallback], inputs, loop.time()))
+                    launched_fallback = True
+                    continue
+
+                for attempt in [a for a in attempts if a.task in done]:
+                    attempts.remove(attempt)
+                    try:
+                        first_chunk = attempt.task.result()
+                    except StopAsyncIteration:
+                        first_chunk = ""
+                        exhausted = True
+                    except Exception as e:
+                        log_event("llm_error", f"{attempt.provider} LLM error: {str(e) or type(e).__name__}",
+                                  provider=attempt.provider, error=str(e) or type(e).__name__)
+                        last_error = e
+                        if attempt.provider == self.primary and not launched_fallback:
+                            # Plain failover: the fallback is needed anyway, so it isn't extra cost
+                            self._count("failovers")
+                            attempts.append(_Attempt(self.fallback, chains[self.fallback], inputs, loop.time()))
+                            launched_fallback = True
+                        continue
+                    winner = attempt
+                    break
+        finally:
+            # Cancel the losing call
+            for attempt in attempts:
+                if winner is not None and attempt.provider == self.primary:
+                    # The primary's first token is at least this late; leaving lost races out of
+                    # its window would pull the hedge delay down towards the fast requests only
+                    self.histogram(self.primary, "first_token").observe(loop.time() - attempt.started)
+                await attempt.cancel()
+
+        first_token = loop.time() - winner.started
+        self.histogram(winner.provider, "first_token").observe(first_token)
+        observe("llm_first_token", first_token, provider=winner.provider)
+        self._count("primary_wins" if winner.provider == self.primary else "fallback_wins")
+
+        if not exhausted:
+            yield winner.provider, first_chunk
+            async for chunk in winner.iterator:
+                yield winner.provider, chunk
+        self.histogram(winner.provider, "total").observe(loop.time() - winner.started)
+
+    async def ainvoke(self, primary_chain, fallback_chain, inputs):
+        """Get a full response from whichever provider answers first.
+
+        Returns:
+            tuple: (provider name, response text)
+        """
+        provider = None
+        parts = []
+        try:
+            async for provider, chunk in self.astream(primary_chain, fallback_chain, inputs):
+                parts.append(chunk)
+        except Exception as e:
+            if provider != self.primary:
+                raise
+            # The primary failed part-way through its response: ask the fallback instead
+            log_event("llm_failover", f"{self.primary} LLM failed mid-response, falling back to {self.fallback}: "
+                      f"{str(e) or type(e).__name__}", provider=self.primary, error=str(e) or type(e).__name__)
+            self._count("failovers")
+            return self.fallback, await fallback_chain.ainvoke(inputs)
+        return provider, "".join(parts)
+
+    def get_stats(self):
+        """Get hedging counters and the current hedge delay."""
+        with self.lock:
+            stats = {
+                "requests": self.requests,
+                "hedges_fired": self.hedges_fired,
+                "hedge_rate": self.hedges_fired / self.requests if self.requests else 0.0,
+                "primary_wins": self.primary_wins,
+                "fallback_wins": self.fallback_wins,
+                "failovers": self.failovers,
+                "extra_calls": self.extra_calls,
+                "extra_prompt_chars": self.extra_prompt_chars,
+            }
+        stats["hedge_delay"] = self.get_delay()
+        return stats
+
+    def collect_metrics(self):
+        """Get the hedging counters as (metric name, labels, value) samples for /metrics."""
+        stats = self.get_stats()
+        return [
+            ("rag_hedge_requests_total", {}, stats["requests"]),
+            ("rag_hedges_fired_total", {}, stats["hedges_fired"]),
+            ("rag_hedge_wins_total", {"provider": self.primary}, stats["primary_wins"]),
+            ("rag_hedge_wins_total", {"provider": self.fallback}, stats["fallback_wins"]),
+            ("rag_hedge_failovers_total", {}, stats["failovers"]),
+            ("rag_hedge_extra_calls_total", {}, stats["extra_calls"]),
+            ("rag_hedge_delay_seconds", {}, stats["hedge_delay"]),
+        ]
+
+HEDGE_METRICS = {
+    "rag_hedge_requests_total": ("counter", "Hedged LLM requests"),
+    "rag_hedges_fired_total": ("counter", "Hedged requests that launched the fallback for a slow primary"),
+    "rag_hedge_wins_total": ("counter", "Hedged requests answered first by each provider"),
+    "rag_hedge_failovers_total": ("counter", "Hedged requests that failed over to the fallback"),
+    "rag_hedge_extra_calls_total": ("counter", "LLM calls made only because a hedge fired"),
+    "rag_hedge_delay_seconds": ("gauge", "Current wait for the primary's first token before hedging"),
+}
+
+# Singleton instance
+_hedger = None
+_hedger_lock = threading.Lock()
+
+def get_hedger():
+    """Get the singleton LLM hedger instance."""
+    global _hedger
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = LLMHedger()
+            get_metrics().add_collector("hedging", _hedger.collect_metrics, HEDGE_METRICS)
+    return _hedger
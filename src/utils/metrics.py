@@ -0,0 +1,290 @@
+"""Prometheus-style metrics: latency histograms and counters, served over HTTP."""
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+from src.config.settings import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+
+# Metric families recorded by src.utils.tracing
+STAGE_SECONDS = "rag_stage_seconds"
+REQUESTS_TOTAL = "rag_requests_total"
+
+# Bucket upper bounds in seconds, from a cache lookup to a slow answer or a long ingestion
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+class Histogram:
+    """Observation counts per bucket, and their sum, for one label set."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Record one observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """Estimate a quantile as the upper bound of the bucket holding it, or None if empty."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+
+def _escape(value):
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels):
+    """Format a sorted tuple of (name, value) pairs as a Prometheus label set ("" if there are none)."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _render_family(lines, name, kind, help_text, series):
+    """Append one metric's HELP, TYPE and sample lines.
+
+    Args:
+        lines: Lines of the exposition to append to
+        name: Name of the metric
+        kind: Its type, e.g. "histogram", "counter" or "gauge"
+        help_text: Its help text
+        series: (sorted label pairs, Histogram or value) items
+    """
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in series:
+        if not isinstance(value, Histogram):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+            continue
+        cumulative = 0
+        for bound, count in zip(value.buckets + (float("inf"),), value.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else format(bound, "g")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {value.sum}")
+        lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+
+class MetricsRegistry:
+    """Histograms and counters keyed by metric name and labels.
+
+    Recording an observation takes one lock and a bisect, cheap enough to do
+    for every request. Components that already keep their own counters (the
+    caches, the hedger, the key schedulers) add a collector instead, which
+    render() calls to read them on every scrape. render() returns every
+    metric in the Prometheus text exposition format.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED, buckets=DEFAULT_BUCKETS):
+        """Initialize the registry.
+
+        Args:
+            enabled: Whether observations are recorded (if not, every call is a no-op)
+            buckets: Histogram bucket upper bounds in seconds
+        """
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.descriptions = {}  # Metric name -> (type, help text)
+        self.series = {}  # Metric name -> {sorted label pairs: Histogram or count}
+        self.collectors = {}  # Collector name -> function returning (metric name, labels, value) samples
+
+    def describe(self, name, kind, help_text):
+        """Set a metric's type ("histogram", "counter" or "gauge") and help text."""
+        with self.lock:
+            self.descriptions[name] = (kind, help_text)
+
+    def observe(self, name, value, **labels):
+        """Record an observation in a histogram."""
+        if self.enabled:
+            self.observe_series(name, tuple(sorted(labels.items())), value)
+
+    def observe_series(self, name, key, value):
+        """Record an observation in a histogram, for callers that build the label key themselves.
+
+        Args:
+            name: Name of the histogram
+            key: The labels as a tuple of (name, value) pairs sorted by name
+            value: The observed value
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            series = self.series.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        """Add to a counter."""
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def add_collector(self, name, collect, descriptions):
+        """Export another component's statistics, read by calling collect() on every render().
+
+        Args:
+            name: Name of the collector; adding one under the same name replaces it
+            collect: Function returning (metric name, labels dict, value) samples
+            descriptions: {metric name: (type, help text)} of the metrics it returns
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.descriptions.update(descriptions)
+            self.collectors[name] = collect
+
+    def _collect(self):
+        """Read the collectors' samples, grouped by metric name."""
+        with self.lock:
+            collectors = list(self.collectors.items())
+        collected = {}
+        # Called outside the registry lock, since collectors take their components' locks
+        for collector, collect in collectors:
+            try:
+                for name, labels, value in collect():
+                    collected.setdefault(name, []).append((tuple(sorted(labels.items())), value))
+            except Exception as e:
+                # One failing component shouldn't take down the whole scrape
+                from src.utils.tracing import log_event  # Imported here because tracing imports this module
+
+                log_event("metrics_error", f"Metrics collector {collector} failed: {str(e)}",
+                          collector=collector, error=str(e))
+        return collected
+
+    def render(self):
+        """Get every metric in the Prometheus text exposition format."""
+        collected = self._collect()
+        lines = []
+        with self.lock:
+            families = [(name, series.items()) for name, series in self.series.items()] + list(collected.items())
+            for name, samples in families:
+                kind, help_text = self.descriptions.get(name, ("untyped", name))
+                _render_family(lines, name, kind, help_text, samples)
+        return "\n".join(lines) + "\n"
+
+    def get_stats(self, name):
+        """Get a metric's series for monitoring.
+
+        Returns:
+            list: One dict per label set with the labels and, for histograms,
+                count, mean and estimated p50 and p95 in seconds (for counters, value)
+        """
+        with self.lock:
+            stats = []
+            for labels, value in self.series.get(name, {}).items():
+                if isinstance(value, Histogram):
+                    stats.append(dict(labels, count=value.count, mean=value.sum / value.count,
+                                      p50=value.quantile(0.5), p95=value.quantile(0.95)))
+                else:
+                    stats.append(dict(labels, value=value))
+            return stats
+
+# Singleton instance
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    """Get the singleton metrics registry."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+            _metrics.describe(STAGE_SECONDS, "histogram", "Seconds spent in each query and ingestion stage")
+            _metrics.describe(REQUESTS_TOTAL, "counter", "Queries and ingestions finished, by outcome")
+    return _metrics
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves GET /metrics from the server's registry and GET /ready from its readiness check."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body = self.server.registry.render().encode("utf-8")
+            self._send(200, body, "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/ready" and self.server.readiness is not None:
+            # 503 until ready, so orchestrators hold traffic back during warm-up
+            ready, details = self.server.readiness()
+            body = json.dumps(dict(details, ready=ready)).encode("utf-8")
+            self._send(200 if ready else 503, body, "application/json")
+        else:
+            self.send_error(404)
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP server exposing a metrics registry at /metrics for Prometheus to scrape.
+
+    With a readiness check, GET /ready answers 200 once it reports ready and
+    503 before, with the check's details as JSON.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, registry, host=METRICS_HOST, port=METRICS_PORT, readiness=None):
+        super().__init__((host, port), _MetricsHandler)
+        self.registry = registry
+        self.readiness = readiness
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    @property
+    def ready_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/ready"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="metrics", daemon=True).start()
+        return self
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT, readiness=None):
+    """Serve the metrics registry at /metrics on a background thread, alongside the Gradio app.
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on (0 turns the endpoint off)
+        readiness: Function returning (ready, details) to serve at /ready, or None
+
+    Returns:
+        MetricsServer: The running server, or None if the endpoint is off
+    """
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None and port:
+            from src.utils.tracing import log_event  # Imported here because tracing imports this module
+
+            _metrics_server = MetricsServer(get_metrics(), host, port, readiness).start()
+            log_event("metrics_server", f"Metrics available at {_metrics_server.url}", url=_metrics_server.url)
+            if readiness is not None:
+                log_event("readiness_probe", f"Readiness probe at {_metrics_server.ready_url}",
+                          url=_metrics_server.ready_url)
+    return _metrics_server
@@ -0,0 +1,103 @@
+"""Bounded in-memory cache of question embeddings."""
+from collections import OrderedDict
+import threading
+
+from src.config.settings import QUERY_EMBEDDING_CACHE_SIZE
+from src.utils.semantic_cache import normalize_question
+
+class QueryEmbeddingCache:
+    """LRU cache of question vectors keyed by (embedding model, normalized question).
+
+    Repeated questions skip the embedding API call. Concurrent requests for a
+    question that isn't cached yet embed it once; the others wait for that
+    call to finish and share its vector.
+    """
+
+    def __init__(self, max_entries=QUERY_EMBEDDING_CACHE_SIZE):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of question vectors kept
+        """
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.vectors = OrderedDict()  # key -> vector, least recently used first
+        self.embedding = {}  # key -> threading.Event set when the embedding call finishes
+
+        # Counters for monitoring cache effectiveness
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+
+    def get_or_embed(self, model, question, embed_query):
+        """Get the vector of a question, embedding it on a miss.
+
+        Args:
+            model: Name of the embedding model, so stores on different models don't share vectors
+            question: The question text
+            embed_query: Function embedding the question on a miss
+
+        Returns:
+            list: The question vector
+        """
+        key = (model, normalize_question(question))
+        while True:
+            with self.lock:
+                vector = self.vectors.get(key)
+                if vector is not None:
+                    self.vectors.move_to_end(key)
+                    self.hits += 1
+                    return list(vector)
+                embedding = self.embedding.get(key)
+                if embedding is None:
+                    embedding = self.embedding[key] = threading.Event()
+                    self.misses += 1
+                    break
+                self.waits += 1
+            # Another request is embedding this question; use its vector when it's done
+            embedding.wait()
+
+        try:
+            vector = embed_query(question)
+            with self.lock:
+                self.vectors[key] = tuple(vector)
+                while len(self.vectors) > self.max_entries:
+                    self.vectors.popitem(last=False)
+                    self.evictions += 1
+            return list(vector)
+        finally:
+            with self.lock:
+                del self.embedding[key]
+            embedding.set()
+
+    def clear(self):
+        """Drop every cached vector."""
+        with self.lock:
+            self.vectors.clear()
+
+    def get_stats(self):
+        """Get hit/miss counters and the current size of the cache."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "waits": self.waits,
+                "evictions": self.evictions,
+                "entries": len(self.vectors),
+                "max_entries": self.max_entries,
+            }
+
+# Singleton instance
+_query_embedding_cache = None
+_query_embedding_cache_lock = threading.Lock()
+
+def get_query_embedding_cache():
+    """Get the singleton question embedding cache."""
+    global _query_embedding_cache
+    with _query_embedding_cache_lock:
+        if _query_embedding_cache is None:
+            _query_embedding_cache = QueryEmbeddingCache()
+    return _query_embedding_cache
@@ -1,22 +1,50 @@
 """Query handling and response generation."""
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from functools import lru_cache
+import asyncio
+import hashlib
+import json
+import threading
 import time
 import os
-from google.api_core.exceptions import ResourceExhausted
-from langchain_groq import ChatGroq
 
-from src.config.settings import API_KEY, GEMINI_MODEL
-from src.database.document_store import get_database
+from src.config.settings import (
+    API_KEY, DEFAULT_DOC_PATH, EMBEDDING_PROVIDER, GEMINI_MODEL, GROQ_MODEL,
+    QUERY_CONCURRENCY, RETRIEVAL_TIMEOUT, GENERATION_TIMEOUT, HYBRID_SEARCH, HYBRID_CANDIDATES, RRF_K,
+    RERANKER, RERANK_CANDIDATES, CONTEXT_TOKEN_BUDGET_GROQ, CONTEXT_TOKEN_BUDGET_GEMINI, CONTEXT_DEDUP_THRESHOLD,
+    CONTEXT_CHARS_PER_TOKEN, MULTI_DOC_K,
+)
+from src.database.chroma_layout import lexical_index_path
+from src.database.document_registry import get_registry
+from src.database.document_store import (
+    get_chunk_embeddings, hybrid_search, open_database, resolve_db_path, search_documents,
+)
+from src.database.embedding_cache import text_hash
+from src.database.embedding_providers import get_embedding_model_name
+from src.database.lexical_index import get_lexical_index
+from src.utils.adaptive_retrieval import RetrievalOptions, select_results
+from src.utils.api_load_balancer import get_load_balancer, is_rate_limit_error
+from src.utils.client_pool import PooledChain
+from src.utils.context_packer import get_context_packer
+from src.utils.hedging import get_hedger
+from src.utils.query_embedding_cache import get_query_embedding_cache
+from src.utils.reranker import get_rerank_cache, get_reranker, rerank
+from src.utils.semantic_cache import get_semantic_cache, normalize_question
+from src.utils.shared_cache import document_prefix, get_shared_cache
+from src.utils.tracing import document_label, log_event, observe, span, trace
+
+# LLM provider SDKs that take seconds to import: loaded on first use (or by the startup
+# warm-up), not when the app starts
+LLM_PROVIDER_MODULES = ("langchain_groq", "langchain_google_genai")
 
 # Initialize the Google Gemini LLM (now used as fallback)
-def get_gemini_llm():
-    """Get a new Google Gemini LLM instance with the next API key."""
+def get_gemini_llm(api_key=None):
+    """Get a new Google Gemini LLM instance with an API key (by default the next one)."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    
     return ChatGoogleGenerativeAI(
         model=GEMINI_MODEL, 
-        api_key=API_KEY(),  # Call the function to get the next API key
+        api_key=api_key or API_KEY(),
         temperature=0.3,  # Lower temperature for faster, more deterministic responses
         max_output_tokens=1024,  # Limit output tokens for faster generation
         top_p=0.95,  # Slightly reduce top_p for faster generation
@@ -24,14 +52,16 @@ def get_gemini_llm():
     )
 
 # Initialize the Groq LLM as primary
-def get_groq_llm():
+def get_groq_llm(api_key=None):
     """Get a Groq LLM instance as the primary LLM."""
-    groq_api_key = os.getenv("GROQ_API_KEY")
+    groq_api_key = api_key or os.getenv("GROQ_API_KEY")
     if not groq_api_key:
         raise ValueError("GROQ_API_KEY not found in environment variables")
     
+    from langchain_groq import ChatGroq
+    
     return ChatGroq(
-        model="llama-3.3-70b-specdec",
+        model=GROQ_MODEL,
         api_key=groq_api_key,
         temperature=0.3,
         max_tokens=1024,
@@ -70,93 +100,704 @@ Output Format:
         - Well-formatted with Markdown for readability.
 """
 
-@lru_cache(maxsize=5)  # Cache the 5 most recent chain configurations
+def _build_chain(llm):
+    """Build the prompt | LLM | parser chain around an LLM client."""
+    return ChatPromptTemplate.from_template(PROMPT_TEMPLATE) | llm | output_parser
+
+# Pooled chains by use_fallback; each request checks out a warm client for its API key
+_chains = {}
+_chains_lock = threading.Lock()
+
 def get_chain(use_fallback=False):
-    """Get the LLM chain with caching.
+    """Get the LLM chain.
+    
+    Each request through the chain uses a long-lived client from the client
+    pool. Gemini requests go to the API key with the most quota left, chosen
+    per request by the key scheduler.
     
     Args:
         use_fallback: Whether to use the fallback Google Gemini LLM instead of Groq
     """
-    prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+    with _chains_lock:
+        if use_fallback not in _chains:
+            if use_fallback:
+                log_event("llm_selected", "Using Google Gemini LLM as fallback", provider="gemini")
+                _chains[use_fallback] = PooledChain(
+                    "gemini", lambda key: _build_chain(get_gemini_llm(key)), scheduler=get_load_balancer()
+                )
+            else:
+                groq_api_key = os.getenv("GROQ_API_KEY")
+                if not groq_api_key:
+                    raise ValueError("GROQ_API_KEY not found in environment variables")
+                log_event("llm_selected", "Using Groq LLM as primary", provider="groq")
+                _chains[use_fallback] = PooledChain(
+                    "groq", lambda key: _build_chain(get_groq_llm(key)), key=groq_api_key
+                )
+        return _chains[use_fallback]
+
+def _get_generation_chains():
+    """Get the (primary, fallback) chains, with no primary if Groq isn't configured."""
+    try:
+        primary_chain = get_chain(use_fallback=False)
+    except Exception as e:
+        log_event("llm_unavailable", f"Groq LLM unavailable: {str(e)}", provider="groq", error=str(e))
+        primary_chain = None
+    return primary_chain, get_chain(use_fallback=True)
+
+NO_RESULTS_MESSAGE = "I couldn't find any relevant information in the document to answer your question."
+LLM_FAILURE_MESSAGE = "I'm sorry, but I'm currently experiencing technical difficulties with both primary and fallback language models. Please try again later."
+
+# Options every question uses unless it passes its own
+DEFAULT_RETRIEVAL_OPTIONS = RetrievalOptions()
+
+class _NoAnswerCache:
+    """Stands in for the semantic cache for questions whose answers aren't cached."""
+    
+    def lookup(self, namespace, question, vector=None):
+        return None
+    
+    def store(self, namespace, question, vector, answer):
+        pass
+
+def _caches_answers(options):
+    """Check whether answers retrieved with these options are cached.
+    
+    Caches are keyed by document and question only, so answers are only
+    cached for questions using the default retrieval options.
+    """
+    return options is None or options.fingerprint() == DEFAULT_RETRIEVAL_OPTIONS.fingerprint()
+
+def _get_answer_cache(options):
+    """Get the semantic answer cache, or a stand-in that caches nothing for non-default options."""
+    return get_semantic_cache() if _caches_answers(options) else _NoAnswerCache()
+
+def _get_cache_namespace(doc_path):
+    """Get the answer cache namespace for a document (the path of its vector store).
+    
+    Identical uploads share a store, so they share cached answers too.
+    """
+    return resolve_db_path(doc_path or DEFAULT_DOC_PATH)
+
+def _is_fully_indexed(doc_path):
+    """Check whether a document has finished ingestion.
     
-    if use_fallback:
-        print("Using Google Gemini LLM as fallback")
-        return prompt_template | get_gemini_llm() | output_parser
-    else:
-        print("Using Groq LLM as primary")
-        return prompt_template | get_groq_llm() | output_parser
+    Documents can be queried while they're still being indexed, but answers
+    from a partly indexed store would be served from the cache long after
+    ingestion finished, so they're only cached once it's complete.
+    """
+    registry = get_registry()
+    content_hash = registry.content_hash(doc_path or DEFAULT_DOC_PATH)
+    return content_hash is not None and registry.lookup(content_hash) is not None
+
+def _get_cache_version(*parts):
+    """Get a short fingerprint of everything a cached value depends on."""
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:12]
 
-# Cache for storing query results to avoid redundant processing
-query_cache = {}
+# Changing the prompt or a model changes these, so old shared cache entries stop matching
+RETRIEVAL_MODE = f"hybrid:{HYBRID_CANDIDATES}:{RRF_K}" if HYBRID_SEARCH else "vector"
+RETRIEVAL_MODE += f"|rerank:{RERANKER}:{RERANK_CANDIDATES}" if RERANKER != "none" else ""
+RETRIEVAL_MODE += (f"|pack:{CONTEXT_TOKEN_BUDGET_GROQ}:{CONTEXT_TOKEN_BUDGET_GEMINI}:{CONTEXT_DEDUP_THRESHOLD}"
+                   f":{CONTEXT_CHARS_PER_TOKEN}")
+ANSWER_CACHE_VERSION = _get_cache_version(PROMPT_TEMPLATE, GROQ_MODEL, GEMINI_MODEL, get_embedding_model_name(),
+                                          DEFAULT_RETRIEVAL_OPTIONS.fingerprint(), RETRIEVAL_MODE)
+RETRIEVAL_CACHE_VERSION = _get_cache_version(get_embedding_model_name(), DEFAULT_RETRIEVAL_OPTIONS.fingerprint(),
+                                             RETRIEVAL_MODE)
 
-def query_document(question, doc_path=None):
-    """Query the document and generate a response with caching."""
-    # Create a cache key that includes both the question and document path
-    cache_key = f"{doc_path}:{question}" if doc_path else question
+def _get_shared_cache_keys(question, doc_path, options=None):
+    """Get the shared cache keys for a question's answer and retrieved context.
     
-    if cache_key in query_cache:
-        print(f"Cache hit for question: {question}")
-        return query_cache[cache_key]
+    Keys are namespaced by the document's content hash rather than its path, so
+    every worker process (and every upload of the same file) shares entries.
+    Rebuilding or deleting the document's store clears them. Entries are only
+    used once the document is fully indexed, since the content hash is known
+    while ingestion is still running.
     
-    start_time = time.time()
-    db = get_database(doc_path)
+    Returns:
+        tuple: (answer key, retrieval key), or (None, None) if shared caching is off,
+            the question's answer isn't cached or the document isn't fully indexed
+    """
+    if get_shared_cache() is None or not _caches_answers(options):
+        return None, None
+    registry = get_registry()
+    content_hash = registry.content_hash(doc_path or DEFAULT_DOC_PATH)
+    if content_hash is None or registry.lookup(content_hash) is None:
+        return None, None
+    prefix = document_prefix(content_hash)
+    question_hash = text_hash(normalize_question(question))
+    return (f"{prefix}answer:{ANSWER_CACHE_VERSION}:{question_hash}",
+            f"{prefix}retrieval:{RETRIEVAL_CACHE_VERSION}:{question_hash}")
+
+def _shared_get(key):
+    """Get a value from the shared cache, or None if it's missing or caching is off."""
+    return get_shared_cache().get(key) if key else None
+
+def _shared_set(key, value):
+    """Store a value in the shared cache, if caching is on."""
+    if key:
+        get_shared_cache().set(key, value)
+
+def _shared_get_retrieval(key):
+    """Get a cached (question vector, context) pair, or (None, None)."""
+    value = _shared_get(key)
+    if value is None:
+        return None, None
+    retrieval = json.loads(value)
+    return retrieval["vector"], retrieval["context"]
+
+def _shared_set_retrieval(key, question_vector, context):
+    """Cache the question vector and retrieved context for a question."""
+    _shared_set(key, json.dumps({"vector": [float(v) for v in question_vector], "context": context}))
+
+def _embed_question(question, doc_path):
+    """Embed a question with the embedding model of a document's store.
     
-    print(f"Searching for: {question} in document: {doc_path}")
-    results = db.similarity_search_with_relevance_scores(
-        question, 
-        k=3
-    )
+    Vectors are memoized by normalized question, so a repeated question costs
+    no embedding API call. Each request embeds its question once and passes
+    the vector to every cache lookup and search that needs it.
+    """
+    with open_database(doc_path) as db:
+        embeddings = db.embeddings
+    model = getattr(embeddings, "model", get_embedding_model_name())
+    with span("embed_query", provider=EMBEDDING_PROVIDER):
+        return get_query_embedding_cache().get_or_embed(model, question, embeddings.embed_query)
 
-    # Handle negative relevance scores by using absolute values
-    if results and all(score < 0 for _, score in results):
-        print("Detected negative relevance scores, using absolute values for comparison")
-        # Sort by absolute value of relevance score (closest to 0 is most relevant for negative scores)
-        results.sort(key=lambda x: abs(x[1]))
+def _search_document(doc_path, question, question_vector, options=None):
+    """Search a document's store (vector and keyword search), holding its handle meanwhile.
+    
+    With a reranker, adaptive k or MMR, RERANK_CANDIDATES chunks are fetched
+    and ordered by the reranker, and the options choose how many to keep
+    (and, with MMR, which), so the prompt stays small without missing chunks
+    that retrieval ranked just below the top k.
+    
+    Args:
+        options: RetrievalOptions for the question (defaults to the RETRIEVAL_* settings)
+    
+    Returns:
+        list: (document, score) pairs, most relevant first
+    """
+    options = options or DEFAULT_RETRIEVAL_OPTIONS
+    db_path = resolve_db_path(doc_path or DEFAULT_DOC_PATH)
+    reranker = get_reranker()
+    candidates = options.most_chunks
+    if reranker is not None or options.adaptive or options.mmr:
+        candidates = max(candidates, RERANK_CANDIDATES)
+    with open_database(doc_path) as db, span("vector_search"):
+        results = hybrid_search(db, db_path, question, question_vector, k=candidates)
+        embeddings = get_chunk_embeddings(db, [doc.id for doc, _score in results]) if options.mmr else None
+    
+    if reranker is not None:
+        index = get_lexical_index(lexical_index_path(db_path))
+        with span("rerank"):
+            results = rerank(question, results, len(results), reranker, index=index, cache=get_rerank_cache(),
+                             store=db_path)
+    vectors = None
+    if embeddings is not None and all(doc.id in embeddings for doc, _score in results):
+        vectors = [embeddings[doc.id] for doc, _score in results]
+    results = select_results(results, options, vectors)
+    log_event("results_found", f"Found {len(results)} results with scores: {[score for _, score in results]}",
+              results=len(results), scores=[score for _, score in results])
+    return results
+
+def _context_token_budget(k=3):
+    """Get the context token budget of the models that may answer a question using k chunks.
+    
+    Groq and a hedged Gemini request get the same prompt, so while Groq is
+    configured the smaller of the two budgets applies.
+    """
+    budget = CONTEXT_TOKEN_BUDGET_GEMINI
+    if os.getenv("GROQ_API_KEY"):
+        budget = min(CONTEXT_TOKEN_BUDGET_GROQ, budget)
+    return budget * k // 3
+
+def _pack_context(results, k=3, label_sources=False):
+    """Pack the retrieved chunks into the prompt context, reporting the tokens saved and dropped."""
+    with span("context_build"):
+        context, report = get_context_packer().pack(results, _context_token_budget(k), label_sources)
+    log_event("context_packed",
+              f"Packed {report['chunks']} chunks into {report['sections']} sections of ~{report['tokens_out']} tokens "
+              f"(saved ~{report['tokens_saved']}: {report['duplicates']} duplicates, "
+              f"~{report['overlap_tokens']} overlapping; "
+              f"dropped ~{report['tokens_dropped']} in {report['dropped_sections']} sections over budget)",
+              **report)
+    return context
+
+def _build_context(results):
+    """Build the prompt context from the retrieved chunks, with a budget for at least 3 of them."""
+    return _pack_context(results, k=max(3, len(results)))
+
+def _build_multi_document_context(results):
+    """Build the prompt context from chunks of several documents, labelled by source."""
+    return _pack_context([(doc, score) for doc, score, _db_path in results], k=MULTI_DOC_K, label_sources=True)
+
+def _generate_response(inputs):
+    """Generate an answer with Groq, falling back to Google Gemini if there's an error.
+    
+    Returns:
+        str: The response, or None if both language models failed
+    """
+    try:
+        chain = get_chain(use_fallback=False)
+        generation_start = time.time()
+        response = chain.invoke(inputs)
+        generation_time = time.time() - generation_start
+        observe("llm_total", generation_time, provider="groq")
+        log_event("generation_done", f"Response generation completed in {generation_time:.2f} seconds",
+                  provider="groq", seconds=round(generation_time, 3))
+        return response
+    except Exception as e:
+        log_event("llm_error", f"Groq API error: {str(e)}", provider="groq", error=str(e))
+        log_event("llm_fallback", "Falling back to Google Gemini LLM...", provider="gemini")
+    
+    try:
+        # Use Google Gemini as fallback
+        chain = get_chain(use_fallback=True)
+        generation_start = time.time()
+        response = chain.invoke(inputs)
+        generation_time = time.time() - generation_start
+        observe("llm_total", generation_time, provider="gemini")
+        log_event("generation_done", f"Fallback response generation completed in {generation_time:.2f} seconds",
+                  provider="gemini", seconds=round(generation_time, 3))
+        return response
+    except Exception as fallback_error:
+        if is_rate_limit_error(fallback_error):
+            log_event("llm_error", f"Google API quota exceeded: {str(fallback_error)}", provider="gemini",
+                      error=str(fallback_error))
+        else:
+            log_event("llm_error", f"Fallback LLM also failed: {str(fallback_error)}", provider="gemini",
+                      error=str(fallback_error))
+    return None
+
+def query_document(question, doc_path=None, options=None):
+    """Query the document and generate a response with caching.
+    
+    Args:
+        question: The question to answer
+        doc_path: Path of the document (defaults to DEFAULT_DOC_PATH)
+        options: RetrievalOptions for this question (e.g. adaptive k or MMR); answers
+            are only cached for questions using the default options
+    """
+    with trace("query", document=document_label(doc_path)) as query_trace:
+        cache = _get_answer_cache(options)
+        namespace = _get_cache_namespace(doc_path)
+        
+        with span("cache_lookup"):
+            cached_answer = cache.lookup(namespace, question)
+        if cached_answer is not None:
+            query_trace.outcome = "cached"
+            log_event("cache_hit", f"Cache hit for question: {question}", question=question)
+            return cached_answer
+        
+        # Checked before retrieval, so an answer from a store still being built is never cached
+        cacheable = _is_fully_indexed(doc_path)
+        
+        # Answers computed by other worker processes
+        answer_key, retrieval_key = _get_shared_cache_keys(question, doc_path, options)
+        with span("cache_lookup"):
+            cached_answer = _shared_get(answer_key)
+        if cached_answer is not None:
+            query_trace.outcome = "cached"
+            log_event("shared_cache_hit", f"Shared cache hit for question: {question}", question=question)
+            return cached_answer
         
+        start_time = time.time()
+        with span("cache_lookup"):
+            question_vector, context_text = _shared_get_retrieval(retrieval_key)
+        if question_vector is None:
+            # Embed the question once for both the semantic cache and the vector search
+            question_vector = _embed_question(question, doc_path)
+        
+        with span("cache_lookup"):
+            cached_answer = cache.lookup(namespace, question, question_vector)
+        if cached_answer is not None:
+            query_trace.outcome = "cached"
+            return cached_answer
+        
+        if context_text is None:
+            log_event("search", f"Searching for: {question} in document: {doc_path}", question=question)
+            results = _search_document(doc_path, question, question_vector, options)
+            
+            if len(results) == 0:
+                query_trace.outcome = "no_results"
+                log_event("no_results", "No results found in the document")
+                return NO_RESULTS_MESSAGE
+            
+            context_text = _build_context(results)
+            _shared_set_retrieval(retrieval_key, question_vector, context_text)
+        
+        retrieval_time = time.time() - start_time
+        log_event("retrieval_done", f"Retrieval completed in {retrieval_time:.2f} seconds",
+                  seconds=round(retrieval_time, 3))
+        
+        response = _generate_response({'context': context_text, 'question': question})
+        if response is None:
+            query_trace.outcome = "failed"
+            return LLM_FAILURE_MESSAGE
+        
+        # Cache the result
+        if cacheable:
+            cache.store(namespace, question, question_vector, response)
+        _shared_set(answer_key, response)
+        
+        total_time = time.time() - start_time
+        log_event("query_done", f"Total query processing time: {total_time:.2f} seconds", seconds=round(total_time, 3))
+        
+        return response
+
+# Limits the number of questions processed at once by the async path
+_query_semaphore = None
+_query_semaphore_loop = None
+
+def _get_query_semaphore():
+    """Get the concurrency-limiting semaphore for the running event loop."""
+    global _query_semaphore, _query_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _query_semaphore is None or _query_semaphore_loop is not loop:
+        _query_semaphore = asyncio.Semaphore(QUERY_CONCURRENCY)
+        _query_semaphore_loop = loop
+    return _query_semaphore
+
+async def _aretrieve_inputs(doc_path, question, question_vector, retrieval_key, options=None):
+    """Retrieve the chunks for a question and build the chain inputs.
+    
+    Returns:
+        tuple: (chain inputs, None) on success, or (None, message to show the user)
+    """
+    log_event("search", f"Searching for: {question}", question=question)
+    try:
+        results = await asyncio.wait_for(
+            asyncio.to_thread(_search_document, doc_path, question, question_vector, options),
+            timeout=RETRIEVAL_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        log_event("timeout", f"Retrieval timed out after {RETRIEVAL_TIMEOUT} seconds", stage="vector_search")
+        return None, NO_RESULTS_MESSAGE
+    
     if len(results) == 0:
-        print("No results found in the document")
-        return "I couldn't find any relevant information in the document to answer your question."
+        log_event("no_results", "No results found in the document")
+        return None, NO_RESULTS_MESSAGE
     
-    print(f"Found {len(results)} results with scores: {[score for _, score in results]}")
-    retrieval_time = time.time() - start_time
-    print(f"Retrieval completed in {retrieval_time:.2f} seconds")
+    context = _build_context(results)
+    await asyncio.to_thread(_shared_set_retrieval, retrieval_key, question_vector, context)
+    return {'context': context, 'question': question}, None
+
+async def _alookup_or_retrieve(question, doc_path, namespace, retrieval_key, cache, options=None):
+    """Embed a question, check the semantic cache, and retrieve context on a miss.
     
-    # Sort by relevance and join the most relevant chunks
-    results.sort(key=lambda x: x[1], reverse=True)
-    context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
+    A retrieval cached by any worker process skips the embedding and the search.
+    
+    Returns:
+        tuple: (question vector, answer or None, chain inputs or None); exactly one
+            of the answer (cached answer or message for the user) and inputs is set
+    """
+    with span("cache_lookup"):
+        question_vector, context = await asyncio.to_thread(_shared_get_retrieval, retrieval_key)
+    if question_vector is not None:
+        with span("cache_lookup"):
+            cached_answer = cache.lookup(namespace, question, question_vector)
+        if cached_answer is not None:
+            return question_vector, cached_answer, None
+        return question_vector, None, {'context': context, 'question': question}
     
-    # Try with primary Groq LLM first, fall back to Google Gemini if there's an error
     try:
-        chain = get_chain(use_fallback=False)
+        # Opening a store touches disk and embedding calls the API, so keep both off the event loop
+        question_vector = await asyncio.wait_for(
+            asyncio.to_thread(_embed_question, question, doc_path),
+            timeout=RETRIEVAL_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        log_event("timeout", f"Question embedding timed out after {RETRIEVAL_TIMEOUT} seconds", stage="embed_query")
+        return None, NO_RESULTS_MESSAGE, None
+    
+    with span("cache_lookup"):
+        cached_answer = cache.lookup(namespace, question, question_vector)
+    if cached_answer is not None:
+        return question_vector, cached_answer, None
+    
+    inputs, message = await _aretrieve_inputs(doc_path, question, question_vector, retrieval_key, options)
+    return question_vector, message, inputs
+
+async def _agenerate_response(inputs):
+    """Generate an answer, racing Groq against a hedged Gemini request if Groq is slower than usual.
+    
+    Returns:
+        str: The response, or None if both language models failed
+    """
+    try:
         generation_start = time.time()
-        response = chain.invoke({'context': context_text, 'question': question})
+        primary_chain, fallback_chain = _get_generation_chains()
+        provider, response = await asyncio.wait_for(
+            get_hedger().ainvoke(primary_chain, fallback_chain, inputs),
+            timeout=GENERATION_TIMEOUT
+        )
         generation_time = time.time() - generation_start
-        print(f"Response generation completed in {generation_time:.2f} seconds")
+        observe("llm_total", generation_time, provider=provider)
+        log_event("generation_done", f"Response generation by {provider} completed in {generation_time:.2f} seconds",
+                  provider=provider, seconds=round(generation_time, 3))
+        return response
     except Exception as e:
-        print(f"Groq API error: {str(e)}")
-        print("Falling back to Google Gemini LLM...")
+        if is_rate_limit_error(e):
+            log_event("llm_error", f"API quota exceeded: {str(e)}", error=str(e))
+        else:
+            log_event("llm_error", f"Both language models failed: {str(e) or type(e).__name__}",
+                      error=str(e) or type(e).__name__)
+    return None
+
+async def aquery_document(question, doc_path=None, options=None):
+    """Async version of query_document for handlers running on an event loop.
+    
+    At most QUERY_CONCURRENCY questions are processed at once. Retrieval and
+    generation are bounded by RETRIEVAL_TIMEOUT and GENERATION_TIMEOUT. Gemini
+    is launched as a hedge if Groq is slower than usual, and immediately if
+    Groq fails.
+    """
+    with trace("query", document=document_label(doc_path)) as query_trace:
+        cache = _get_answer_cache(options)
+        namespace = _get_cache_namespace(doc_path)
+        
+        with span("cache_lookup"):
+            cached_answer = cache.lookup(namespace, question)
+        if cached_answer is not None:
+            query_trace.outcome = "cached"
+            log_event("cache_hit", f"Cache hit for question: {question}", question=question)
+            return cached_answer
         
+        # Checked before retrieval, so an answer from a store still being built is never cached
+        cacheable = await asyncio.to_thread(_is_fully_indexed, doc_path)
+        answer_key, retrieval_key = await asyncio.to_thread(_get_shared_cache_keys, question, doc_path, options)
+        
+        async with _get_query_semaphore():
+            start_time = time.time()
+            
+            # Answers computed by other worker processes
+            with span("cache_lookup"):
+                cached_answer = await asyncio.to_thread(_shared_get, answer_key)
+            if cached_answer is not None:
+                query_trace.outcome = "cached"
+                log_event("shared_cache_hit", f"Shared cache hit for question: {question}", question=question)
+                return cached_answer
+            
+            question_vector, answer, inputs = await _alookup_or_retrieve(question, doc_path, namespace,
+                                                                         retrieval_key, cache, options)
+            if answer is not None:
+                query_trace.outcome = "no_results" if answer == NO_RESULTS_MESSAGE else "cached"
+                return answer
+            
+            retrieval_time = time.time() - start_time
+            log_event("retrieval_done", f"Retrieval completed in {retrieval_time:.2f} seconds",
+                      seconds=round(retrieval_time, 3))
+            
+            response = await _agenerate_response(inputs)
+            if response is None:
+                query_trace.outcome = "failed"
+                return LLM_FAILURE_MESSAGE
+            
+            # Cache the result
+            if cacheable:
+                cache.store(namespace, question, question_vector, response)
+            await asyncio.to_thread(_shared_set, answer_key, response)
+            
+            total_time = time.time() - start_time
+            log_event("query_done", f"Total query processing time: {total_time:.2f} seconds",
+                      seconds=round(total_time, 3))
+            
+            return response
+
+async def _astream_with_deadline(stream, timeout):
+    """Re-yield chunks from an async stream, failing if it runs past the timeout."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    iterator = stream.__aiter__()
+    while True:
         try:
-            # Use Google Gemini as fallback
-            chain = get_chain(use_fallback=True)
-            generation_start = time.time()
-            response = chain.invoke({'context': context_text, 'question': question})
-            generation_time = time.time() - generation_start
-            print(f"Fallback response generation completed in {generation_time:.2f} seconds")
-        except ResourceExhausted as fallback_error:
-            print(f"Google API quota exceeded: {str(fallback_error)}")
-            return "I'm sorry, but I'm currently experiencing technical difficulties with both primary and fallback language models. Please try again later."
-        except Exception as fallback_error:
-            print(f"Fallback LLM also failed: {str(fallback_error)}")
-            return "I'm sorry, but I'm currently experiencing technical difficulties with both primary and fallback language models. Please try again later."
-    
-    # Cache the result
-    query_cache[cache_key] = response
+            chunk = await asyncio.wait_for(iterator.__anext__(), timeout=max(0, deadline - loop.time()))
+        except StopAsyncIteration:
+            return
+        yield chunk
+
+async def astream_query_document(question, doc_path=None, options=None):
+    """Stream the answer to a question, yielding the partial markdown so far.
     
-    total_time = time.time() - start_time
-    print(f"Total query processing time: {total_time:.2f} seconds")
+    Tokens are streamed from whichever of Groq and a hedged Gemini request
+    answers first; if Groq fails mid-stream the answer restarts from Gemini.
+    The answer is only cached once a stream completes.
     
-    return response
+    Yields:
+        str: The full answer text received so far
+    """
+    # Stages after the first yield are recorded on query_trace itself, since the
+    # consumer may resume this generator in another context
+    with trace("query", document=document_label(doc_path)) as query_trace:
+        cache = _get_answer_cache(options)
+        namespace = _get_cache_namespace(doc_path)
+        
+        with span("cache_lookup"):
+            cached_answer = cache.lookup(namespace, question)
+        if cached_answer is not None:
+            query_trace.outcome = "cached"
+            log_event("cache_hit", f"Cache hit for question: {question}", question=question)
+            yield cached_answer
+            return
+        
+        # Checked before retrieval, so an answer from a store still being built is never cached
+        cacheable = await asyncio.to_thread(_is_fully_indexed, doc_path)
+        answer_key, retrieval_key = await asyncio.to_thread(_get_shared_cache_keys, question, doc_path, options)
+        
+        async with _get_query_semaphore():
+            start_time = time.time()
+            
+            # Answers computed by other worker processes
+            with span("cache_lookup"):
+                cached_answer = await asyncio.to_thread(_shared_get, answer_key)
+            if cached_answer is not None:
+                query_trace.outcome = "cached"
+                log_event("shared_cache_hit", f"Shared cache hit for question: {question}", question=question)
+                yield cached_answer
+                return
+            
+            question_vector, answer, inputs = await _alookup_or_retrieve(question, doc_path, namespace,
+                                                                         retrieval_key, cache, options)
+            if answer is not None:
+                query_trace.outcome = "no_results" if answer == NO_RESULTS_MESSAGE else "cached"
+                yield answer
+                return
+            
+            retrieval_time = time.time() - start_time
+            log_event("retrieval_done", f"Retrieval completed in {retrieval_time:.2f} seconds",
+                      seconds=round(retrieval_time, 3))
+            
+            # Race Groq against a hedged Gemini request if Groq is slower than usual
+            hedger = get_hedger()
+            response = None
+            provider = None
+            partial = ""
+            generation_start = time.time()
+            try:
+                primary_chain, fallback_chain = _get_generation_chains()
+                stream = hedger.astream(primary_chain, fallback_chain, inputs)
+                async for provider, chunk in _astream_with_deadline(stream, GENERATION_TIMEOUT):
+                    if not partial:
+                        first_token_time = time.time() - generation_start
+                        log_event("first_token", f"First token from {provider} after {first_token_time:.2f} seconds",
+                                  provider=provider, seconds=round(first_token_time, 3))
+                    partial += chunk
+                    yield partial
+                response = partial
+                generation_time = time.time() - generation_start
+                query_trace.observe("llm_total", generation_time, provider=provider)
+                log_event("stream_done", f"Streamed response completed in {generation_time:.2f} seconds",
+                          provider=provider, seconds=round(generation_time, 3))
+            except Exception as e:
+                log_event("llm_error", f"{provider or 'LLM'} error after {len(partial)} streamed characters: "
+                          f"{str(e) or type(e).__name__}", provider=provider, error=str(e) or type(e).__name__)
+            
+            if response is None and provider == hedger.primary:
+                # Groq failed mid-stream: restart the answer from Gemini
+                log_event("llm_fallback", "Falling back to Google Gemini LLM...", provider=hedger.fallback)
+                partial = ""
+                generation_start = time.time()
+                try:
+                    stream = get_chain(use_fallback=True).astream(inputs)
+                    async for chunk in _astream_with_deadline(stream, GENERATION_TIMEOUT):
+                        partial += chunk
+                        yield partial
+                    response = partial
+                    query_trace.observe("llm_total", time.time() - generation_start, provider=hedger.fallback)
+                except Exception as e:
+                    log_event("llm_error", f"Fallback LLM also failed: {str(e) or type(e).__name__}",
+                              provider=hedger.fallback, error=str(e) or type(e).__name__)
+            
+            if response is None:
+                query_trace.outcome = "failed"
+                yield LLM_FAILURE_MESSAGE
+                return
+            
+            # Cache the result only once the stream has completed
+            if cacheable:
+                cache.store(namespace, question, question_vector, response)
+            await asyncio.to_thread(_shared_set, answer_key, response)
+            
+            total_time = time.time() - start_time
+            log_event("query_done", f"Total query processing time: {total_time:.2f} seconds",
+                      seconds=round(total_time, 3))
+
+def _retrieve_across_documents(question, doc_paths):
+    """Embed a question once and search every document with it.
+
+    Returns:
+        tuple: (chain inputs, None) on success, or (None, message to show the user)
+    """
+    doc_paths = list(doc_paths) if doc_paths is not None else None
+
+    # Every store uses the same embedding model, so one question vector serves them all
+    question_vector = _embed_question(question, doc_paths[0] if doc_paths else None)
+
+    log_event("search", f"Searching for: {question} in {len(doc_paths) if doc_paths is not None else 'all'} documents",
+              question=question)
+    with span("vector_search"):
+        results = search_documents(question, question_vector, doc_paths)
+    if len(results) == 0:
+        log_event("no_results", "No results found in the documents")
+        return None, NO_RESULTS_MESSAGE
+
+    documents = len({db_path for _doc, _score, db_path in results})
+    log_event("results_found", f"Found {len(results)} results from {documents} documents",
+              results=len(results), documents=documents)
+    return {'context': _build_multi_document_context(results), 'question': question}, None
+
+def query_documents(question, doc_paths=None):
+    """Answer a question from several documents at once.
+
+    The documents' stores are searched in parallel and their chunks merged into
+    one global top-k (see search_documents). Answers aren't cached, since they
+    depend on the whole set of documents.
+
+    Args:
+        question: The question to answer
+        doc_paths: Paths of the documents to search (defaults to every indexed document)
+    """
+    with trace("query", document="multiple") as query_trace:
+        start_time = time.time()
+        inputs, message = _retrieve_across_documents(question, doc_paths)
+        if message:
+            query_trace.outcome = "no_results"
+            return message
+
+        retrieval_time = time.time() - start_time
+        log_event("retrieval_done", f"Retrieval completed in {retrieval_time:.2f} seconds",
+                  seconds=round(retrieval_time, 3))
+
+        response = _generate_response(inputs)
+        if response is None:
+            query_trace.outcome = "failed"
+            return LLM_FAILURE_MESSAGE
+        return response
+
+async def aquery_documents(question, doc_paths=None):
+    """Async version of query_documents, with hedged generation."""
+    with trace("query", document="multiple") as query_trace:
+        async with _get_query_semaphore():
+            start_time = time.time()
+            try:
+                inputs, message = await asyncio.wait_for(
+                    asyncio.to_thread(_retrieve_across_documents, question, doc_paths),
+                    timeout=RETRIEVAL_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                log_event("timeout", f"Retrieval timed out after {RETRIEVAL_TIMEOUT} seconds", stage="vector_search")
+                message = NO_RESULTS_MESSAGE
+            if message:
+                query_trace.outcome = "no_results"
+                return message
+
+            retrieval_time = time.time() - start_time
+            log_event("retrieval_done", f"Retrieval completed in {retrieval_time:.2f} seconds",
+                      seconds=round(retrieval_time, 3))
+
+            response = await _agenerate_response(inputs)
+            if response is None:
+                query_trace.outcome = "failed"
+                return LLM_FAILURE_MESSAGE
+            return response
 
 def chat_response(message, history, active_document=None):
     """Handle chat messages and maintain conversation history."""
@@ -166,3 +807,20 @@ def chat_response(message, history, active_document=None):
         {"role": "user", "content": message},
         {"role": "assistant", "content": answer}
     ]
+
+async def achat_response(message, history, active_document=None):
+    """Async version of chat_response."""
+    answer = await aquery_document(message, active_document)
+    
+    return "", history + [
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": answer}
+    ]
+
+async def astream_chat_response(message, history, active_document=None):
+    """Handle chat messages, yielding the conversation as the answer streams in."""
+    async for partial_answer in astream_query_document(message, active_document):
+        yield "", history + [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": partial_answer}
+        ]
@@ -0,0 +1,266 @@
+"""Reranking of retrieved chunks on the CPU before they go into the prompt."""
+from collections import OrderedDict
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from src.config.settings import (
+    RERANKER,
+    RERANK_BATCH_SIZE,
+    RERANK_BUDGET_MS,
+    RERANK_CACHE_SIZE,
+    RERANKER_MODEL_DIR,
+    RERANKER_THREADS,
+)
+from src.database.embedding_cache import text_hash
+from src.utils.semantic_cache import normalize_question
+from src.utils.tracing import log_event
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Words too common to say whether a chunk answers a question
+_STOPWORDS = frozenset("""
+a about after all also an and any are as at be been but by can could did do does for from had has have
+how i if in into is it its may more most of on or our such than that the their them then there these they
+this those to was we were what when where which while who whom why will with would you your
+""".split())
+
+def _content_terms(text):
+    """Get the lowercase words of a text, without stopwords."""
+    return [word for word in _TOKEN_PATTERN.findall(text.lower()) if word not in _STOPWORDS]
+
+class OverlapReranker:
+    """Scores chunks by how much of the question they cover, with NumPy and no model.
+
+    A chunk scores for each distinct question word it contains, saturating
+    with repeats and weighted by the word's IDF in the store's keyword index
+    (or by word length, a rough stand-in, without one). Unlike BM25, which
+    lets one frequent word dominate, this favours chunks that cover the
+    whole question.
+    """
+
+    name = "overlap"
+
+    def score(self, question, texts, index=None):
+        """Score chunks against a question.
+
+        Args:
+            question: The question text
+            texts: Chunk texts
+            index: LexicalIndex of the chunks' store, for word weights
+
+        Returns:
+            numpy.ndarray: One score per chunk in [0, 2), higher is better
+        """
+        terms = list(dict.fromkeys(_content_terms(question)))
+        if not terms:
+            return np.zeros(len(texts), dtype=np.float32)
+
+        columns = {term: i for i, term in enumerate(terms)}
+        cells = []
+        for row, text in enumerate(texts):
+            offset = row * len(terms)
+            cells.extend(offset + columns[token] for token in _content_terms(text) if token in columns)
+        counts = np.bincount(np.array(cells, dtype=np.int64), minlength=len(texts) * len(terms))
+        counts = counts.reshape(len(texts), len(terms)).astype(np.float32)
+
+        if index is not None:
+            weights = index.idf(terms)
+        else:
+            weights = np.log1p(np.array([len(term) for term in terms], dtype=np.float32))
+        return ((counts / (counts + 1.0)) @ weights / (0.5 * weights.sum())).astype(np.float32)
+
+class CrossEncoderReranker:
+    """A cross-encoder (e.g. ms-marco-MiniLM-L-6-v2) exported to ONNX and run on the CPU.
+
+    RERANKER_MODEL_DIR must hold the exported model.onnx and its tokenizer.json.
+    Each batch of (question, chunk) pairs is one forward pass over a token
+    matrix padded to the longest pair of the batch.
+    """
+
+    name = "cross-encoder"
+
+    def __init__(self, model_dir=RERANKER_MODEL_DIR, threads=RERANKER_THREADS, max_length=512):
+        """Load the model.
+
+        Args:
+            model_dir: Directory with model.onnx and tokenizer.json
+            threads: ONNX Runtime threads used by each forward pass
+            max_length: Maximum tokens per (question, chunk) pair
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.log_severity_level = 3
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), providers=["CPUExecutionProvider"], sess_options=options
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def score(self, question, texts, index=None):
+        """Score chunks against a question in one forward pass (the keyword index isn't used).
+
+        Returns:
+            numpy.ndarray: One relevance logit per chunk, higher is better
+        """
+        encoded = self.tokenizer.encode_batch([(question, text) for text in texts])
+        inputs = {
+            "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encoded], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encoded], dtype=np.int64),
+        }
+        logits = self.session.run(None, {name: inputs[name] for name in inputs if name in self.input_names})[0]
+        # Single-logit models score relevance directly; two-class models score it in the last column
+        return logits.reshape(len(texts), -1)[:, -1].astype(np.float32)
+
+class RerankScoreCache:
+    """LRU cache of reranker scores keyed by (reranker, store, normalized question, chunk text hash)."""
+
+    def __init__(self, max_entries=RERANK_CACHE_SIZE):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of scores kept
+        """
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.scores = OrderedDict()  # key -> score, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        """Get the cached scores of several keys, with None for misses."""
+        found = []
+        with self.lock:
+            for key in keys:
+                score = self.scores.get(key)
+                if score is None:
+                    self.misses += 1
+                else:
+                    self.scores.move_to_end(key)
+                    self.hits += 1
+                found.append(score)
+        return found
+
+    def set_many(self, keys, scores):
+        """Store the scores of several keys."""
+        with self.lock:
+            for key, score in zip(keys, scores):
+                self.scores[key] = float(score)
+                self.scores.move_to_end(key)
+            while len(self.scores) > self.max_entries:
+                self.scores.popitem(last=False)
+
+    def clear(self):
+        """Remove every cached score."""
+        with self.lock:
+            self.scores.clear()
+
+    def get_stats(self):
+        """Get cache statistics for monitoring."""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self.scores),
+                "max_entries": self.max_entries,
+            }
+
+def create_reranker(name=RERANKER):
+    """Create a reranker by name ("overlap", "cross-encoder" or "none").
+
+    Returns:
+        The reranker, or None for "none"
+    """
+    if name == "none":
+        return None
+    if name == "overlap":
+        return OverlapReranker()
+    if name == "cross-encoder":
+        return CrossEncoderReranker()
+    raise ValueError(f"Unknown RERANKER: {name}")
+
+def rerank(question, results, k, reranker, index=None, cache=None, batch_size=RERANK_BATCH_SIZE,
+           budget_ms=RERANK_BUDGET_MS, store=None):
+    """Keep the k best of an over-fetched list of candidates.
+
+    Cached scores are used first; the rest are scored in batches, in
+    retrieval order, until the latency budget runs out. If the budget runs
+    out before k candidates are scored, the remaining slots are filled with
+    the best-retrieved unscored candidates, after the scored ones.
+
+    Args:
+        question: The question text
+        results: (document, score) pairs, best retrieved first
+        k: Number of results to keep
+        reranker: Reranker scoring the candidates, or None to keep the first k
+        index: LexicalIndex of the candidates' store, if it has one
+        cache: RerankScoreCache for scores of (question, chunk) pairs, if any
+        batch_size: Candidates scored per call to the reranker
+        budget_ms: Milliseconds allowed for scoring, after which the rest go unscored
+        store: Path of the candidates' store, part of the cache key since overlap
+            scores depend on the store's keyword IDF
+
+    Returns:
+        list: (document, score) pairs, best first; scores are reranker scores
+            except for fill-ins, which keep their retrieval score
+    """
+    if reranker is None or len(results) <= 1:
+        return results[:k]
+
+    start = time.perf_counter()
+    normalized = normalize_question(question)
+    keys = [(reranker.name, store, normalized, text_hash(doc.page_content)) for doc, _score in results]
+    scores = cache.get_many(keys) if cache is not None else [None] * len(results)
+
+    pending = [i for i, score in enumerate(scores) if score is None]
+    for offset in range(0, len(pending), batch_size):
+        if offset and (time.perf_counter() - start) * 1000 > budget_ms:
+            log_event("rerank_budget", f"Rerank budget of {budget_ms} ms used up; {len(pending) - offset} candidates left unscored",
+                      budget_ms=budget_ms, unscored=len(pending) - offset)
+            break
+        batch = pending[offset:offset + batch_size]
+        batch_scores = reranker.score(question, [results[i][0].page_content for i in batch], index)
+        for i, score in zip(batch, batch_scores):
+            scores[i] = float(score)
+        if cache is not None:
+            cache.set_many([keys[i] for i in batch], batch_scores)
+
+    scored = sorted((i for i, score in enumerate(scores) if score is not None), key=lambda i: -scores[i])
+    ranked = [(results[i][0], scores[i]) for i in scored[:k]]
+    ranked.extend(results[i] for i, score in enumerate(scores) if score is None and len(ranked) < k)
+    return ranked[:k]
+
+# Singleton instances
+_reranker = None
+_reranker_loaded = False
+_rerank_cache = None
+_reranker_lock = threading.Lock()
+
+def get_reranker():
+    """Get the singleton configured reranker (None if reranking is off), so its model is only loaded once."""
+    global _reranker, _reranker_loaded
+    with _reranker_lock:
+        if not _reranker_loaded:
+            _reranker = create_reranker()
+            _reranker_loaded = True
+    return _reranker
+
+def get_rerank_cache():
+    """Get the singleton cache of reranker scores."""
+    global _rerank_cache
+    with _reranker_lock:
+        if _rerank_cache is None:
+            _rerank_cache = RerankScoreCache()
+    return _rerank_cache
@@ -0,0 +1,300 @@
+"""Bounded per-document answer cache with embedding-similarity lookup."""
+from collections import OrderedDict
+import threading
+import time
+
+import numpy as np
+
+from src.config.settings import (
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_ENTRIES_PER_DOC,
+    SEMANTIC_CACHE_MAX_BYTES,
+)
+from src.utils.hedging import LatencyHistogram
+from src.utils.metrics import get_metrics
+from src.utils.tracing import log_event
+
+# Rough per-entry bookkeeping overhead counted towards the memory cap
+_ENTRY_OVERHEAD_BYTES = 256
+
+def normalize_question(question):
+    """Normalize a question for exact-match lookups."""
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+class _DocumentCache:
+    """Cached answers for one document, with question vectors in a NumPy matrix."""
+
+    def __init__(self):
+        self.vectors = None  # (capacity, dim) float32, rows are unit vectors
+        self.valid = np.zeros(0, dtype=bool)
+        self.created = np.zeros(0, dtype=np.float64)
+        self.questions = []
+        self.answers = []
+        self.sizes = []
+        self.exact = {}
+        self.order = OrderedDict()  # slot -> None, least recently used first
+        self.free = []
+
+    def _grow(self, dim):
+        """Double the slot capacity."""
+        old_capacity = len(self.valid)
+        capacity = max(8, old_capacity * 2)
+        vectors = np.zeros((capacity, dim), dtype=np.float32)
+        if self.vectors is not None:
+            vectors[:old_capacity] = self.vectors
+        self.vectors = vectors
+        self.valid = np.concatenate([self.valid, np.zeros(capacity - old_capacity, dtype=bool)])
+        self.created = np.concatenate([self.created, np.zeros(capacity - old_capacity)])
+        self.questions.extend([None] * (capacity - old_capacity))
+        self.answers.extend([None] * (capacity - old_capacity))
+        self.sizes.extend([0] * (capacity - old_capacity))
+        self.free.extend(range(capacity - 1, old_capacity - 1, -1))
+
+    def add(self, question, vector, answer, now):
+        """Store an answer and return (slot, bytes used)."""
+        if not self.free:
+            self._grow(len(vector))
+        slot = self.free.pop()
+        self.vectors[slot] = vector
+        self.valid[slot] = True
+        self.created[slot] = now
+        self.questions[slot] = question
+        self.answers[slot] = answer
+        self.sizes[slot] = vector.nbytes + len(answer) + len(question) + _ENTRY_OVERHEAD_BYTES
+        self.exact[question] = slot
+        self.order[slot] = None
+        return slot, self.sizes[slot]
+
+    def remove(self, slot):
+        """Drop a slot and return the bytes it used."""
+        self.valid[slot] = False
+        self.exact.pop(self.questions[slot], None)
+        self.order.pop(slot, None)
+        self.questions[slot] = None
+        self.answers[slot] = None
+        size, self.sizes[slot] = self.sizes[slot], 0
+        self.free.append(slot)
+        return size
+
+    def __len__(self):
+        return len(self.order)
+
+class SemanticCache:
+    """Answer cache that also matches rephrased questions.
+
+    Each document gets its own set of entries. A lookup first tries an exact
+    match on the normalized question, then the most similar cached question
+    vector (cosine similarity of at least `threshold`). Entries expire after
+    `ttl` seconds; the least recently used are evicted once a document has
+    `max_entries_per_doc` entries or the whole cache passes `max_bytes`.
+    """
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, ttl=SEMANTIC_CACHE_TTL,
+                 max_entries_per_doc=SEMANTIC_CACHE_MAX_ENTRIES_PER_DOC, max_bytes=SEMANTIC_CACHE_MAX_BYTES):
+        """Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a semantic hit
+            ttl: Seconds an answer stays valid
+            max_entries_per_doc: Maximum answers cached per document
+            max_bytes: Approximate memory cap for the whole cache
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries_per_doc = max_entries_per_doc
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.lru = OrderedDict()  # (namespace, slot) -> None across all documents
+        self.bytes_used = 0
+
+        # Counters for monitoring cache effectiveness
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lookup_latency = LatencyHistogram()
+
+    def lookup(self, namespace, question, vector=None):
+        """Look up a cached answer.
+
+        Without a vector only the exact-match tier is checked and a miss isn't
+        counted, so callers can try the free exact lookup before embedding the
+        question and calling again with its vector.
+
+        Args:
+            namespace: The document the question is about
+            question: The question text
+            vector: The question's embedding, or None for an exact-only lookup
+
+        Returns:
+            str: The cached answer, or None on a miss
+        """
+        start = time.perf_counter()
+        now = time.time()
+        key = normalize_question(question)
+
+        with self.lock:
+            doc = self.documents.get(namespace)
+            answer = None
+            if doc is not None:
+                self._expire(namespace, doc, now)
+                slot = doc.exact.get(key)
+                if slot is not None:
+                    self.exact_hits += 1
+                    answer = self._touch(namespace, doc, slot)
+                elif vector is not None and len(doc) and doc.vectors.shape[1] == len(vector):
+                    query = self._unit(vector)
+                    similarities = doc.vectors @ query
+                    similarities[~doc.valid] = -np.inf
+                    slot = int(np.argmax(similarities))
+                    if similarities[slot] >= self.threshold:
+                        log_event("semantic_cache_hit",
+                                  f"Semantic cache hit ({similarities[slot]:.3f}): {question!r} ~ {doc.questions[slot]!r}",
+                                  similarity=round(float(similarities[slot]), 3))
+                        self.semantic_hits += 1
+                        answer = self._touch(namespace, doc, slot)
+
+            if answer is None and vector is not None:
+                self.misses += 1
+
+        self.lookup_latency.observe(time.perf_counter() - start)
+        return answer
+
+    def store(self, namespace, question, vector, answer):
+        """Cache the answer to a question."""
+        key = normalize_question(question)
+        vector = self._unit(vector)
+        now = time.time()
+
+        with self.lock:
+            doc = self.documents.get(namespace)
+            if doc is not None and doc.vectors is not None and doc.vectors.shape[1] != len(vector):
+                # The document's embedding model changed; old vectors aren't comparable
+                self._drop_document(namespace)
+                doc = None
+            if doc is None:
+                doc = self.documents[namespace] = _DocumentCache()
+
+            if key in doc.exact:
+                self._remove(namespace, doc, doc.exact[key])
+
+            while len(doc) >= self.max_entries_per_doc:
+                self._remove(namespace, doc, next(iter(doc.order)))
+                self.evictions += 1
+
+            slot, size = doc.add(key, vector, answer, now)
+            self.lru[(namespace, slot)] = None
+            self.bytes_used += size
+
+            while self.bytes_used > self.max_bytes and len(self.lru) > 1:
+                evict_namespace, evict_slot = next(iter(self.lru))
+                self._remove(evict_namespace, self.documents[evict_namespace], evict_slot)
+                self.evictions += 1
+
+    def invalidate(self, namespace):
+        """Drop every cached answer for a document."""
+        with self.lock:
+            if not self._drop_document(namespace):
+                return
+        log_event("semantic_cache_invalidated", f"Invalidated semantic cache for: {namespace}", namespace=namespace)
+
+    def clear(self):
+        """Drop every cached answer."""
+        with self.lock:
+            self.documents.clear()
+            self.lru.clear()
+            self.bytes_used = 0
+
+    def _drop_document(self, namespace):
+        """Remove a document's entries. Caller must hold the lock."""
+        doc = self.documents.pop(namespace, None)
+        if doc is None:
+            return False
+        for slot in list(doc.order):
+            self.bytes_used -= doc.sizes[slot]
+            self.lru.pop((namespace, slot), None)
+        return True
+
+    def _touch(self, namespace, doc, slot):
+        """Mark a slot as recently used and return its answer. Caller must hold the lock."""
+        doc.order.move_to_end(slot)
+        self.lru.move_to_end((namespace, slot))
+        return doc.answers[slot]
+
+    def _remove(self, namespace, doc, slot):
+        """Remove one slot. Caller must hold the lock."""
+        self.lru.pop((namespace, slot), None)
+        self.bytes_used -= doc.remove(slot)
+
+    def _expire(self, namespace, doc, now):
+        """Remove entries older than the TTL. Caller must hold the lock."""
+        if not len(doc):
+            return
+        for slot in np.flatnonzero(doc.valid & (now - doc.created > self.ttl)):
+            self._remove(namespace, doc, int(slot))
+
+    @staticmethod
+    def _unit(vector):
+        """Convert a vector to a float32 unit vector."""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get_stats(self):
+        """Get hit rates, size and lookup latency of the cache."""
+        with self.lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            stats = {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.lru),
+                "documents": len(self.documents),
+                "bytes_used": self.bytes_used,
+                "max_bytes": self.max_bytes,
+            }
+        stats["lookup_p50_ms"] = (self.lookup_latency.percentile(0.5) or 0.0) * 1000
+        stats["lookup_p95_ms"] = (self.lookup_latency.percentile(0.95) or 0.0) * 1000
+        return stats
+
+    def collect_metrics(self):
+        """Get the cache's statistics as (metric name, labels, value) samples for /metrics."""
+        stats = self.get_stats()
+        return [
+            ("rag_semantic_cache_lookups_total", {"result": "exact"}, stats["exact_hits"]),
+            ("rag_semantic_cache_lookups_total", {"result": "semantic"}, stats["semantic_hits"]),
+            ("rag_semantic_cache_lookups_total", {"result": "miss"}, stats["misses"]),
+            ("rag_semantic_cache_hit_ratio", {}, stats["hit_rate"]),
+            ("rag_semantic_cache_evictions_total", {}, stats["evictions"]),
+            ("rag_semantic_cache_entries", {}, stats["entries"]),
+            ("rag_semantic_cache_bytes", {}, stats["bytes_used"]),
+            ("rag_semantic_cache_lookup_seconds", {"quantile": "0.5"}, stats["lookup_p50_ms"] / 1000),
+            ("rag_semantic_cache_lookup_seconds", {"quantile": "0.95"}, stats["lookup_p95_ms"] / 1000),
+        ]
+
+SEMANTIC_CACHE_METRICS = {
+    "rag_semantic_cache_lookups_total": ("counter", "Semantic cache lookups, by result"),
+    "rag_semantic_cache_hit_ratio": ("gauge", "Share of semantic cache lookups answered from the cache"),
+    "rag_semantic_cache_evictions_total": ("counter", "Answers evicted from the semantic cache"),
+    "rag_semantic_cache_entries": ("gauge", "Answers in the semantic cache"),
+    "rag_semantic_cache_bytes": ("gauge", "Bytes used by the semantic cache"),
+    "rag_semantic_cache_lookup_seconds": ("gauge", "Semantic cache lookup latency over the recent window"),
+}
+
+# Singleton instance
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+def get_semantic_cache():
+    """Get the singleton semantic answer cache instance."""
+    global _semantic_cache
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache()
+            get_metrics().add_collector("semantic_cache", _semantic_cache.collect_metrics, SEMANTIC_CACHE_METRICS)
+    return _semantic_cache
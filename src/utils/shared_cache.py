@@ -0,0 +1,413 @@
+"""Cache backends shared by every worker process serving queries."""
+from collections import OrderedDict
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from src.config.settings import (
+    SHARED_CACHE_BACKEND,
+    SHARED_CACHE_CONNECTIONS,
+    SHARED_CACHE_PATH,
+    SHARED_CACHE_URL,
+    SHARED_CACHE_TTL,
+    SHARED_CACHE_MAX_ENTRIES,
+)
+from src.utils.metrics import get_metrics
+from src.utils.tracing import log_event
+
+# Prefix for every key, so clear() only removes our own entries from a shared server
+KEY_PREFIX = "rag:"
+
+def document_prefix(content_hash):
+    """Get the key prefix of every entry derived from one document's contents."""
+    return f"doc:{content_hash}:"
+
+class CacheBackend:
+    """Interface for string key-value caches.
+
+    Backends never raise on connection or storage problems: a failed get is a
+    miss and a failed set is dropped, so an unavailable cache only costs speed.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key):
+        """Get the value stored under key, or None."""
+        try:
+            value = self._get(KEY_PREFIX + key)
+        except Exception as e:
+            log_event("shared_cache_error", f"{self.name} cache get failed: {str(e)}", backend=self.name, error=str(e))
+            value = None
+            self._count("errors")
+        self._count("misses" if value is None else "hits")
+        return value
+
+    def set(self, key, value, ttl=SHARED_CACHE_TTL):
+        """Store a string value under key for ttl seconds."""
+        try:
+            self._set(KEY_PREFIX + key, value, ttl)
+        except Exception as e:
+            log_event("shared_cache_error", f"{self.name} cache set failed: {str(e)}", backend=self.name, error=str(e))
+            self._count("errors")
+
+    def clear(self, prefix=""):
+        """Remove every entry written by this application whose key starts with prefix."""
+        try:
+            self._clear(KEY_PREFIX + prefix)
+        except Exception as e:
+            log_event("shared_cache_error", f"{self.name} cache clear failed: {str(e)}", backend=self.name, error=str(e))
+            self._count("errors")
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def _clear(self, prefix):
+        raise NotImplementedError
+
+    def get_stats(self):
+        """Get hit/miss/error counters for the backend."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "errors": self.errors,
+            }
+
+    def collect_metrics(self):
+        """Get the backend's counters as (metric name, labels, value) samples for /metrics."""
+        stats = self.get_stats()
+        return [
+            ("rag_shared_cache_lookups_total", {"backend": self.name, "result": "hit"}, stats["hits"]),
+            ("rag_shared_cache_lookups_total", {"backend": self.name, "result": "miss"}, stats["misses"]),
+            ("rag_shared_cache_errors_total", {"backend": self.name}, stats["errors"]),
+        ]
+
+SHARED_CACHE_METRICS = {
+    "rag_shared_cache_lookups_total": ("counter", "Shared retrieval cache lookups, by result"),
+    "rag_shared_cache_errors_total": ("counter", "Shared cache operations that failed"),
+}
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache. Not shared between workers; useful for a single process."""
+
+    name = "memory"
+
+    def __init__(self, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires at, value)
+        self.entries_lock = threading.Lock()
+
+    def _get(self, key):
+        with self.entries_lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def _set(self, key, value, ttl):
+        with self.entries_lock:
+            self.entries[key] = (time.time() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _clear(self, prefix):
+        with self.entries_lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+class SQLiteCacheBackend(CacheBackend):
+    """File-backed cache shared by every process on the host.
+
+    SQLite in WAL mode lets several Gradio workers read concurrently while one
+    writes. Expired rows are skipped on read and the least recently used rows
+    are evicted once the table passes max_entries.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, cache_path=SHARED_CACHE_PATH, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        """Initialize the backend.
+
+        Args:
+            cache_path: SQLite file shared by the worker processes
+            max_entries: Maximum number of entries kept before eviction
+        """
+        super().__init__()
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.conn_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        # Other processes may hold the write lock briefly, so wait rather than fail
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False, timeout=5.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache (last_used)")
+        self.conn.commit()
+
+    def _get(self, key):
+        now = time.time()
+        with self.conn_lock:
+            row = self.conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (now, key))
+                self.conn.commit()
+        return row[0] if row else None
+
+    def _set(self, key, value, ttl):
+        now = time.time()
+        with self.conn_lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now)
+            )
+            (count,) = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if count > self.max_entries:
+                # Expired rows go first; only what's still over the limit is evicted by LRU
+                count -= self.conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,)).rowcount
+                if count > self.max_entries:
+                    self.conn.execute(
+                        "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+            self.conn.commit()
+
+    def _clear(self, prefix):
+        with self.conn_lock:
+            self.conn.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            self.conn.commit()
+
+class RedisProtocolError(Exception):
+    """Raised when a Redis-compatible server returns an error reply."""
+
+class _RedisConnection:
+    """One socket to a Redis-compatible server, used by one thread at a time."""
+
+    def __init__(self, host, port, timeout, password=None, db=0):
+        """Open the connection, authenticating and selecting the database."""
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile("rb")
+        try:
+            if password:
+                self.roundtrip("AUTH", password)
+            if db:
+                self.roundtrip("SELECT", str(db))
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """Close the socket, ignoring errors."""
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def roundtrip(self, *args):
+        """Send one command and read its reply."""
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        """Parse one RESP reply from the connection."""
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RedisProtocolError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisProtocolError(f"unexpected reply: {line!r}")
+
+class RedisCacheBackend(CacheBackend):
+    """Cache on any server speaking the Redis protocol (RESP), shared across hosts.
+
+    Uses a minimal built-in client, so no extra dependency is needed.
+    Commands run on a small pool of connections, so concurrent requests
+    don't queue behind one socket. When the server can't be reached, cache
+    calls fail at once for retry_interval seconds instead of each waiting
+    for a connection timeout. Expiry and eviction are left to the server
+    (SET ... EX and its maxmemory policy).
+    """
+
+    name = "redis"
+
+    def __init__(self, url=SHARED_CACHE_URL, timeout=1.0, max_connections=SHARED_CACHE_CONNECTIONS,
+                 retry_interval=5.0):
+        """Initialize the backend.
+
+        Args:
+            url: Server address as redis://[:password@]host[:port][/db]
+            timeout: Socket timeout in seconds, also the longest wait for a free connection
+            max_connections: Most connections open at once
+            retry_interval: Seconds to fail fast after the server couldn't be reached
+        """
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.slots = threading.BoundedSemaphore(max(1, max_connections))
+        self.pool_lock = threading.Lock()
+        self.idle = []  # Open connections not in use, most recently used last
+        self.down_until = 0.0
+
+    def _checkout(self):
+        """Get an idle connection, or open a new one.
+
+        Returns:
+            tuple: (connection, whether it was newly opened)
+        """
+        with self.pool_lock:
+            if self.idle:
+                return self.idle.pop(), False
+            if time.monotonic() < self.down_until:
+                raise ConnectionError(f"{self.host}:{self.port} unreachable; retrying in a few seconds")
+        try:
+            return _RedisConnection(self.host, self.port, self.timeout, self.password, self.db), True
+        except OSError:
+            with self.pool_lock:
+                self.down_until = time.monotonic() + self.retry_interval
+            raise
+
+    def command(self, *args):
+        """Run one command on a pooled connection.
+
+        A pooled connection that fails may just have gone stale, so the
+        command is retried once on a new one; a new connection that fails
+        raises at once.
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No free connection to {self.host}:{self.port} within {self.timeout}s")
+        try:
+            for attempt in range(2):
+                conn, fresh = self._checkout()
+                try:
+                    reply = conn.roundtrip(*args)
+                except RedisProtocolError:
+                    self._checkin(conn)  # The server answered, so the connection is fine
+                    raise
+                except OSError:
+                    conn.close()
+                    if fresh or attempt == 1:
+                        raise
+                    continue
+                self._checkin(conn)
+                return reply
+        finally:
+            self.slots.release()
+
+    def _checkin(self, conn):
+        """Return a healthy connection to the pool."""
+        with self.pool_lock:
+            self.idle.append(conn)
+
+    def close(self):
+        """Close every idle connection."""
+        with self.pool_lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+    def _get(self, key):
+        return self.command("GET", key)
+
+    def _set(self, key, value, ttl):
+        self.command("SET", key, value, "EX", str(max(1, int(ttl))))
+
+    def _clear(self, prefix):
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", prefix) + "*"  # Escape glob characters in the prefix
+        cursor = "0"
+        while True:
+            cursor, keys = self.command("SCAN", cursor, "MATCH", pattern, "COUNT", "500")
+            if keys:
+                self.command("DEL", *keys)
+            if cursor == "0":
+                return
+
+def create_cache_backend(backend=SHARED_CACHE_BACKEND):
+    """Create a cache backend by name ("memory", "sqlite", "redis" or "none").
+
+    Returns:
+        CacheBackend: The backend, or None if shared caching is disabled
+    """
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryCacheBackend()
+    if backend == "sqlite":
+        return SQLiteCacheBackend()
+    if backend == "redis":
+        return RedisCacheBackend()
+    raise ValueError(f"Unknown SHARED_CACHE_BACKEND: {backend}")
+
+# Singleton instance
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_cache():
+    """Get the singleton shared cache backend, or None if it's disabled."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = create_cache_backend()
+            if _shared_cache is not None:
+                get_metrics().add_collector("shared_cache", _shared_cache.collect_metrics, SHARED_CACHE_METRICS)
+    return _shared_cache
@@ -0,0 +1,191 @@
+"""Per-stage latency tracing of queries and ingestion, with sampled structured logs."""
+from contextlib import contextmanager
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+
+from src.config.settings import DEFAULT_DOC_PATH, LOG_FORMAT, METRICS_MAX_DOCUMENTS, TRACE_SAMPLE_RATE
+from src.utils.metrics import REQUESTS_TOTAL, STAGE_SECONDS, get_metrics
+
+# The trace of the query or ingestion running in this context (copied into asyncio.to_thread calls)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+def log_event(event, message, **fields):
+    """Log an event in the LOG_FORMAT format.
+
+    "text" prints the message, "json" prints a JSON line with the event name,
+    message, trace id and fields, and "none" logs nothing.
+
+    Args:
+        event: Short name of the event, e.g. "retrieval_done"
+        message: Human-readable message
+        **fields: Structured fields for the JSON line
+    """
+    if LOG_FORMAT == "none":
+        return
+    if LOG_FORMAT != "json":
+        print(message)
+        return
+    record = {"time": round(time.time(), 3), "event": event, "message": message}
+    current = _current_trace.get()
+    if current is not None:
+        record["trace_id"] = current.trace_id
+        record.update(current.labels)
+    record.update(fields)
+    print(json.dumps(record, default=str))
+
+# Document file names seen so far, capped at METRICS_MAX_DOCUMENTS label values
+_documents = set()
+_documents_lock = threading.Lock()
+
+def document_label(doc_path=None):
+    """Get the metrics label of a document: its file name, or "other" once METRICS_MAX_DOCUMENTS are labelled."""
+    name = os.path.basename(doc_path or DEFAULT_DOC_PATH)
+    with _documents_lock:
+        if name not in _documents:
+            if len(_documents) >= METRICS_MAX_DOCUMENTS:
+                return "other"
+            _documents.add(name)
+    return name
+
+def _record(metrics, stage, seconds, labels):
+    """Record a stage's duration in the stage histogram, under the same label names every time."""
+    if metrics.enabled:
+        key = (("document", labels.get("document", "")), ("provider", labels.get("provider", "")), ("stage", stage))
+        metrics.observe_series(STAGE_SECONDS, key, seconds)
+
+class _Span:
+    """Times a stage in a with block; a plain class, since spans sit on the hot path."""
+
+    __slots__ = ("trace", "stage", "labels", "start")
+
+    def __init__(self, trace, stage, labels):
+        self.trace = trace  # None records into whichever trace is current when the span ends
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        trace = self.trace or _current_trace.get()
+        if trace is not None:
+            trace.record(self.stage, seconds, self.labels)
+        else:
+            _record(get_metrics(), self.stage, seconds, self.labels)
+
+class Trace:
+    """Stage timings of one query or ingestion, labelled with its document.
+
+    Every span is recorded in the stage histograms. Sampled traces also
+    total their spans per stage and log them as one structured event when
+    they finish, so only TRACE_SAMPLE_RATE of requests pay for the log line.
+    """
+
+    def __init__(self, name, sampled=False, **labels):
+        """Start the trace.
+
+        Args:
+            name: What is traced ("query" or "ingest"), recorded as the stage of its total time
+            sampled: Whether to log the trace's spans when it finishes
+            **labels: Labels of every span, e.g. document
+        """
+        self.name = name
+        self.labels = labels
+        self.sampled = sampled
+        self.trace_id = f"{random.getrandbits(64):016x}"
+        self.outcome = None  # Set by the traced code, e.g. "cached"; defaults to "ok"
+        self.metrics = get_metrics()
+        self.started = time.perf_counter()
+        self.stages = {}  # Stage -> [spans, seconds], for sampled traces
+        self.lock = threading.Lock() if sampled else None
+
+    def observe(self, stage, seconds, **labels):
+        """Record a stage's duration, e.g. one measured outside a span."""
+        self.record(stage, seconds, labels)
+
+    def record(self, stage, seconds, labels):
+        """Record a stage's duration with extra labels given as a dict."""
+        _record(self.metrics, stage, seconds, {**self.labels, **labels} if labels else self.labels)
+        if self.sampled:
+            with self.lock:
+                totals = self.stages.setdefault(stage, [0, 0.0])
+                totals[0] += 1
+                totals[1] += seconds
+
+    def span(self, stage, **labels):
+        """Time a stage of this trace in a with block."""
+        return _Span(self, stage, labels)
+
+    def finish(self):
+        """Record the trace's total time and outcome, and log its spans if it's sampled."""
+        seconds = time.perf_counter() - self.started
+        outcome = self.outcome or "ok"
+        _record(self.metrics, self.name, seconds, self.labels)
+        self.metrics.increment(REQUESTS_TOTAL, kind=self.name, outcome=outcome,
+                                document=self.labels.get("document", ""))
+        if self.sampled:
+            with self.lock:
+                spans = {stage: {"count": count, "ms": round(total * 1000, 3)}
+                         for stage, (count, total) in self.stages.items()}
+            summary = ", ".join(f"{stage} {span['ms']:.1f} ms" for stage, span in spans.items())
+            log_event("trace", f"Trace {self.trace_id}: {self.name} {outcome} in {seconds * 1000:.1f} ms ({summary})",
+                      name=self.name, outcome=outcome, duration_ms=round(seconds * 1000, 3), spans=spans)
+
+def start_trace(name, **labels):
+    """Start a trace, sampling it for logging with probability TRACE_SAMPLE_RATE."""
+    return Trace(name, random.random() < TRACE_SAMPLE_RATE, **labels)
+
+def current_trace():
+    """Get the trace running in this context, or None."""
+    return _current_trace.get()
+
+@contextmanager
+def trace(name, **labels):
+    """Trace a query or ingestion in a with block.
+
+    Spans recorded inside the block, including in threads started with
+    asyncio.to_thread, belong to the trace. Its outcome is whatever the
+    block sets as the trace's `outcome`, "error" if the block raises, or
+    "cancelled" if it's cancelled or closed.
+
+    Yields:
+        Trace: The running trace
+    """
+    current = start_trace(name, **labels)
+    previous = _current_trace.get()
+    # Restored with set() rather than a reset token: async generators may resume in another context
+    _current_trace.set(current)
+    try:
+        yield current
+    except Exception:
+        current.outcome = "error"
+        raise
+    except BaseException:
+        current.outcome = "cancelled"
+        raise
+    finally:
+        _current_trace.set(previous)
+        current.finish()
+
+def observe(stage, seconds, **labels):
+    """Record a stage's duration in the current trace (outside a trace, with just these labels)."""
+    current = _current_trace.get()
+    if current is not None:
+        current.record(stage, seconds, labels)
+    else:
+        _record(get_metrics(), stage, seconds, labels)
+
+def span(stage, **labels):
+    """Time a stage of the current trace in a with block.
+
+    Args:
+        stage: Name of the stage, e.g. "vector_search"
+        **labels: Extra labels, e.g. provider
+    """
+    return _Span(None, stage, labels)
@@ -0,0 +1,90 @@
+"""Background warm-up of the default document and LLM providers once the server is up."""
+import importlib
+import threading
+
+from src.config.settings import DEFAULT_DOC_PATH
+from src.utils.tracing import log_event
+
+# Warm-up states before the ingestion job's own states take over
+NOT_STARTED = "not_started"
+LOADING = "loading"
+
+_warmup_state = {"status": NOT_STARTED, "job": None, "providers_loaded": False, "error": None}
+_warmup_lock = threading.Lock()
+
+def _warm_up(doc_path):
+    """Queue the document for ingestion, then load the LLM provider SDKs while it's indexed."""
+    # Imported here rather than at startup: these pull in Chroma, LangChain and the provider SDKs
+    from src.database.ingestion_jobs import get_ingestion_scheduler
+    from src.utils.query_handler import LLM_PROVIDER_MODULES
+
+    job = get_ingestion_scheduler().submit(doc_path)
+    with _warmup_lock:
+        _warmup_state["job"] = job
+    for module in LLM_PROVIDER_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            # The query path reports the missing provider when it's used
+            log_event("warmup_error", f"Could not preload {module}: {str(e)}", module=module, error=str(e))
+    with _warmup_lock:
+        _warmup_state["providers_loaded"] = True
+    log_event("warmup_providers", "LLM providers loaded")
+
+def _run_warmup(doc_path):
+    """Run the warm-up, recording an error instead of raising it."""
+    try:
+        _warm_up(doc_path)
+    except Exception as e:
+        with _warmup_lock:
+            _warmup_state["error"] = str(e)
+        log_event("warmup_error", f"Warm-up failed: {str(e)}", error=str(e))
+
+def start_warmup(doc_path=DEFAULT_DOC_PATH):
+    """Warm the app up on a background thread: index the default document and load the LLM SDKs.
+
+    The document is ingested through the ingestion scheduler, so the chat
+    handler reports its progress to anyone asking before it's ready. Only
+    the first call starts a warm-up.
+
+    Args:
+        doc_path: Path to the PDF document to index
+    """
+    with _warmup_lock:
+        if _warmup_state["status"] != NOT_STARTED:
+            return
+        _warmup_state["status"] = LOADING
+    threading.Thread(target=_run_warmup, args=(doc_path,), name="warmup", daemon=True).start()
+
+def warmup_pending():
+    """Check whether a warm-up was started but hasn't queued its document's ingestion job yet."""
+    with _warmup_lock:
+        return (_warmup_state["status"] != NOT_STARTED and _warmup_state["job"] is None
+                and _warmup_state["error"] is None)
+
+def get_readiness():
+    """Check whether the warm-up has finished, for the /ready probe.
+
+    Returns:
+        tuple: (ready, details) where details holds the warm-up status
+            ("not_started", "loading" or the ingestion job's status), its
+            progress and any error
+    """
+    with _warmup_lock:
+        job = _warmup_state["job"]
+        providers_loaded = _warmup_state["providers_loaded"]
+        details = {"status": job.status if job else _warmup_state["status"], "providers_loaded": providers_loaded}
+        error = _warmup_state["error"]
+    if job is None:
+        if error:
+            details["error"] = error
+        return False, details
+
+    from src.database.ingestion_jobs import READY  # Loaded by now, since the job exists
+
+    details.update(doc_path=job.doc_path, pages_done=job.pages_done, total_pages=job.total_pages,
+                   chunks_done=job.chunks_done)
+    error = error or job.error
+    if error:
+        details["error"] = error
+    return job.status == READY and providers_loaded, details
@@ -0,0 +1,5 @@
+"""Shared pytest setup: run the tests from the repository root with its modules importable."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,149 @@
+"""Tests for the client pool and the API key scheduler under cancellation."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.api_load_balancer import ApiKeyLoadBalancer, is_rate_limit_error
+from src.utils.client_pool import ClientPool, PooledChain
+
+class FakeChain:
+    """Chain whose calls wait on an event, so tests can cancel them mid-request."""
+
+    def __init__(self, key):
+        self.key = key
+        self.release = asyncio.Event()
+
+    async def ainvoke(self, inputs):
+        await self.release.wait()
+        return "answer"
+
+    async def astream(self, inputs):
+        await self.release.wait()
+        yield "answer"
+
+def make_chain(scheduler):
+    return PooledChain("fake", FakeChain, scheduler=scheduler, pool=ClientPool())
+
+def in_flight(scheduler):
+    return sum(key["in_flight"] for key in scheduler.get_stats()["keys"])
+
+def test_lease_releases_on_base_exception():
+    scheduler = ApiKeyLoadBalancer(api_keys=["a"], requests_per_minute=10, max_in_flight=1)
+    with pytest.raises(KeyboardInterrupt):
+        with scheduler.lease():
+            raise KeyboardInterrupt()
+    assert in_flight(scheduler) == 0
+
+def test_lease_quarantines_key_on_rate_limit():
+    scheduler = ApiKeyLoadBalancer(api_keys=["a"], requests_per_minute=10, cooldown_base=60.0)
+    with pytest.raises(RuntimeError):
+        with scheduler.lease():
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+    assert scheduler.get_stats()["keys"][0]["cooling_down"]
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(timeout=0.05)
+
+@pytest.mark.parametrize("method", ["ainvoke", "astream"])
+def test_cancelled_request_checks_client_in(method):
+    scheduler = ApiKeyLoadBalancer(api_keys=["a"], requests_per_minute=10, max_in_flight=4)
+    chain = make_chain(scheduler)
+
+    async def request():
+        if method == "ainvoke":
+            return await chain.ainvoke({"question": "q"})
+        return [chunk async for chunk in chain.astream({"question": "q"})]
+
+    async def cancel_during_request():
+        task = asyncio.create_task(request())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_during_request())
+    assert in_flight(scheduler) == 0
+    assert chain.pool.get_stats()["in_use"] == 0
+
+def test_cancelled_checkout_waiting_for_quota_checks_client_in():
+    # One request a minute: the second checkout waits in its thread for quota
+    scheduler = ApiKeyLoadBalancer(api_keys=["a"], requests_per_minute=1, max_in_flight=4, window=0.3)
+    chain = make_chain(scheduler)
+    scheduler.release(scheduler.acquire())  # Spend the only request
+
+    async def cancel_while_waiting():
+        task = asyncio.create_task(chain.ainvoke({"question": "q"}))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_waiting())
+    # The checkout thread gets the key once the bucket refills, then hands it straight back
+    done = threading.Event()
+    for _ in range(50):
+        if in_flight(scheduler) == 0 and scheduler.get_stats()["sent"] == 2:
+            done.set()
+            break
+        done.wait(0.05)
+    assert done.is_set()
+    assert chain.pool.get_stats()["in_use"] == 0
+
+def test_cancellations_never_exhaust_the_key():
+    scheduler = ApiKeyLoadBalancer(api_keys=["a"], requests_per_minute=100, max_in_flight=4)
+    chain = make_chain(scheduler)
+
+    async def cancel_repeatedly():
+        for _ in range(10):
+            task = asyncio.create_task(chain.ainvoke({"question": "q"}))
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(cancel_repeatedly())
+    assert scheduler.acquire(timeout=0.5) == "a"
+
+def test_idle_clients_of_unused_keys_are_swept():
+    pool = ClientPool(idle_timeout=0.05)
+    key, client = pool.checkout("fake", FakeChain, key="old-key")
+    pool.checkin("fake", key, client)
+    time.sleep(0.1)
+
+    pool.checkout("fake", FakeChain, key="new-key")
+
+    stats = pool.get_stats()
+    assert (stats["clients"], stats["discarded"]) == (1, 1)
+
+class ResourceExhausted(Exception):
+    """Stand-in for google.api_core.exceptions.ResourceExhausted."""
+
+class StatusError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+def wrapped(error):
+    try:
+        raise RuntimeError("Error calling model") from error
+    except RuntimeError as e:
+        return e
+
+@pytest.mark.parametrize("error", [
+    ResourceExhausted("Resource has been exhausted"),
+    StatusError("Rate limit reached", 429),
+    RuntimeError("429 RESOURCE_EXHAUSTED"),
+    wrapped(ResourceExhausted("Resource has been exhausted")),
+])
+def test_rate_limit_errors_are_recognized(error):
+    assert is_rate_limit_error(error)
+
+@pytest.mark.parametrize("error", [
+    RuntimeError("Request req_4291 failed"),
+    ValueError("Prompt is 1429 tokens too long"),
+    RuntimeError("No quota project set for application default credentials"),
+    StatusError("Bad request", 400),
+])
+def test_other_errors_are_not_rate_limits(error):
+    assert not is_rate_limit_error(error)
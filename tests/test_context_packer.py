@@ -0,0 +1,63 @@
+"""Tests for token-budgeted context packing."""
+import pytest
+from langchain_core.documents import Document
+
+from src.utils.context_packer import CONTEXT_SEPARATOR, ContextPacker, estimate_tokens
+
+def make_results(texts, page=0):
+    """Get (document, score) results of chunks 0..n of one page, most relevant first."""
+    return [(Document(page_content=text, id=f"chunk-{i * 2}", metadata={"source": "doc.pdf", "page": page}), 1.0)
+            for i, text in enumerate(texts)]
+
+def distinct_text(seed, words=200):
+    """Get text sharing no word 3-grams with other seeds, so it's never deduplicated."""
+    return " ".join(f"w{seed}x{i}" for i in range(words))
+
+@pytest.mark.parametrize("budget", [1, 10, 50, 120, 300, 600, 5000])
+def test_packed_context_fits_budget(budget):
+    results = make_results([distinct_text(i, 40 * (i + 1)) for i in range(4)])
+    context, report = ContextPacker().pack(results, budget)
+    assert estimate_tokens(context) <= budget
+    assert report["tokens_out"] == estimate_tokens(context)
+    assert report["tokens_saved"] + report["tokens_dropped"] <= report["tokens_in"]
+
+def test_top_ranked_section_is_always_kept():
+    # The best chunk is long; greedy by relevance per token alone would prefer the short ones
+    results = make_results([distinct_text(0, 400)] + [distinct_text(i, 5) for i in range(1, 4)])
+    context, report = ContextPacker().pack(results, 200)
+    assert context.startswith("w0x0 w0x1")
+    assert report["tokens_dropped"] > 0
+    assert estimate_tokens(context) <= 200
+
+def test_rest_fill_budget_after_top_section():
+    results = make_results([distinct_text(0, 20)] + [distinct_text(i, 20) for i in range(1, 4)])
+    context, report = ContextPacker().pack(results, 10_000)
+    assert report["sections"] == 4
+    assert report["tokens_dropped"] == 0
+    assert context.split(CONTEXT_SEPARATOR)[0].startswith("w0x0")
+
+def test_duplicates_count_as_saved_not_dropped():
+    text = distinct_text(0, 100)
+    results = make_results([text, text, distinct_text(1, 100)])
+    _context, report = ContextPacker().pack(results, 10_000)
+    assert report["duplicates"] == 1
+    assert report["tokens_dropped"] == 0
+    assert report["tokens_saved"] > 0
+
+def test_merged_overlap_is_sent_once():
+    first = distinct_text(0, 50)
+    second = first[-100:] + " " + distinct_text(1, 50)
+    results = [(Document(page_content=first, id="chunk-0", metadata={"source": "doc.pdf", "page": 0}), 1.0),
+               (Document(page_content=second, id="chunk-1", metadata={"source": "doc.pdf", "page": 0}), 1.0)]
+    context, report = ContextPacker().pack(results, 10_000)
+    assert report["sections"] == 1
+    assert context.count(first[-100:]) == 1
+
+def test_stats_accumulate():
+    packer = ContextPacker()
+    results = make_results([distinct_text(i, 100) for i in range(3)])
+    reports = [packer.pack(results, 100)[1] for _ in range(2)]
+    stats = packer.get_stats()
+    assert stats["contexts"] == 2
+    assert stats["tokens_dropped"] == sum(r["tokens_dropped"] for r in reports)
+    assert stats["tokens_in"] == sum(r["tokens_in"] for r in reports)
@@ -0,0 +1,86 @@
+"""Tests for the content-hash document registry."""
+import json
+import threading
+
+from src.database.document_registry import DocumentRegistry
+
+def make_store(root, name):
+    """Create a non-empty directory standing in for a document's Chroma store."""
+    db_path = root / name
+    db_path.mkdir()
+    (db_path / "chroma.sqlite3").write_bytes(b"store")
+    return str(db_path)
+
+def test_identical_uploads_share_one_store(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+    first, second, other = tmp_path / "1_paper.pdf", tmp_path / "2_paper.pdf", tmp_path / "3_notes.pdf"
+    first.write_bytes(b"%PDF same contents")
+    second.write_bytes(b"%PDF same contents")
+    other.write_bytes(b"%PDF other contents")
+    db_path = make_store(tmp_path, "1_paper")
+
+    registry.register(registry.content_hash(str(first)), db_path, str(first))
+
+    assert registry.content_hash(str(second)) == registry.content_hash(str(first))
+    assert registry.lookup(registry.content_hash(str(second))) == db_path
+    assert registry.lookup(registry.content_hash(str(other))) is None
+
+def test_incomplete_ingestion_is_pending_not_reused(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+    db_path = make_store(tmp_path, "partial")
+
+    registry.register("abc", db_path, "paper.pdf", complete=False)
+
+    assert registry.lookup("abc") is None
+    assert registry.pending_db_path("abc") == db_path
+    assert registry.list_db_paths() == []
+
+def test_processes_see_each_others_entries(tmp_path):
+    path = str(tmp_path / "registry.sqlite3")
+    first, second = DocumentRegistry(path), DocumentRegistry(path)
+    db_path = make_store(tmp_path, "store")
+
+    first.register("abc", db_path, "paper.pdf")
+
+    assert second.lookup("abc") == db_path
+    assert second.unregister_db_path(db_path)
+    assert first.lookup("abc") is None
+
+def test_concurrent_writers_keep_every_entry(tmp_path):
+    path = str(tmp_path / "registry.sqlite3")
+    registries = [DocumentRegistry(path) for _ in range(4)]
+
+    def register_many(number, registry):
+        for i in range(25):
+            registry.register(f"hash-{number}-{i}", f"store-{number}-{i}", "paper.pdf")
+
+    threads = [threading.Thread(target=register_many, args=(n, r)) for n, r in enumerate(registries)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(DocumentRegistry(path).entries()) == 100
+
+def test_ingest_locks_are_shared_then_dropped(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+
+    held = registry.ingest_lock("abc")
+    with held:
+        assert registry.ingest_lock("abc") is held
+        assert registry.ingest_lock("abc").locked()
+    del held
+
+    assert len(registry._ingest_locks) == 0
+
+def test_imports_json_registry(tmp_path):
+    db_path = make_store(tmp_path, "store")
+    (tmp_path / "registry.json").write_text(json.dumps({
+        "abc": {"db_path": db_path, "source": "paper.pdf", "complete": True},
+    }))
+
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+
+    assert registry.lookup("abc") == db_path
+    assert not (tmp_path / "registry.json").exists()
+    assert DocumentRegistry(str(tmp_path / "registry.sqlite3")).entries()["abc"]["source"] == "paper.pdf"
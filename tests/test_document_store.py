@@ -0,0 +1,66 @@
+"""Tests for hybrid search and the multi-document merge."""
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from langchain_chroma import Chroma
+import pytest
+
+from benchmarks.stubs import StubEmbeddings
+from src.database import document_store
+from src.database.handle_pool import ChromaHandlePool
+from src.database.lexical_index import LexicalIndexBuilder
+
+RELEVANT = [f"translators compare gpt output with human translation sample {i}" for i in range(6)]
+IRRELEVANT = [f"recipe for baking bread with flour yeast and water step {i}" for i in range(6)]
+
+def build_store(path, texts, embeddings, keyword_index=True):
+    ids = [f"chunk-{i}" for i in range(len(texts))]
+    Chroma(persist_directory=path, embedding_function=embeddings).add_texts(texts, ids=ids)
+    if keyword_index:
+        builder = LexicalIndexBuilder()
+        builder.add(ids, texts)
+        builder.save(document_store.lexical_index_path(path))
+    return path
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    embeddings = StubEmbeddings()
+    monkeypatch.setattr(document_store, "HYBRID_SEARCH", True)
+    monkeypatch.setattr(document_store, "resolve_db_path", lambda doc_path: doc_path)
+    monkeypatch.setattr(document_store, "_handle_pool", ChromaHandlePool(
+        lambda path: Chroma(persist_directory=path, embedding_function=embeddings)))
+    monkeypatch.setattr(document_store, "_retrieval_executor", ThreadPoolExecutor(max_workers=2))
+    return embeddings, str(tmp_path)
+
+def test_merge_prefers_the_relevant_document(stores):
+    embeddings, root = stores
+    relevant = build_store(os.path.join(root, "relevant"), RELEVANT, embeddings, keyword_index=False)
+    irrelevant = build_store(os.path.join(root, "irrelevant"), IRRELEVANT, embeddings)
+    question = "how do human translators compare with gpt"
+
+    results = document_store.search_documents(question, embeddings.embed_query(question), [relevant, irrelevant],
+                                              k=4, max_per_document=3, min_per_document=1)
+
+    # The irrelevant store only gets its reserved chunk, despite having the keyword index
+    assert [db_path for _doc, _score, db_path in results].count(irrelevant) == 1
+    assert results[0][2] == relevant
+    assert results[-1][2] == irrelevant
+    assert all(score > results[-1][1] for _doc, score, _db_path in results[:-1])
+
+def test_keyword_only_matches_get_their_vector_relevance(stores, monkeypatch):
+    embeddings, root = stores
+    monkeypatch.setattr(document_store, "HYBRID_CANDIDATES", 1)
+    path = build_store(os.path.join(root, "doc"), RELEVANT + IRRELEVANT, embeddings)
+    question = "bread flour yeast"
+    question_vector = embeddings.embed_query(question)
+
+    with document_store.get_handle_pool().lease(path) as db:
+        expected = {doc.id: score for doc, score in document_store.search_by_vector(db, question_vector, k=12)}
+        results = document_store.hybrid_search_with_relevance(db, path, question, question_vector, k=3)
+        fused = document_store.hybrid_search(db, path, question, question_vector, k=3)
+
+    assert [doc.id for doc, _score in results] == [doc.id for doc, _score in fused]
+    vector_ids = [chunk_id for chunk_id, _score in sorted(expected.items(), key=lambda item: item[1], reverse=True)]
+    assert any(doc.id not in vector_ids[:3] for doc, _score in results)  # Found by keywords alone
+    for doc, score in results:
+        assert score == pytest.approx(expected[doc.id], abs=1e-5)
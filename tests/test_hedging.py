@@ -0,0 +1,96 @@
+"""Tests for hedged LLM requests."""
+import asyncio
+
+import pytest
+
+from src.utils.hedging import LLMHedger
+
+class FakeChain:
+    """Chain that streams its tokens after a delay and records whether its stream was closed."""
+
+    def __init__(self, delay, tokens=("a", "b"), error=None):
+        self.delay = delay
+        self.tokens = tokens
+        self.error = error
+        self.started = 0
+        self.closed = 0
+
+    async def astream(self, inputs):
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            for token in self.tokens:
+                yield token
+        finally:
+            self.closed += 1
+
+    async def ainvoke(self, inputs):
+        return "".join([token async for token in self.astream(inputs)])
+
+def make_hedger(delay=0.05):
+    hedger = LLMHedger()
+    hedger.get_delay = lambda: delay
+    return hedger
+
+def test_slow_primary_loses_and_is_closed():
+    hedger = make_hedger()
+    primary, fallback = FakeChain(delay=5.0, tokens=("slow",)), FakeChain(delay=0.01, tokens=("fast",))
+
+    provider, text = asyncio.run(hedger.ainvoke(primary, fallback, {"question": "q"}))
+
+    assert (provider, text) == ("gemini", "fast")
+    assert primary.closed == 1 and fallback.closed == 1
+    stats = hedger.get_stats()
+    assert stats["hedges_fired"] == 1 and stats["fallback_wins"] == 1 and stats["extra_calls"] == 1
+
+def test_losing_primary_delay_is_recorded():
+    hedger = make_hedger(delay=0.05)
+    asyncio.run(hedger.ainvoke(FakeChain(delay=5.0), FakeChain(delay=0.01), {"question": "q"}))
+
+    histogram = hedger.histogram("groq", "first_token")
+    assert histogram.count() == 1
+    assert histogram.percentile(0.5) >= 0.05
+
+def test_fast_primary_never_starts_fallback():
+    hedger = make_hedger(delay=1.0)
+    fallback = FakeChain(delay=0.0)
+
+    provider, text = asyncio.run(hedger.ainvoke(FakeChain(delay=0.0), fallback, {"question": "q"}))
+
+    assert (provider, text) == ("groq", "ab")
+    assert fallback.started == 0
+    assert hedger.get_stats()["primary_wins"] == 1
+
+def test_primary_error_fails_over():
+    hedger = make_hedger(delay=1.0)
+    primary = FakeChain(delay=0.0, error=RuntimeError("down"))
+
+    provider, text = asyncio.run(hedger.ainvoke(primary, FakeChain(delay=0.0), {"question": "q"}))
+
+    assert (provider, text) == ("gemini", "ab")
+    assert hedger.get_stats()["failovers"] == 1
+    assert hedger.get_stats()["hedges_fired"] == 0
+
+def test_both_failing_raises_last_error():
+    hedger = make_hedger(delay=1.0)
+    primary = FakeChain(delay=0.0, error=RuntimeError("primary down"))
+    fallback = FakeChain(delay=0.0, error=ValueError("fallback down"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(hedger.ainvoke(primary, fallback, {"question": "q"}))
+
+def test_cancelled_request_closes_both_attempts():
+    hedger = make_hedger(delay=0.01)
+    primary, fallback = FakeChain(delay=5.0), FakeChain(delay=5.0)
+
+    async def cancel_mid_race():
+        task = asyncio.create_task(hedger.ainvoke(primary, fallback, {"question": "q"}))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_mid_race())
+    assert primary.closed == 1 and fallback.closed == 1
@@ -0,0 +1,67 @@
+"""Tests for the metrics registry and the component statistics it exports."""
+from src.utils.api_load_balancer import API_KEY_METRICS, ApiKeyLoadBalancer
+from src.utils.hedging import HEDGE_METRICS, LLMHedger
+from src.utils.metrics import MetricsRegistry
+from src.utils.semantic_cache import SEMANTIC_CACHE_METRICS, SemanticCache
+
+def test_render_histograms_and_counters():
+    registry = MetricsRegistry(enabled=True)
+    registry.describe("rag_test_seconds", "histogram", "Test latency")
+    registry.observe("rag_test_seconds", 0.003, stage="retrieval")
+    registry.increment("rag_test_total", outcome="ok")
+
+    text = registry.render()
+
+    assert "# TYPE rag_test_seconds histogram" in text
+    assert 'rag_test_seconds_bucket{stage="retrieval",le="+Inf"} 1' in text
+    assert 'rag_test_seconds_count{stage="retrieval"} 1' in text
+    assert 'rag_test_total{outcome="ok"} 1' in text
+
+def test_collectors_are_read_on_every_render():
+    registry = MetricsRegistry(enabled=True)
+    value = {"current": 1}
+    registry.add_collector("test", lambda: [("rag_test_gauge", {"key": 1}, value["current"])],
+                           {"rag_test_gauge": ("gauge", "Test gauge")})
+
+    assert 'rag_test_gauge{key="1"} 1' in registry.render()
+    value["current"] = 5
+    text = registry.render()
+    assert "# TYPE rag_test_gauge gauge" in text
+    assert 'rag_test_gauge{key="1"} 5' in text
+
+def test_failing_collector_does_not_break_render():
+    registry = MetricsRegistry(enabled=True)
+    registry.increment("rag_test_total")
+
+    def broken():
+        raise RuntimeError("component down")
+
+    registry.add_collector("broken", broken, {})
+    assert "rag_test_total 1" in registry.render()
+
+def test_disabled_registry_ignores_collectors():
+    registry = MetricsRegistry(enabled=False)
+    registry.add_collector("test", lambda: [("rag_test_gauge", {}, 1)], {})
+    assert "rag_test_gauge" not in registry.render()
+
+def test_component_statistics_are_exported():
+    registry = MetricsRegistry(enabled=True)
+    cache = SemanticCache()
+    cache.store("doc", "What is RAG?", [1.0, 0.0], "Retrieval augmented generation")
+    cache.lookup("doc", "what is rag?", [1.0, 0.0])
+    cache.lookup("doc", "Something else", [0.0, 1.0])
+    scheduler = ApiKeyLoadBalancer(api_keys=["a", "b"], requests_per_minute=10, tokens_per_minute=1000)
+    scheduler.acquire(tokens=100)
+    registry.add_collector("semantic_cache", cache.collect_metrics, SEMANTIC_CACHE_METRICS)
+    registry.add_collector("hedging", LLMHedger().collect_metrics, HEDGE_METRICS)
+    registry.add_collector("llm_keys", lambda: scheduler.collect_metrics("llm"), API_KEY_METRICS)
+
+    text = registry.render()
+
+    assert 'rag_semantic_cache_lookups_total{result="exact"} 1' in text
+    assert 'rag_semantic_cache_lookups_total{result="miss"} 1' in text
+    assert "rag_semantic_cache_hit_ratio 0.5" in text
+    assert 'rag_semantic_cache_lookup_seconds{quantile="0.95"}' in text
+    assert "rag_hedges_fired_total 0" in text
+    assert 'rag_api_key_in_flight{key="1",scheduler="llm"} 1' in text
+    assert 'rag_api_key_tokens_left{key="1",scheduler="llm"} 900' in text
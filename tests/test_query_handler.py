@@ -0,0 +1,71 @@
+"""Tests for answer caching in the query handler."""
+import asyncio
+
+from langchain_core.documents import Document
+import pytest
+
+from src.database.document_registry import DocumentRegistry
+from src.utils import query_handler
+from src.utils.semantic_cache import SemanticCache
+from src.utils.shared_cache import MemoryCacheBackend, document_prefix
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+    """Point the query handler at a temporary registry and stub retrieval and generation."""
+    doc_path = tmp_path / "paper.pdf"
+    doc_path.write_bytes(b"%PDF contents")
+    db_path = tmp_path / "paper"
+    db_path.mkdir()
+    (db_path / "chroma.sqlite3").write_bytes(b"store")
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+    cache = SemanticCache()
+    shared_cache = MemoryCacheBackend()
+    answers = iter(f"answer {i}" for i in range(100))
+
+    async def agenerate(inputs):
+        return next(answers)
+
+    monkeypatch.setattr(query_handler, "get_registry", lambda: registry)
+    monkeypatch.setattr(query_handler, "get_semantic_cache", lambda: cache)
+    monkeypatch.setattr(query_handler, "get_shared_cache", lambda: shared_cache)
+    monkeypatch.setattr(query_handler, "_get_cache_namespace", lambda doc: str(db_path))
+    monkeypatch.setattr(query_handler, "_embed_question", lambda question, doc: [1.0, 0.0])
+    monkeypatch.setattr(query_handler, "_search_document",
+                        lambda doc, question, vector, options=None: [(Document(page_content="chunk"), 1.0)])
+    monkeypatch.setattr(query_handler, "_build_context", lambda results: "chunk")
+    monkeypatch.setattr(query_handler, "_generate_response", lambda inputs: next(answers))
+    monkeypatch.setattr(query_handler, "_agenerate_response", agenerate)
+
+    def register(complete):
+        registry.register(registry.content_hash(str(doc_path)), str(db_path), str(doc_path), complete=complete)
+
+    return str(doc_path), register, cache, shared_cache
+
+def test_answers_are_not_cached_while_ingesting(handler):
+    doc_path, register, _cache, shared_cache = handler
+    register(complete=False)
+
+    assert query_handler.query_document("question?", doc_path) == "answer 0"
+    assert query_handler.query_document("question?", doc_path) == "answer 1"
+    assert asyncio.run(query_handler.aquery_document("question?", doc_path)) == "answer 2"
+    assert not shared_cache.entries
+
+    register(complete=True)
+
+    assert query_handler.query_document("question?", doc_path) == "answer 3"
+    assert query_handler.query_document("question?", doc_path) == "answer 3"
+    assert asyncio.run(query_handler.aquery_document("question?", doc_path)) == "answer 3"
+
+def test_shared_entries_are_keyed_by_document(handler):
+    doc_path, register, cache, shared_cache = handler
+    register(complete=True)
+    query_handler.query_document("question?", doc_path)
+    cache.clear()
+
+    content_hash = query_handler.get_registry().content_hash(doc_path)
+    assert len(shared_cache.entries) == 2  # The answer and the retrieved context
+    assert query_handler.query_document("question?", doc_path) == "answer 0"
+
+    shared_cache.clear(document_prefix(content_hash))
+
+    assert query_handler.query_document("question?", doc_path) == "answer 1"
@@ -0,0 +1,47 @@
+"""Tests for reranking and its score cache."""
+import numpy as np
+from langchain_core.documents import Document
+
+from src.utils.reranker import OverlapReranker, RerankScoreCache, rerank
+
+class FakeIndex:
+    """Keyword index stand-in giving fixed IDF weights."""
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    def idf(self, terms):
+        return np.array([self.weights.get(term, 1.0) for term in terms], dtype=np.float32)
+
+def make_results():
+    return [(Document(page_content="translation quality of human translators"), 0.9),
+            (Document(page_content="gpt-4 translation errors"), 0.8)]
+
+def test_scores_are_cached_per_store():
+    question = "human translators gpt"
+    cache = RerankScoreCache()
+    reranker = OverlapReranker()
+    humans_rare = FakeIndex({"human": 5.0, "translators": 5.0, "gpt": 0.1})
+    gpt_rare = FakeIndex({"human": 0.1, "translators": 0.1, "gpt": 5.0})
+
+    first = rerank(question, make_results(), 2, reranker, humans_rare, cache=cache, store="a")
+    second = rerank(question, make_results(), 2, reranker, gpt_rare, cache=cache, store="b")
+
+    assert first[0][0].page_content.startswith("translation quality")
+    assert second[0][0].page_content.startswith("gpt-4")
+    assert cache.get_stats()["hits"] == 0
+
+    rerank(question, make_results(), 2, reranker, humans_rare, cache=cache, store="a")
+    assert cache.get_stats()["hits"] == 2
+
+def test_score_cache_evicts_least_recently_used():
+    cache = RerankScoreCache(max_entries=2)
+    cache.set_many(["a", "b"], [1.0, 2.0])
+    cache.get_many(["a"])
+    cache.set_many(["c"], [3.0])
+
+    assert cache.get_many(["a", "b", "c"]) == [1.0, None, 3.0]
+
+def test_no_reranker_keeps_retrieval_order():
+    results = make_results()
+    assert rerank("anything", results, 1, None) == results[:1]
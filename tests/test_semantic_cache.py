@@ -0,0 +1,62 @@
+"""Tests for the semantic answer cache."""
+import time
+
+from src.utils.semantic_cache import SemanticCache
+
+def unit(*values):
+    return list(values)
+
+def test_exact_and_semantic_hits():
+    cache = SemanticCache(threshold=0.9)
+    cache.store("doc", "What is the BLEU score?", unit(1.0, 0.0, 0.0), "42")
+
+    assert cache.lookup("doc", "  what is the bleu score") == "42"
+    assert cache.lookup("doc", "Tell me the BLEU score", unit(0.99, 0.1, 0.0)) == "42"
+    assert cache.lookup("doc", "Who wrote it?", unit(0.0, 1.0, 0.0)) is None
+    assert cache.lookup("other", "What is the BLEU score?", unit(1.0, 0.0, 0.0)) is None
+
+    stats = cache.get_stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+
+def test_entries_expire_after_ttl():
+    cache = SemanticCache(ttl=0.05)
+    cache.store("doc", "question", unit(1.0, 0.0), "answer")
+    assert cache.lookup("doc", "question") == "answer"
+
+    time.sleep(0.1)
+
+    assert cache.lookup("doc", "question", unit(1.0, 0.0)) is None
+    assert cache.get_stats()["entries"] == 0
+
+def test_least_recently_used_evicted_per_document():
+    cache = SemanticCache(max_entries_per_doc=2)
+    cache.store("doc", "first", unit(1.0, 0.0, 0.0), "1")
+    cache.store("doc", "second", unit(0.0, 1.0, 0.0), "2")
+    cache.lookup("doc", "first")  # Now the second is least recently used
+    cache.store("doc", "third", unit(0.0, 0.0, 1.0), "3")
+
+    assert cache.lookup("doc", "first") == "1"
+    assert cache.lookup("doc", "second") is None
+    assert cache.lookup("doc", "third") == "3"
+    assert cache.get_stats()["evictions"] == 1
+
+def test_memory_cap_evicts_across_documents():
+    cache = SemanticCache(max_bytes=1000)
+    for i in range(10):
+        cache.store(f"doc-{i}", "question", unit(1.0, 0.0), "x" * 100)
+
+    stats = cache.get_stats()
+    assert stats["bytes_used"] <= 1000
+    assert stats["evictions"] > 0
+    assert cache.lookup("doc-9", "question") == "x" * 100
+    assert cache.lookup("doc-0", "question") is None
+
+def test_invalidate_drops_one_document():
+    cache = SemanticCache()
+    cache.store("a", "question", unit(1.0, 0.0), "A")
+    cache.store("b", "question", unit(1.0, 0.0), "B")
+
+    cache.invalidate("a")
+
+    assert cache.lookup("a", "question") is None
+    assert cache.lookup("b", "question") == "B"
@@ -0,0 +1,129 @@
+"""Tests for the shared cache backends."""
+import socketserver
+import threading
+import time
+
+import pytest
+
+from benchmarks.stubs import StubRedisServer
+from src.utils.shared_cache import MemoryCacheBackend, RedisCacheBackend, SQLiteCacheBackend
+
+@pytest.fixture(params=["memory", "sqlite"])
+def local_backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCacheBackend(max_entries=3)
+    return SQLiteCacheBackend(str(tmp_path / "shared_cache.sqlite3"), max_entries=3)
+
+def test_get_set_and_clear(local_backend):
+    local_backend.set("key", "value")
+    assert local_backend.get("key") == "value"
+    assert local_backend.get("missing") is None
+
+    local_backend.clear()
+
+    assert local_backend.get("key") is None
+    stats = local_backend.get_stats()
+    assert (stats["hits"], stats["misses"], stats["errors"]) == (1, 2, 0)
+
+def test_clear_by_prefix(local_backend):
+    local_backend.set("doc:a:answer", "1")
+    local_backend.set("doc:a:retrieval", "2")
+    local_backend.set("doc:b:answer", "3")
+
+    local_backend.clear("doc:a:")
+
+    assert local_backend.get("doc:a:answer") is None
+    assert local_backend.get("doc:a:retrieval") is None
+    assert local_backend.get("doc:b:answer") == "3"
+
+def test_entries_expire_after_ttl(local_backend):
+    local_backend.set("short", "value", ttl=0.05)
+    local_backend.set("long", "value", ttl=60)
+
+    time.sleep(0.1)
+
+    assert local_backend.get("short") is None
+    assert local_backend.get("long") == "value"
+
+def test_least_recently_used_evicted(local_backend):
+    for key in ("a", "b", "c"):
+        local_backend.set(key, key)
+        time.sleep(0.01)  # Distinct last-used times for the SQLite backend
+    local_backend.get("a")  # Now "b" is least recently used
+    time.sleep(0.01)
+    local_backend.set("d", "d")
+
+    assert local_backend.get("b") is None
+    assert [local_backend.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+
+def test_expired_entries_make_room_before_live_ones(local_backend):
+    local_backend.set("expired", "value", ttl=0.05)
+    local_backend.set("a", "a")
+    local_backend.set("b", "b")
+    time.sleep(0.1)
+
+    local_backend.set("c", "c")
+
+    assert [local_backend.get(key) for key in ("a", "b", "c")] == ["a", "b", "c"]
+
+@pytest.fixture
+def redis_server():
+    server = StubRedisServer().start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_redis_round_trip(redis_server):
+    backend = RedisCacheBackend(redis_server.url)
+    backend.set("key", "value")
+
+    assert backend.get("key") == "value"
+    assert backend.get("missing") is None
+    assert redis_server.connections == 1  # The connection is reused
+
+def test_redis_clear_by_prefix(redis_server):
+    backend = RedisCacheBackend(redis_server.url)
+    backend.set("doc:a:answer", "1")
+    backend.set("doc:b:answer", "2")
+    redis_server.data[b"other:app"] = (None, b"3")
+
+    backend.clear("doc:a:")
+
+    assert backend.get("doc:a:answer") is None
+    assert backend.get("doc:b:answer") == "2"
+    assert b"other:app" in redis_server.data
+
+def test_redis_requests_run_concurrently(redis_server):
+    redis_server.latency = 0.2
+    backend = RedisCacheBackend(redis_server.url, max_connections=4)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=backend.get, args=(f"key-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Serialized on one socket this would take 0.8s
+    assert time.perf_counter() - start < 0.6
+    assert backend.get_stats()["misses"] == 4
+
+def test_redis_unreachable_fails_fast():
+    with socketserver.TCPServer(("127.0.0.1", 0), socketserver.BaseRequestHandler) as server:
+        port = server.server_address[1]  # Closed again before the backend connects
+    backend = RedisCacheBackend(f"redis://127.0.0.1:{port}/0", retry_interval=60)
+
+    assert backend.get("key") is None
+    start = time.perf_counter()
+    for _ in range(20):
+        assert backend.get("key") is None
+    assert time.perf_counter() - start < 0.1
+    assert backend.get_stats()["errors"] == 21
+
+def test_redis_reconnects_after_stale_connection(redis_server):
+    backend = RedisCacheBackend(redis_server.url)
+    backend.set("key", "value")
+    backend.idle[0].sock.close()  # As if the server dropped the idle connection
+
+    assert backend.get("key") == "value"
+    assert backend.get_stats()["errors"] == 0